@@ -0,0 +1,122 @@
+"""Circuit breaker that lets a backend fail fast while its external system is unavailable"""
+
+from __future__ import absolute_import
+
+import logging
+import threading
+import time
+
+
+log = logging.getLogger(__name__)
+
+STATE_CLOSED = 'closed'
+STATE_OPEN = 'open'
+STATE_HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker(object):
+    """
+    Track consecutive failures of calls to an external system and stop making those calls for a while once the system
+    appears to be down.
+
+    The breaker starts out "closed" and allows every call. After `failure_threshold` consecutive failures it "opens"
+    and rejects calls for `reset_timeout` seconds. Once that cool-down period has elapsed, a single probe call is
+    allowed through ("half open"). If the probe succeeds the breaker closes again, otherwise it re-opens for another
+    cool-down period.
+
+    Callers ask for permission by calling `allow()` and then report the outcome with `record_success()` or
+    `record_failure()`, or call `release()` if the call failed for a reason unrelated to the external system.
+
+    `name` is used to identify the breaker in log messages.
+    `failure_threshold` is the number of consecutive failures that will open the breaker.
+    `reset_timeout` is the number of seconds the breaker stays open before a probe call is allowed.
+    """
+
+    def __init__(self, name='', failure_threshold=5, reset_timeout=30):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self.state = STATE_CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.times_opened = 0
+        self.rejected_calls = 0
+
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """
+        Returns True if a call to the external system should be attempted.
+
+        When the breaker is open and the cool-down period has elapsed, exactly one caller is allowed to probe the
+        external system, all other callers are rejected until the outcome of the probe is known.
+        """
+        if self.state == STATE_CLOSED:
+            return True
+
+        with self._lock:
+            if self.state == STATE_OPEN and time.time() - self.opened_at >= self.reset_timeout:
+                self.state = STATE_HALF_OPEN
+                log.info('Circuit breaker %s is half open, probing', self.name)
+                return True
+
+            self.rejected_calls += 1
+            return False
+
+    def record_success(self):
+        """Report that a call to the external system succeeded"""
+        if self.state == STATE_CLOSED and self.consecutive_failures == 0:
+            return
+
+        with self._lock:
+            if self.state != STATE_CLOSED:
+                log.info('Circuit breaker %s closed', self.name)
+            self.state = STATE_CLOSED
+            self.consecutive_failures = 0
+            self.opened_at = None
+
+    def release(self):
+        """
+        Report that a call ended without telling anything about the health of the external system.
+
+        If the call was the probe of a half open breaker, the breaker goes back to being open with its cool-down period
+        already elapsed, so the next call becomes the probe. Otherwise this does nothing.
+        """
+        if self.state != STATE_HALF_OPEN:
+            return
+
+        with self._lock:
+            if self.state == STATE_HALF_OPEN:
+                self.state = STATE_OPEN
+
+    def record_failure(self):
+        """
+        Report that a call to the external system failed.
+
+        Returns True if this failure caused the breaker to open.
+        """
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.state == STATE_HALF_OPEN or (
+                    self.state == STATE_CLOSED and self.consecutive_failures >= self.failure_threshold):
+                self.state = STATE_OPEN
+                self.opened_at = time.time()
+                self.times_opened += 1
+                log.warning(
+                    'Circuit breaker %s opened after %d consecutive failures, retrying in %s seconds',
+                    self.name, self.consecutive_failures, self.reset_timeout
+                )
+                return True
+
+            return False
+
+    @property
+    def metrics(self):
+        """A dictionary describing the current state of the breaker"""
+        return {
+            'state': self.state,
+            'consecutive_failures': self.consecutive_failures,
+            'times_opened': self.times_opened,
+            'rejected_calls': self.rejected_calls,
+        }
@@ -0,0 +1,182 @@
+"""Bounded in-memory buffer that lets backends send events in batches"""
+
+from __future__ import absolute_import
+
+from collections import deque
+import logging
+import os
+import threading
+import time
+
+from eventtracking import shutdown
+
+log = logging.getLogger(__name__)
+
+# Seconds between attempts to flush while another thread is flushing a batch, when flushing before a deadline
+LOCK_POLL_INTERVAL = 0.01
+
+
+class EventBuffer(object):
+    """
+    Collect events in memory and pass them to `flush_callback` in batches from a background thread.
+
+    A batch is flushed as soon as `batch_size` events are waiting, or once `flush_interval` seconds have passed with
+    fewer events waiting. The buffer never holds more than `max_size` events, new events are dropped while it is full.
+
+    The background thread is started when the first event is added, and is restarted if the process forks, so it is
+    safe to create the buffer before a web server forks its workers.
+
+    `flush_callback` is called with a list of events. Any exception it raises is logged and swallowed, the events in
+    that batch are lost.
+    `name` is used to identify the buffer in log messages.
+    """
+
+    def __init__(self, flush_callback, name='', batch_size=100, flush_interval=1.0, max_size=10000):
+        self.flush_callback = flush_callback
+        self.name = name
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_size = max_size
+
+        self.dropped_events = 0
+        self.flushed_events = 0
+        self.flushed_batches = 0
+        self.failed_events = 0
+
+        self._events = deque()
+        self._condition = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._closed = False
+
+    def add(self, event):
+        """
+        Add an event to the buffer.
+
+        Returns False if the event was dropped because the buffer is full or has been closed.
+        """
+        with self._condition:
+            if self._closed or len(self._events) >= self.max_size:
+                self.dropped_events += 1
+                return False
+
+            self._events.append(event)
+            self._ensure_thread_started()
+            if len(self._events) >= self.batch_size:
+                self._condition.notify()
+
+        return True
+
+    def _ensure_thread_started(self):
+        """Start the background flushing thread if it is not running in this process"""
+        if self._thread is not None and self._pid == os.getpid():
+            return
+
+        self._pid = os.getpid()
+        self._thread = threading.Thread(target=self._run, name='EventBuffer-{0}'.format(self.name))
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self):
+        """Flush batches until the buffer is closed"""
+        while True:
+            with self._condition:
+                if not self._closed and len(self._events) < self.batch_size:
+                    self._condition.wait(self.flush_interval)
+                if self._closed:
+                    return
+
+            self._flush_batch()
+
+    def _flush_batch(self, deadline=None):
+        """
+        Take up to `batch_size` events from the buffer and pass them to the flush callback.
+
+        If another thread is flushing a batch, waits until it is done or `deadline` has passed.
+
+        Returns the number of events flushed, or 0 if the deadline passed first.
+        """
+        if not self._acquire_flush_lock(deadline):
+            return 0
+
+        try:
+            with self._condition:
+                batch = []
+                while self._events and len(batch) < self.batch_size:
+                    batch.append(self._events.popleft())
+
+            if not batch:
+                return 0
+
+            try:
+                self.flush_callback(batch)
+            except Exception:  # pylint: disable=broad-except
+                log.exception('Unable to flush %d events from buffer %s', len(batch), self.name)
+                self.failed_events += len(batch)
+            else:
+                self.flushed_events += len(batch)
+                self.flushed_batches += 1
+            return len(batch)
+        finally:
+            self._flush_lock.release()
+
+    def _acquire_flush_lock(self, deadline=None):
+        """Acquire the flush lock, giving up once `deadline` has passed. Returns True if the lock was acquired."""
+        if deadline is None:
+            return self._flush_lock.acquire()
+
+        while not self._flush_lock.acquire(False):
+            remaining = shutdown.remaining(deadline)
+            if remaining == 0:
+                return False
+            time.sleep(min(remaining, LOCK_POLL_INTERVAL))
+        return True
+
+    def flush(self, timeout=None):
+        """
+        Synchronously flush all events that are currently in the buffer, giving up once `timeout` seconds have passed.
+
+        Returns the number of events left in the buffer, plus the number of events lost because the flush callback
+        failed.
+        """
+        deadline = shutdown.get_deadline(timeout)
+        failed_events = self.failed_events
+        while shutdown.remaining(deadline) != 0 and self._flush_batch(deadline):
+            pass
+        return len(self._events) + self.failed_events - failed_events
+
+    def close(self, timeout=None):
+        """
+        Stop the background thread and flush any remaining events. Events added afterwards are dropped.
+
+        Waits up to `timeout` seconds in total for a batch that is being flushed by the background thread and for the
+        remaining events to be flushed. Returns the number of events that could not be flushed before the deadline.
+        """
+        deadline = shutdown.get_deadline(timeout)
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+
+        thread = self._thread
+        if thread is not None and self._pid == os.getpid() and thread is not threading.current_thread():
+            thread.join(shutdown.remaining(deadline))
+            if thread.is_alive():
+                # Still flushing a batch, flushing more would block until it is done
+                return len(self._events)
+
+        return self.flush(shutdown.remaining(deadline))
+
+    def __len__(self):
+        return len(self._events)
+
+    @property
+    def metrics(self):
+        """A dictionary describing the current state of the buffer"""
+        return {
+            'queue_depth': len(self._events),
+            'dropped_events': self.dropped_events,
+            'flushed_events': self.flushed_events,
+            'flushed_batches': self.flushed_batches,
+            'failed_events': self.failed_events,
+        }
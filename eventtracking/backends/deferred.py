@@ -0,0 +1,213 @@
+"""Route events through expensive enrichment steps on background threads"""
+
+from __future__ import absolute_import
+
+from copy import deepcopy
+import logging
+
+from eventtracking.backends.routing import RoutingBackend
+from eventtracking.backends.workers import WorkerPool, DROP_NEWEST
+from eventtracking.cache import LRUCache
+from eventtracking.processors.exceptions import EventEmissionExit
+from eventtracking import shutdown
+
+LOG = logging.getLogger(__name__)
+
+
+class DeferredRoutingBackend(RoutingBackend):
+    """
+    A `RoutingBackend` that runs a second chain of processors, the enrichers, after the event has left the emitting
+    thread.
+
+    Events are first passed through `processors` synchronously, so cheap filtering still happens before anything is
+    queued and an `EventEmissionExit` raised by a processor prevents the event from being queued. The event is then
+    handed to a pool of worker threads, which pass it through `enrichers` and finally send it to `backends`. Enrichers
+    follow the same rules as processors: they are called in order, may mutate or replace the event, may raise
+    `EventEmissionExit` to drop it and any other exception is logged and swallowed.
+
+    Only the backends registered with this router receive enriched events, so it can be registered as one of the
+    backends of another `RoutingBackend` to enrich the events sent to some backends without delaying the others. Each
+    event is copied before it is queued, so enrichers never modify the event received by those other backends.
+
+    Events are dropped when more than `queue_size` of them are waiting to be enriched, see
+    `eventtracking.backends.workers.WorkerPool`.
+
+    `enrichers` is an iterable of callables, see `CachingEnricher` for a base class that caches the data it looks up.
+    `workers` is the number of threads that enrich events.
+    `queue_size` is the maximum number of events waiting to be enriched.
+    `drop_policy` decides which events are dropped when the queue is full, either "drop_newest" or "drop_oldest".
+    """
+
+    def __init__(
+            self, backends=None, processors=None, enrichers=None, workers=2, queue_size=1000, drop_policy=DROP_NEWEST,
+            **kwargs
+    ):  # pylint: disable=too-many-arguments
+        super(DeferredRoutingBackend, self).__init__(backends=backends, processors=processors, **kwargs)
+
+        self.enrichers = []
+        if enrichers is not None:
+            for enricher in enrichers:
+                self.register_enricher(enricher)
+
+        self.pool = WorkerPool(name='deferred', workers=workers, queue_size=queue_size, drop_policy=drop_policy)
+
+    def register_enricher(self, enricher):
+        """
+        Register a new enricher.
+
+        Note that enrichers are called in the order that they are registered.
+        """
+        if not callable(enricher):
+            raise ValueError('Enricher %s is not callable.' % enricher.__class__.__name__)
+        else:
+            self.enrichers.append(enricher)
+
+    def send(self, event):
+        """
+        Process the event using all registered processors and queue it to be enriched and sent to the backends.
+
+        Logs and swallows all `Exception`.
+        """
+        try:
+            processed_event = self.process_event(event)
+        except EventEmissionExit:
+            return
+
+        if not self.pool.submit(self.enrich_and_send, deepcopy(processed_event)):
+            LOG.warning('Dropped event %s, too many events are waiting to be enriched', processed_event.get('name'))
+
+    def send_batch(self, events):
+        """
+        Process each of the events using all registered processors and queue them to be enriched and sent together.
+
+        Logs and swallows all `Exception`. Returns the number of events dropped because too many events were waiting
+        to be enriched, failures of the backends happen later on the worker threads and are not counted.
+        """
+        processed_events = []
+        for event in events:
+            try:
+                processed_events.append(self.process_event(event))
+            except EventEmissionExit:
+                continue
+
+        if processed_events and not self.pool.submit(self.enrich_and_send_batch, deepcopy(processed_events)):
+            LOG.warning('Dropped %d events, too many events are waiting to be enriched', len(processed_events))
+            return len(processed_events)
+        return 0
+
+    def enrich_and_send(self, event):
+        """Pass the event through all registered enrichers and send it to all registered backends"""
+        try:
+            enriched_event = self.enrich_event(event)
+        except EventEmissionExit:
+            return
+        else:
+            self.send_to_backends(enriched_event)
+
+    def enrich_and_send_batch(self, events):
+        """Pass each of the events through all registered enrichers and send them together to all registered backends"""
+        enriched_events = []
+        for event in events:
+            try:
+                enriched_events.append(self.enrich_event(event))
+            except EventEmissionExit:
+                continue
+
+        if enriched_events:
+            self.send_batch_to_backends(enriched_events)
+
+    def enrich_event(self, event):
+        """
+        Executes all enrichers on the event in order.
+
+        Logs and swallows all `Exception` except `EventEmissionExit` which is re-raised if it is raised by an enricher.
+
+        Returns the modified event.
+        """
+        enriched_event = event
+
+        for enricher in self.enrichers:
+            try:
+                modified_event = enricher(enriched_event)
+                if modified_event is not None:
+                    enriched_event = modified_event
+            except EventEmissionExit:
+                raise
+            except Exception:  # pylint: disable=broad-except
+                LOG.exception(
+                    'Failed to execute enricher: %s', str(enricher)
+                )
+
+        return enriched_event
+
+    def drain(self, method, timeout=None):
+        """
+        Drain the processors, wait for the queued events to be enriched and sent, then drain the enrichers and backends.
+
+        When closing, events sent afterwards are dropped. Returns the number of events that could not be sent before
+        the deadline.
+        """
+        deadline = shutdown.get_deadline(timeout)
+        lost = shutdown.drain_components(self.processors, method, deadline)
+        if method == shutdown.CLOSE:
+            lost += self.pool.close(shutdown.remaining(deadline))
+        else:
+            lost += self.pool.wait(shutdown.remaining(deadline))
+        lost += shutdown.drain_components(self.enrichers, method, deadline)
+        lost += shutdown.drain_components(self.backends.values(), method, deadline)
+        return lost
+
+    @property
+    def metrics(self):
+        """A dictionary describing the current state of the enrichment queue"""
+        return self.pool.metrics
+
+
+class CachingEnricher(object):
+    """
+    Base class for enrichers that add data looked up from a slow source, such as a database, to events.
+
+    Subclasses implement `get_cache_key()`, `lookup()` and `apply()`. The value returned by `lookup()` is cached using
+    the key returned by `get_cache_key()`, so the slow source is only queried once for all events sharing a key until
+    the cached value expires.
+
+    Enrichers run on long lived worker threads, which never go through the Django request cycle that discards database
+    connections that timed out or were closed by the server. Enrichers that query the database through the Django ORM
+    should call `django.db.close_old_connections()` in `lookup()` before querying.
+
+    `cache_size` is the maximum number of values kept in memory.
+    `cache_ttl` is the number of seconds a value is kept in memory, values never expire if it is `None`.
+    """
+
+    def __init__(self, cache_size=1000, cache_ttl=None, **_kwargs):
+        self.cache = LRUCache(max_size=cache_size, ttl=cache_ttl)
+
+    def __call__(self, event):
+        key = self.get_cache_key(event)
+        if key is None:
+            return event
+
+        value = self.cache.get(key)
+        if value is None:
+            value = self.lookup(key)
+            if value is None:
+                return event
+            self.cache.set(key, value)
+
+        return self.apply(event, value)
+
+    def get_cache_key(self, event):
+        """Return the key identifying the data to add to `event`, or `None` to leave the event unchanged"""
+        raise NotImplementedError
+
+    def lookup(self, key):
+        """Return the data identified by `key` from the slow source, or `None` if there is no such data"""
+        raise NotImplementedError
+
+    def apply(self, event, value):
+        """Add `value` to `event` and return the event"""
+        raise NotImplementedError
+
+    def invalidate(self, key):
+        """Discard the cached data identified by `key`, it will be looked up again for the next event"""
+        self.cache.delete(key)
@@ -0,0 +1,206 @@
+"""Event tracking backend that hands events off to a collector process over a local datagram socket"""
+
+from __future__ import absolute_import
+
+from datetime import date, datetime
+import errno
+import json
+import logging
+import os
+import socket
+import struct
+
+from eventtracking.backends.logger import DateTimeJSONEncoder
+
+log = logging.getLogger(__name__)
+
+SOCKET_UNIX = 'unix'
+SOCKET_UDP = 'udp'
+
+# Each frame is the length of the encoded event, as a 4 byte big-endian unsigned integer, followed by the event
+FRAME_HEADER = struct.Struct('!I')
+
+# The largest payload of a UDP datagram
+MAX_DATAGRAM_SIZE = 65507
+
+# Keys of the objects that datetimes and dates are encoded as, see `TaggedJSONEncoder`
+DATETIME_TAG = '$datetime'
+DATE_TAG = '$date'
+
+# Errors raised when the collector isn't running or can't keep up, the events are dropped
+DROPPED_ERRNOS = frozenset([
+    errno.EAGAIN, errno.EWOULDBLOCK, errno.ENOBUFS, errno.ECONNREFUSED, errno.ENOENT, errno.EMSGSIZE
+])
+
+
+class TaggedJSONEncoder(DateTimeJSONEncoder):
+    """
+    JSON encoder that tags datetime and date objects so that they can be decoded as such.
+
+    Datetimes are encoded as `{"$datetime": "<ISO 8601 datetime in UTC>"}` and dates as `{"$date": "<ISO 8601 date>"}`,
+    wherever they appear in the event. See `eventtracking.collector.decode_event()`.
+    """
+
+    def default(self, obj):  # pylint: disable=method-hidden
+        if isinstance(obj, datetime):
+            return {DATETIME_TAG: super(TaggedJSONEncoder, self).default(obj)}
+        elif isinstance(obj, date):
+            return {DATE_TAG: super(TaggedJSONEncoder, self).default(obj)}
+        return super(TaggedJSONEncoder, self).default(obj)
+
+
+def encode_event(event):
+    """Encode an event as a length prefixed frame"""
+    encoded = json.dumps(event, cls=TaggedJSONEncoder, separators=(',', ':')).encode('utf-8')
+    return FRAME_HEADER.pack(len(encoded)) + encoded
+
+
+def decode_frames(datagram):
+    """
+    Split a datagram into the encoded events it contains.
+
+    Raises a `ValueError` if the datagram is truncated.
+    """
+    frames = []
+    offset = 0
+    while offset < len(datagram):
+        if offset + FRAME_HEADER.size > len(datagram):
+            raise ValueError('Truncated frame header')
+        (length,) = FRAME_HEADER.unpack_from(datagram, offset)
+        offset += FRAME_HEADER.size
+        if offset + length > len(datagram):
+            raise ValueError('Truncated frame')
+        frames.append(datagram[offset:offset + length])
+        offset += length
+    return frames
+
+
+def create_socket(socket_type):
+    """Create a datagram socket of the given type, either "unix" or "udp" """
+    if socket_type == SOCKET_UNIX:
+        return socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    elif socket_type == SOCKET_UDP:
+        return socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    raise ValueError('Unknown socket type %s' % socket_type)
+
+
+class SocketForwardingBackend(object):
+    """
+    Forward events to a collector process (see `eventtracking.collector`) over a local datagram socket.
+
+    The only work done in the emitting process is encoding the event and a single non-blocking `sendto()`, the
+    collector runs the real backends. Events are dropped, and counted, when the collector isn't running or its socket
+    buffer is full, so a slow or missing collector never blocks the emitting process.
+
+    Datetimes and dates are tagged when the event is encoded, so they are decoded as datetimes by the collector,
+    naive datetimes are assumed to be in UTC. Dictionaries in the event with a single "$datetime" or "$date" key are
+    decoded as datetimes and dates too.
+
+    Events sent together using `send_batch()` are packed into as few datagrams as possible. Events too large to fit in
+    a datagram are dropped.
+
+    `address` is the path of a Unix socket, or a `[host, port]` pair for UDP.
+    `socket_type` is either "unix" (the default) or "udp". Unix sockets never silently lose datagrams, so they are
+        preferred when the collector runs on the same host.
+    `max_datagram_size` is the maximum number of bytes sent in a single datagram.
+    """
+
+    def __init__(self, address=None, socket_type=SOCKET_UNIX, max_datagram_size=MAX_DATAGRAM_SIZE, **_kwargs):
+        if address is None:
+            raise ValueError('The SocketForwardingBackend requires an address.')
+
+        self.address = address if socket_type == SOCKET_UNIX else tuple(address)
+        self.socket_type = socket_type
+        self.max_datagram_size = max_datagram_size
+
+        self.sent_events = 0
+        self.dropped_events = 0
+
+        # Fail early on invalid configuration
+        create_socket(socket_type).close()
+
+        self._socket = None
+        self._pid = None
+        self._failing = False
+
+    @property
+    def socket(self):
+        """A non-blocking socket owned by the current process"""
+        if self._socket is None or self._pid != os.getpid():
+            sock = create_socket(self.socket_type)
+            sock.setblocking(False)
+            self._socket = sock
+            self._pid = os.getpid()
+        return self._socket
+
+    def send(self, event):
+        """Forward the event to the collector"""
+        self._send_frames([self._encode(event)])
+
+    def send_batch(self, events):
+        """Forward several events to the collector, packed into as few datagrams as possible"""
+        self._send_frames([self._encode(event) for event in events])
+
+    def _encode(self, event):
+        """Encode an event, returns None if it can't be encoded"""
+        try:
+            return encode_event(event)
+        except (TypeError, ValueError):
+            log.exception('Unable to encode event %s', event.get('name'))
+            return None
+
+    def _send_frames(self, frames):
+        """Pack the frames into datagrams and send them"""
+        datagram = []
+        datagram_size = 0
+        for frame in frames:
+            if frame is None:
+                self.dropped_events += 1
+                continue
+
+            if len(frame) > self.max_datagram_size:
+                log.warning('Dropped an event of %d bytes, which is too large to forward', len(frame))
+                self.dropped_events += 1
+                continue
+
+            if datagram_size + len(frame) > self.max_datagram_size:
+                self._send_datagram(datagram)
+                datagram = []
+                datagram_size = 0
+
+            datagram.append(frame)
+            datagram_size += len(frame)
+
+        if datagram:
+            self._send_datagram(datagram)
+
+    def _send_datagram(self, frames):
+        """Send a single datagram containing the frames"""
+        try:
+            self.socket.sendto(b''.join(frames), self.address)
+        except socket.error as error:
+            if error.errno not in DROPPED_ERRNOS:
+                raise
+            self.dropped_events += len(frames)
+            if not self._failing:
+                log.warning('Unable to forward events to the collector at %s: %s', self.address, error)
+            self._failing = True
+        else:
+            self.sent_events += len(frames)
+            if self._failing:
+                log.info('Resumed forwarding events to the collector at %s', self.address)
+            self._failing = False
+
+    def close(self, timeout=None):  # pylint: disable=unused-argument
+        """Close the socket, events sent afterwards open a new one"""
+        if self._socket is not None and self._pid == os.getpid():
+            self._socket.close()
+        self._socket = None
+
+    @property
+    def metrics(self):
+        """A dictionary describing the number of events forwarded"""
+        return {
+            'sent_events': self.sent_events,
+            'dropped_events': self.dropped_events,
+        }
@@ -2,16 +2,23 @@
 
 from __future__ import absolute_import
 
+from datetime import datetime
+import calendar
 import logging
 
 import pymongo
 from pymongo import MongoClient
-from pymongo.errors import PyMongoError
+from pymongo.errors import ConnectionFailure, PyMongoError
 from bson.errors import BSONError
+from pytz import UTC
 
+from eventtracking.backends.breaker import CircuitBreaker
 
 log = logging.getLogger(__name__)
 
+BUCKET_EVENTS_FIELD = 'events'
+BUCKET_SIZE_FIELD = 'bucket_size'
+
 
 class MongoBackend(object):
     """Class for a MongoDB event tracker Backend"""
@@ -29,6 +36,38 @@ class MongoBackend(object):
           - `database`: name of the database
           - `collection`: name of the collection
           - `extra`: parameters to pymongo.MongoClient not listed above
+          - `failure_threshold`: number of consecutive connection failures
+            after which events are no longer sent to MongoDB for a while
+          - `reset_timeout`: number of seconds to wait before trying to
+            send events to MongoDB again after it became unavailable
+          - `fallback`: optional backend that receives events that could
+            not be sent to MongoDB
+          - `bucket_events`: names of high frequency events that should be
+            stored in buckets, see below
+          - `bucket_window`: length in seconds of the time window covered
+            by a single bucket
+          - `bucket_size`: maximum number of events stored in a single
+            bucket
+
+        Events whose names are listed in `bucket_events` are not stored as
+        individual documents. Instead all events with the same name that
+        occurred in the same `bucket_window` are packed into a single
+        document that looks like this::
+
+            {
+                'name': 'some.event.name',
+                'time': <start of the time window>,
+                'bucket_size': 2,
+                'events': [
+                    {'time': ..., 'context': {...}, 'data': {...}},
+                    {'time': ..., 'context': {...}, 'data': {...}}
+                ]
+            }
+
+        Each entry in `events` is the original event without its name. Once a
+        bucket holds `bucket_size` events a new bucket is started for the same
+        window. Use `find()` to read events back regardless of how they were
+        stored.
 
         """
 
@@ -70,6 +109,17 @@ class MongoBackend(object):
 
         self.collection = self.database[collection_name]
 
+        self.breaker = CircuitBreaker(
+            name='mongodb:{0}.{1}'.format(db_name, collection_name),
+            failure_threshold=kwargs.get('failure_threshold', 5),
+            reset_timeout=kwargs.get('reset_timeout', 30)
+        )
+        self.fallback = kwargs.get('fallback')
+
+        self.bucket_events = frozenset(kwargs.get('bucket_events') or [])
+        self.bucket_window = kwargs.get('bucket_window', 60)
+        self.bucket_size = kwargs.get('bucket_size', 100)
+
         self._create_indexes()
 
     def _create_indexes(self):
@@ -83,15 +133,163 @@ class MongoBackend(object):
         # run the indexing on the background, without locking.
         self.collection.ensure_index([('time', pymongo.DESCENDING)])
         self.collection.ensure_index('name')
+        if self.bucket_events:
+            # Used to find the open bucket for an event
+            self.collection.ensure_index([('name', pymongo.ASCENDING), ('time', pymongo.DESCENDING)])
+
+    def warm_up(self):
+        """Check that the MongoDB server can be reached, raises a `PyMongoError` if it can't"""
+        self.connection.admin.command('ping')
+        return True
 
     def send(self, event):
-        """Insert the event in to the Mongo collection"""
+        """
+        Insert the event in to the Mongo collection.
+
+        While MongoDB is unavailable the event is not inserted, instead it is
+        passed to the fallback backend if one was configured.
+        """
+        if not self.breaker.allow():
+            self._send_to_fallback(event)
+            return
+
         try:
-            self.collection.insert(event, manipulate=False)
-        except (PyMongoError, BSONError):
+            if event.get('name') in self.bucket_events:
+                self._add_to_bucket(event)
+            else:
+                self.collection.insert(event, manipulate=False)
+        except BSONError:
+            # The event itself could not be encoded, this says nothing
+            # about the health of the database.
+            log.exception('Error encoding event for MongoDB event tracker backend')
+            self.breaker.release()
+        except PyMongoError:
             # The event will be lost in case of a connection error or any error
-            # that occurs when trying to insert the event into Mongo.
+            # that occurs when trying to insert the event into Mongo, unless a
+            # fallback backend was configured.
             # pymongo will re-connect/re-authenticate automatically
             # during the next event.
             msg = 'Error inserting to MongoDB event tracker backend'
             log.exception(msg)
+            self.breaker.record_failure()
+            self._send_to_fallback(event)
+        else:
+            self.breaker.record_success()
+
+    def send_batch(self, events):
+        """
+        Insert several events in to the Mongo collection using a single request.
+
+        Events that are stored in buckets are added to their buckets one at a
+        time. If any of the events can't be encoded the others are inserted
+        individually.
+
+        The batch is inserted with `continue_on_error`, so a single event that
+        is rejected by the server does not prevent the others from being
+        inserted. Rejected events are logged and dropped. If the connection
+        fails the whole batch is passed to the fallback backend, since there is
+        no way to tell which of the events were inserted before it failed, so
+        the fallback may receive some events that were also stored in Mongo.
+        """
+        documents = []
+        for event in events:
+            if event.get('name') in self.bucket_events:
+                self.send(event)
+            else:
+                documents.append(event)
+
+        if len(documents) <= 1:
+            for event in documents:
+                self.send(event)
+            return
+
+        if not self.breaker.allow():
+            for event in documents:
+                self._send_to_fallback(event)
+            return
+
+        try:
+            self.collection.insert(documents, manipulate=False, continue_on_error=True)
+        except BSONError:
+            log.exception('Error encoding batch of events for MongoDB event tracker backend, inserting them one by one')
+            # Let the individual inserts probe the database if this batch was the probe of the breaker
+            self.breaker.release()
+            for event in documents:
+                self.send(event)
+        except ConnectionFailure:
+            log.exception('Error inserting batch of events to MongoDB event tracker backend')
+            self.breaker.record_failure()
+            for event in documents:
+                self._send_to_fallback(event)
+        except PyMongoError:
+            # The server received the whole batch and inserted every event it didn't reject
+            log.exception(
+                'Error inserting some of a batch of %d events to MongoDB event tracker backend', len(documents)
+            )
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+
+    def _add_to_bucket(self, event):
+        """Append the event to the bucket for its name and time window, creating the bucket if necessary"""
+        entry = dict(event)
+        name = entry.pop('name')
+
+        self.collection.update(
+            {
+                'name': name,
+                'time': self._get_window_start(event),
+                BUCKET_SIZE_FIELD: {'$lt': self.bucket_size}
+            },
+            {
+                '$push': {BUCKET_EVENTS_FIELD: entry},
+                '$inc': {BUCKET_SIZE_FIELD: 1}
+            },
+            upsert=True
+        )
+
+    def _get_window_start(self, event):
+        """The start of the bucket time window that contains the event"""
+        timestamp = event.get('time') or event.get('timestamp')
+        if not isinstance(timestamp, datetime):
+            timestamp = datetime.now(UTC)
+        elif timestamp.tzinfo is not None:
+            timestamp = timestamp.astimezone(UTC)
+
+        seconds = calendar.timegm(timestamp.utctimetuple())
+        return datetime.fromtimestamp(seconds - (seconds % self.bucket_window), UTC)
+
+    def find(self, spec=None, **kwargs):
+        """
+        Iterate over the events stored in the collection.
+
+        `spec` and any keyword arguments are passed to `pymongo.collection.Collection.find`. Buckets are transparently
+        unpacked into the individual events they contain. Note that the query is matched against the stored documents,
+        so only the `name` and `time` fields of bucketed events can be used to select them, and `time` refers to the
+        start of the bucket time window.
+        """
+        for document in self.collection.find(spec, **kwargs):
+            if BUCKET_SIZE_FIELD in document and BUCKET_EVENTS_FIELD in document:
+                for entry in document[BUCKET_EVENTS_FIELD]:
+                    event = dict(entry)
+                    event['name'] = document['name']
+                    yield event
+            else:
+                yield document
+
+    def _send_to_fallback(self, event):
+        """Send an event that could not be inserted into Mongo to the fallback backend, if any"""
+        if self.fallback is None:
+            return
+
+        try:
+            self.fallback.send(event)
+        except Exception:  # pylint: disable=broad-except
+            log.exception('Unable to send event to the MongoDB fallback backend')
+
+    @property
+    def metrics(self):
+        """A dictionary describing the health of this backend"""
+        return {
+            'breaker': self.breaker.metrics
+        }
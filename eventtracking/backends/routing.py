@@ -3,7 +3,10 @@
 from collections import OrderedDict
 import logging
 
+from eventtracking.cache import LRUCache
+from eventtracking.patterns import NamePatternMatcher
 from eventtracking.processors.exceptions import EventEmissionExit
+from eventtracking import shutdown
 
 LOG = logging.getLogger(__name__)
 
@@ -22,6 +25,12 @@ class RoutingBackend(object):
        event from being emitted by raising `EventEmissionExit`. Doing so will prevent any subsequent processors from
        running and prevent the event from being sent to the backends. Any other exception raised by a processor will be
        logged and swallowed, subsequent processors will execute and the event will be emitted.
+
+       A processor that is only interested in some events can declare the names of those events in an `event_names`
+       attribute, a list, tuple or set of event names or patterns (see `eventtracking.patterns`). It will then only be
+       called for events whose name matches. The chain of processors that apply to each event name is computed once
+       and cached, so events that no processor cares about skip processing entirely. The chain is selected using the
+       name of the event before any processor runs, and processors must be added using `register_processor()`.
     2) Backends - Backends are intended to not mutate the event and each receive the same event data. They are not
        chained like processors. Once an event has been processed by the processor chain, it is passed to each backend in
        the order that they were registered. Backends typically persist the event in some way, either by sending it
@@ -29,18 +38,28 @@ class RoutingBackend(object):
        backend will block other backends until it is done persisting the event. Note that you can register another
        `RoutingBackend` as a backend of a `RoutingBackend`, allowing for arbitrary processing trees.
 
+    Processors and backends that hold events in memory can be drained using `flush()` and `close()`, which call the
+    methods of the same name of each processor and then each backend, recursing through nested routers.
+
+    Several events can be routed together using `send_batch()`. Each event is processed individually, then the events
+    that were not filtered out are passed together to the `send_batch(events)` method of every backend that has one.
+    Other backends receive them one at a time.
+
     `backends` is a collection that supports iteration over its items using `iteritems()`. The keys are expected to be
         sortable and the values are expected to expose a `send(event)` method that will be called for each event. Each
         backend in this collection is registered in order sorted alphanumeric ascending by key.
     `processors` is an iterable of callables.
+    `chain_cache_size` is the maximum number of event names whose processor chains are cached.
 
     Raises a `ValueError` if any of the provided backends do not have a callable "send" attribute or any of the
         processors are not callable.
     """
 
-    def __init__(self, backends=None, processors=None):
+    def __init__(self, backends=None, processors=None, chain_cache_size=1000):
         self.backends = OrderedDict()
         self.processors = []
+        self.processor_chains = LRUCache(max_size=chain_cache_size)
+        self._matchers = {}
 
         if backends is not None:
             for name in sorted(backends.keys()):
@@ -70,7 +89,27 @@ class RoutingBackend(object):
         if not callable(processor):
             raise ValueError('Processor %s is not callable.' % processor.__class__.__name__)
         else:
+            event_names = getattr(processor, 'event_names', None)
+            if isinstance(event_names, (list, tuple, set, frozenset)):
+                self._matchers[id(processor)] = NamePatternMatcher(event_names)
             self.processors.append(processor)
+            self.processor_chains.clear()
+
+    def get_processor_chain(self, name):
+        """The processors that apply to events with the given name, in the order they were registered"""
+        try:
+            chain = self.processor_chains.get(name)
+        except TypeError:
+            # Unhashable names can't be cached
+            return self.processors
+
+        if chain is None:
+            chain = tuple(
+                processor for processor in self.processors
+                if id(processor) not in self._matchers or self._matchers[id(processor)].matches(name)
+            )
+            self.processor_chains.set(name, chain)
+        return chain
 
     def send(self, event):
         """
@@ -85,6 +124,24 @@ class RoutingBackend(object):
         else:
             self.send_to_backends(processed_event)
 
+    def send_batch(self, events):
+        """
+        Process each of the events using all registered processors and send them together to all registered backends.
+
+        Logs and swallows all `Exception`. Returns the largest number of the events that one of the backends could not
+        send, see `send_batch_to_backends()`. Events dropped by the processors are not counted.
+        """
+        processed_events = []
+        for event in events:
+            try:
+                processed_events.append(self.process_event(event))
+            except EventEmissionExit:
+                continue
+
+        if not processed_events:
+            return 0
+        return self.send_batch_to_backends(processed_events)
+
     def process_event(self, event):
         """
 
@@ -100,9 +157,13 @@ class RoutingBackend(object):
         if len(self.processors) == 0:
             return event
 
+        chain = self.get_processor_chain(event.get('name'))
+        if not chain:
+            return event
+
         processed_event = event
 
-        for processor in self.processors:
+        for processor in chain:
             try:
                 modified_event = processor(processed_event)
                 if modified_event is not None:
@@ -130,3 +191,65 @@ class RoutingBackend(object):
                 LOG.exception(
                     'Unable to send event to backend: %s', name
                 )
+
+    def send_batch_to_backends(self, events):
+        """
+        Sends the events to all registered backends, using a single call for backends that support batches.
+
+        Logs and swallows all `Exception`. Returns the largest number of the events that one of the backends could not
+        send. Backends with a `send_batch()` method can report how many events they could not send by returning an
+        integer, they are assumed to have sent all of them if they return anything else.
+        """
+        failed = 0
+        for name, backend in self.backends.iteritems():
+            send_batch = getattr(backend, 'send_batch', None)
+            if not callable(send_batch):
+                backend_failed = 0
+                for event in events:
+                    try:
+                        backend.send(event)
+                    except Exception:  # pylint: disable=broad-except
+                        LOG.exception(
+                            'Unable to send event to backend: %s', name
+                        )
+                        backend_failed += 1
+                failed = max(failed, backend_failed)
+                continue
+
+            try:
+                backend_failed = send_batch(events)
+            except Exception:  # pylint: disable=broad-except
+                LOG.exception(
+                    'Unable to send %d events to backend: %s', len(events), name
+                )
+                backend_failed = len(events)
+
+            if isinstance(backend_failed, (int, long)) and not isinstance(backend_failed, bool):
+                failed = max(failed, min(backend_failed, len(events)))
+
+        return failed
+
+    def flush(self, timeout=None):
+        """
+        Flush all processors and then all backends, sharing a deadline of `timeout` seconds.
+
+        Processors are flushed first since they may emit events, such as aggregates, when they are flushed.
+
+        Returns the number of events that could not be sent before the deadline.
+        """
+        return self.drain(shutdown.FLUSH, timeout)
+
+    def close(self, timeout=None):
+        """
+        Flush and close all processors and then all backends, sharing a deadline of `timeout` seconds.
+
+        Returns the number of events that could not be sent before the deadline.
+        """
+        return self.drain(shutdown.CLOSE, timeout)
+
+    def drain(self, method, timeout=None):
+        """Call the `method` method, either "flush" or "close", of all processors and then all backends"""
+        deadline = shutdown.get_deadline(timeout)
+        lost = shutdown.drain_components(self.processors, method, deadline)
+        lost += shutdown.drain_components(self.backends.values(), method, deadline)
+        return lost
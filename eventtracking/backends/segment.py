@@ -2,6 +2,9 @@
 
 from __future__ import absolute_import
 
+from eventtracking.backends.buffer import EventBuffer
+from eventtracking.projection import FieldProjection
+
 try:
     import analytics
 except ImportError:
@@ -32,11 +35,48 @@ class SegmentBackend(object):
             }
         }
 
-    Note that although some parts of the event are lifted out to pass explicitly into the Segment.com API, the entire
-    event is sent as the payload to segment.com, which includes all context, data and other fields in the event.
+    Note that although some parts of the event are lifted out to pass explicitly into the Segment.com API, by default
+    the entire event is sent as the payload to segment.com, which includes all context, data and other fields in the
+    event. Use `properties` to only send the fields segment.com actually needs. It maps event names to lists of dotted
+    paths of the fields to send for events with that name, the special name "*" applies to all other events::
+
+        {
+            'edx.video.played': ['name', 'context.course_id', 'data.id'],
+            '*': ['name', 'context.course_id']
+        }
+
+    Events whose names don't appear in `properties`, when there is no "*" entry, are sent in their entirety.
+
+    By default events are handed straight to the segment.com API, which queues them internally. When `batch_size` is
+    set, events are instead held in a bounded buffer owned by this backend and passed to the API in batches, after which
+    the API is asked to flush its own queue. This bounds memory usage and makes the queue observable through `metrics`.
 
+    `batch_size` is the maximum number of events passed to the API at once.
+    `flush_interval` is the maximum number of seconds an event is buffered before being passed to the API.
+    `max_queue_size` is the maximum number of events held in the buffer, further events are dropped.
     """
 
+    def __init__(self, **kwargs):
+        properties = kwargs.get('properties') or {}
+        self.default_projection = None
+        self.projections = {}
+        for event_name, fields in properties.iteritems():
+            if event_name == '*':
+                self.default_projection = FieldProjection(fields)
+            else:
+                self.projections[event_name] = FieldProjection(fields)
+
+        self.buffer = None
+        batch_size = kwargs.get('batch_size')
+        if batch_size:
+            self.buffer = EventBuffer(
+                self._send_batch,
+                name='segment',
+                batch_size=batch_size,
+                flush_interval=kwargs.get('flush_interval', 1.0),
+                max_size=kwargs.get('max_queue_size', 10000)
+            )
+
     def send(self, event):
         """Use the segment.com python API to send the event to segment.com"""
         if analytics is None:
@@ -56,9 +96,54 @@ class SegmentBackend(object):
                 'clientId': ga_client_id
             }
 
+        projection = self.projections.get(name, self.default_projection)
+        properties = event if projection is None else projection(event)
+
+        if self.buffer is not None:
+            self.buffer.add((user_id, name, properties, segment_context))
+            return
+
         analytics.track(
             user_id,
             name,
-            event,
+            properties,
             context=segment_context
         )
+
+    def _send_batch(self, batch):
+        """Pass a batch of buffered events to the segment.com API and wait for it to send them"""
+        for user_id, name, properties, segment_context in batch:
+            analytics.track(
+                user_id,
+                name,
+                properties,
+                context=segment_context
+            )
+        analytics.flush()
+
+    def flush(self, timeout=None):
+        """
+        Send all buffered events to segment.com, giving up once `timeout` seconds have passed.
+
+        Returns the number of events that were still buffered at the deadline.
+        """
+        if self.buffer is None:
+            return 0
+        return self.buffer.flush(timeout)
+
+    def close(self, timeout=None):
+        """
+        Send all buffered events to segment.com and stop buffering, giving up once `timeout` seconds have passed.
+
+        Returns the number of events that could not be sent before the deadline, they are lost.
+        """
+        if self.buffer is None:
+            return 0
+        return self.buffer.close(timeout)
+
+    @property
+    def metrics(self):
+        """A dictionary describing the state of the event buffer"""
+        if self.buffer is None:
+            return {}
+        return self.buffer.metrics
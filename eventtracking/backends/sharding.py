@@ -0,0 +1,239 @@
+"""Spread events across several backends, such as multiple MongoDB servers, using consistent hashing"""
+
+from __future__ import absolute_import
+
+from bisect import bisect
+from collections import defaultdict
+import hashlib
+import logging
+import struct
+import threading
+
+from eventtracking import shutdown
+from eventtracking import warmup
+from eventtracking.projection import get_field, split_path
+
+LOG = logging.getLogger(__name__)
+
+HASH_FORMAT = struct.Struct('>Q')
+
+
+def hash_key(key):
+    """Map a string to a 64 bit integer that is stable across processes and Python versions"""
+    if isinstance(key, unicode):
+        key = key.encode('utf-8')
+    return HASH_FORMAT.unpack_from(hashlib.md5(key).digest())[0]
+
+
+class ConsistentHashRing(object):
+    """
+    Assign keys to nodes so that adding or removing a node only moves the keys of that node.
+
+    Each node is placed on the ring at `virtual_nodes` points, multiplied by its weight, which evens out the share of
+    keys each node receives. The sorted positions of all points are precomputed when the nodes change, so looking up a
+    key is a binary search.
+    """
+
+    def __init__(self, virtual_nodes=100):
+        self.virtual_nodes = virtual_nodes
+        self.weights = {}
+        self._ring = ((), ())
+        self._lock = threading.Lock()
+
+    def add_node(self, node, weight=1):
+        """Add a node, or change its weight if it is already part of the ring"""
+        with self._lock:
+            self.weights[node] = weight
+            self._build()
+
+    def remove_node(self, node):
+        """Remove a node, its keys are spread across the remaining nodes"""
+        with self._lock:
+            self.weights.pop(node, None)
+            self._build()
+
+    def _build(self):
+        """Precompute the sorted positions of the virtual nodes"""
+        points = []
+        for node, weight in self.weights.iteritems():
+            for index in xrange(int(self.virtual_nodes * weight)):
+                points.append((hash_key('{0}#{1}'.format(node, index)), node))
+        points.sort()
+
+        # Replace both sequences at once so concurrent lookups never see a partially built ring
+        self._ring = (tuple(point for point, _node in points), tuple(node for _point, node in points))
+
+    def get_node(self, key):
+        """The node that `key`, a string, is assigned to, or None if the ring is empty"""
+        points, nodes = self._ring
+        if not points:
+            return None
+        index = bisect(points, hash_key(key))
+        if index == len(points):
+            index = 0
+        return nodes[index]
+
+    def __len__(self):
+        return len(self.weights)
+
+
+class ShardedBackend(object):
+    """
+    Send each event to one of several backends, chosen by a consistent hash of some of the fields of the event.
+
+    All events sharing the same values for the `shard_key` fields, for example all of the events of a user, are sent to
+    the same backend. Adding a shard with `add_shard()` only moves the keys that are assigned to the new shard, roughly
+    1/N of them, the rest keep going to the shard they were already sent to. Data already stored by the backends is
+    not moved.
+
+    Events are sent to exactly one shard. Events missing all of the `shard_key` fields are all sent to the same shard.
+
+    Example::
+
+        EVENT_TRACKING_BACKENDS = {
+            'mongo': {
+                'ENGINE': 'eventtracking.backends.sharding.ShardedBackend',
+                'OPTIONS': {
+                    'shard_key': ['context.user_id', 'context.course_id'],
+                    'backends': {
+                        'shard0': {'ENGINE': 'eventtracking.backends.mongodb.MongoBackend', 'OPTIONS': {...}},
+                        'shard1': {'ENGINE': 'eventtracking.backends.mongodb.MongoBackend', 'OPTIONS': {...}},
+                    }
+                }
+            }
+        }
+
+    `backends` is a dictionary mapping shard names to backends. The names determine the position of the shards on the
+        hash ring, so renaming a shard moves its keys.
+    `shard_key` is a dotted path, or a list of dotted paths, to the fields used to choose the shard.
+    `virtual_nodes` is the number of points each shard occupies on the hash ring.
+    `weights` is an optional dictionary mapping shard names to their relative share of the events, 1 by default.
+    """
+
+    def __init__(self, backends=None, shard_key='context.user_id', virtual_nodes=100, weights=None, **_kwargs):
+        if isinstance(shard_key, basestring):
+            shard_key = [shard_key]
+        self.shard_key = [split_path(path) for path in shard_key]
+        self.weights = weights or {}
+
+        self.backends = {}
+        self.sent_events = defaultdict(int)
+        self.ring = ConsistentHashRing(virtual_nodes=virtual_nodes)
+
+        if backends is not None:
+            for name in sorted(backends.keys()):
+                self.add_shard(name, backends[name])
+
+    def add_shard(self, name, backend, weight=None):
+        """
+        Start sending events to a new shard.
+
+        Raises a `ValueError` if the backend does not have a callable "send" method.
+        """
+        if not hasattr(backend, 'send') or not callable(backend.send):
+            raise ValueError('Backend %s does not have a callable "send" method.' % backend.__class__.__name__)
+
+        if weight is None:
+            weight = self.weights.get(name, 1)
+        self.backends[name] = backend
+        self.ring.add_node(name, weight)
+
+    def remove_shard(self, name):
+        """Stop sending events to a shard, its keys are spread across the remaining shards. Returns the backend."""
+        self.ring.remove_node(name)
+        return self.backends.pop(name)
+
+    def get_key(self, event):
+        """The string identifying the shard of the event"""
+        return u'|'.join(unicode(get_field(event, keys, u'')) for keys in self.shard_key)
+
+    def get_shard(self, event):
+        """The name of the shard the event is sent to, or None if there are no shards"""
+        return self.ring.get_node(self.get_key(event))
+
+    def send(self, event):
+        """Send the event to its shard"""
+        name = self.get_shard(event)
+        if name is None:
+            LOG.warning('Dropped event %s, there are no shards', event.get('name'))
+            return
+
+        backend = self.backends.get(name)
+        if backend is None:
+            # The shard was removed after it was looked up
+            LOG.warning('Dropped event %s, shard %s was removed', event.get('name'), name)
+            return
+
+        backend.send(event)
+        self.sent_events[name] += 1
+
+    def send_batch(self, events):
+        """
+        Send the events to their shards, using a single call for shards that support batches.
+
+        Returns the number of events that could not be sent, see
+        `eventtracking.backends.routing.RoutingBackend.send_batch_to_backends()`.
+        """
+        batches = defaultdict(list)
+        for event in events:
+            batches[self.get_shard(event)].append(event)
+
+        failed = 0
+        for name, batch in batches.iteritems():
+            if name is None:
+                LOG.warning('Dropped %d events, there are no shards', len(batch))
+                failed += len(batch)
+                continue
+
+            backend = self.backends.get(name)
+            if backend is None:
+                LOG.warning('Dropped %d events, shard %s was removed', len(batch), name)
+                failed += len(batch)
+                continue
+
+            try:
+                send_batch = getattr(backend, 'send_batch', None)
+                if callable(send_batch):
+                    batch_failed = send_batch(batch)
+                else:
+                    for event in batch:
+                        backend.send(event)
+                    batch_failed = 0
+            except Exception:  # pylint: disable=broad-except
+                LOG.exception('Unable to send %d events to shard: %s', len(batch), name)
+                failed += len(batch)
+                continue
+
+            if not isinstance(batch_failed, (int, long)) or isinstance(batch_failed, bool):
+                batch_failed = 0
+            batch_failed = min(batch_failed, len(batch))
+            failed += batch_failed
+            self.sent_events[name] += len(batch) - batch_failed
+
+        return failed
+
+    def warm_up(self):
+        """
+        Initialize and health-check all of the shards concurrently, see `eventtracking.warmup`.
+
+        Raises a `RuntimeError` listing the shards that failed or did not finish.
+        """
+        results = warmup.warm_up(dict(self.backends))
+        failed = sorted(name for name, result in results.iteritems() if result['status'] != warmup.STATUS_OK)
+        if failed:
+            raise RuntimeError('Unable to warm up shards: {0}'.format(', '.join(failed)))
+
+    def flush(self, timeout=None):
+        """Flush all shards, sharing a deadline of `timeout` seconds. Returns the number of events lost."""
+        return shutdown.drain_components(self.backends.values(), shutdown.FLUSH, shutdown.get_deadline(timeout))
+
+    def close(self, timeout=None):
+        """Close all shards, sharing a deadline of `timeout` seconds. Returns the number of events lost."""
+        return shutdown.drain_components(self.backends.values(), shutdown.CLOSE, shutdown.get_deadline(timeout))
+
+    @property
+    def metrics(self):
+        """A dictionary containing the number of events sent to each shard"""
+        return {
+            'sent_events': dict(self.sent_events),
+        }
@@ -0,0 +1,380 @@
+"""Test the AWS Lambda backend"""
+
+from __future__ import absolute_import
+
+import json
+from unittest import TestCase
+
+from django.db.models.signals import post_save
+from django.test.utils import override_settings
+from mock import MagicMock
+from mock import patch
+
+from eventtracking.backends.awslambda import AwsLambdaBackend
+from eventtracking.backends.awslambda import StandInLambdaClient
+
+
+class FakeUser(object):
+    """A user model instance"""
+
+    class DoesNotExist(Exception):
+        """Raised when no user can be found"""
+        pass
+
+    def __init__(self, pk, email, username):
+        self.pk = pk  # pylint: disable=invalid-name
+        self.email = email
+        self.username = username
+
+
+class AwsLambdaTestCase(TestCase):
+    """Patches out boto3 and the user model used by the AWS Lambda backend"""
+
+    def setUp(self):
+        settings_override = override_settings(
+            AWS_EVENT_TRACKER_ARN='arn:aws:lambda:us-west-2:123456789012:function:events',
+            AWS_ACCESS_KEY_ID='access',
+            AWS_SECRET_ACCESS_KEY='secret'
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        boto3_patcher = patch('boto3.client')
+        self.addCleanup(boto3_patcher.stop)
+        self.mock_boto3_client = boto3_patcher.start()
+        self.mock_client = self.mock_boto3_client.return_value
+
+        user_patcher = patch('django.contrib.auth.models.User')
+        self.addCleanup(user_patcher.stop)
+        self.mock_user_model = user_patcher.start()
+        self.mock_user_model.DoesNotExist = FakeUser.DoesNotExist
+
+        self.users = {
+            1: FakeUser(1, 'one@example.com', 'one'),
+            2: FakeUser(2, 'two@example.com', 'two'),
+        }
+        self.mock_filter = self.mock_user_model.objects.filter
+        self.mock_filter.side_effect = self.filter_users
+
+    def filter_users(self, pk__in):  # pylint: disable=invalid-name
+        """Look up some of the fake users, converting ids to integers like the database would"""
+        pk__in = set(int(pk) for pk in pk__in)
+        queryset = MagicMock()
+        queryset.values_list.return_value = [
+            (user.pk, user.email, user.username)
+            for user in self.users.values()
+            if user.pk in pk__in
+        ]
+        return queryset
+
+    def create_event(self, user_id=1, data_user_id=None):
+        """Build an event that can be sent to Lambda"""
+        data = {'foo': 'bar'}
+        if data_user_id is not None:
+            data['user_id'] = data_user_id
+        return {
+            'name': 'edx.test.event',
+            'context': {'user_id': user_id},
+            'data': data,
+        }
+
+    def sent_payloads(self):
+        """The decoded payloads of all Lambda invocations"""
+        return [json.loads(kwargs['Payload']) for _, _, kwargs in self.mock_client.invoke.mock_calls]
+
+
+class TestAwsLambdaBackend(AwsLambdaTestCase):
+    """Test the AWS Lambda backend"""
+
+    def setUp(self):
+        super(TestAwsLambdaBackend, self).setUp()
+        self.backend = AwsLambdaBackend()
+
+    def test_send(self):
+        self.backend.send(self.create_event())
+
+        self.assertEqual(self.sent_payloads(), [{
+            'name': 'edx.test.event',
+            'context': {'user_id': 1, 'email': 'one@example.com'},
+            'data': {'foo': 'bar', 'email': 'one@example.com', 'username': 'one'},
+        }])
+        _, _, kwargs = self.mock_client.invoke.mock_calls[0]
+        self.assertEqual(kwargs['InvocationType'], 'Event')
+
+    def test_different_data_user(self):
+        self.backend.send(self.create_event(data_user_id=2))
+
+        payload = self.sent_payloads()[0]
+        self.assertEqual(payload['context']['email'], 'one@example.com')
+        self.assertEqual(payload['data']['email'], 'two@example.com')
+        self.assertEqual(payload['data']['username'], 'two')
+
+    def test_missing_user(self):
+        self.backend.send(self.create_event(user_id=3))
+        self.backend.send(self.create_event(data_user_id=3))
+        self.assertFalse(self.mock_client.invoke.called)
+
+    def test_missing_user_id(self):
+        event = self.create_event()
+        del event['context']['user_id']
+        self.backend.send(event)
+        self.assertFalse(self.mock_client.invoke.called)
+
+    def test_users_are_cached(self):
+        for _ in range(5):
+            self.backend.send(self.create_event(data_user_id=2))
+
+        self.assertEqual(len(self.mock_client.invoke.mock_calls), 5)
+        self.assertEqual(len(self.mock_filter.mock_calls), 1)
+
+    def test_cached_user_invalidated_on_save(self):
+        self.backend.send(self.create_event())
+        self.users[1].email = 'changed@example.com'
+        post_save.send(sender=self.mock_user_model, instance=self.users[1], created=False)
+        self.backend.send(self.create_event())
+
+        self.assertEqual(self.sent_payloads()[1]['context']['email'], 'changed@example.com')
+        self.assertEqual(len(self.mock_filter.mock_calls), 2)
+
+    def test_string_user_id(self):
+        self.backend.send(self.create_event(user_id='1'))
+        self.backend.send(self.create_event(user_id='1'))
+
+        self.assertEqual(len(self.sent_payloads()), 2)
+        self.assertEqual(len(self.mock_filter.mock_calls), 1)
+
+    def test_client_created_on_first_use(self):
+        backend = AwsLambdaBackend()
+        self.assertFalse(self.mock_boto3_client.called)
+
+        backend.send(self.create_event())
+        backend.send(self.create_event())
+        self.mock_boto3_client.assert_called_once_with(
+            'lambda',
+            aws_access_key_id='access',
+            aws_secret_access_key='secret',
+            region_name='us-west-2',
+            endpoint_url=None,
+            config=None
+        )
+
+    def test_endpoint_url(self):
+        AwsLambdaBackend(endpoint_url='http://localhost:9001').warm_up()
+        _, _, kwargs = self.mock_boto3_client.mock_calls[0]
+        self.assertEqual(kwargs['endpoint_url'], 'http://localhost:9001')
+
+    def test_custom_client(self):
+        client = StandInLambdaClient()
+        backend = AwsLambdaBackend(client=client)
+        backend.send(self.create_event())
+
+        self.assertFalse(self.mock_boto3_client.called)
+        self.assertEqual(client.invocations, 1)
+        self.assertGreater(client.payload_bytes, 0)
+
+    def test_warm_up(self):
+        backend = AwsLambdaBackend()
+        self.assertTrue(backend.warm_up())
+        self.assertTrue(self.mock_boto3_client.called)
+        self.assertEqual(backend.user_model, self.mock_user_model)
+
+    def test_user_cache_options(self):
+        backend = AwsLambdaBackend(user_cache_size=10, user_cache_ttl=1)
+        self.assertEqual(backend.user_cache.max_size, 10)
+        self.assertEqual(backend.user_cache.ttl, 1)
+
+
+class TestAwsLambdaBackendBatching(AwsLambdaTestCase):
+    """Test sending batches of events to AWS Lambda"""
+
+    def setUp(self):
+        super(TestAwsLambdaBackendBatching, self).setUp()
+        self.backend = AwsLambdaBackend(batch_size=100, batch_interval=60)
+        self.addCleanup(self.backend.buffer.close)
+
+    def test_events_sent_as_array(self):
+        for _ in range(3):
+            self.backend.send(self.create_event())
+        self.assertFalse(self.mock_client.invoke.called)
+
+        self.backend.flush()
+
+        payloads = self.sent_payloads()
+        self.assertEqual(len(payloads), 1)
+        self.assertEqual(len(payloads[0]), 3)
+        self.assertEqual(payloads[0][0]['context']['email'], 'one@example.com')
+
+    def test_buffered_event_is_copied(self):
+        event = self.create_event()
+        self.backend.send(event)
+        event['data']['foo'] = 'changed'
+
+        self.backend.flush()
+
+        self.assertEqual(event, {
+            'name': 'edx.test.event',
+            'context': {'user_id': 1},
+            'data': {'foo': 'changed'},
+        })
+        self.assertEqual(self.sent_payloads()[0], [self.sent_event()])
+
+    def test_stale_connections_closed_before_batch(self):
+        self.backend.send(self.create_event())
+        with patch('eventtracking.backends.awslambda.close_old_connections') as mock_close:
+            self.backend.flush()
+        mock_close.assert_called_once_with()
+
+    def test_batches_split_by_payload_size(self):
+        event_size = len(json.dumps(self.sent_event()))
+        self.backend.batch_max_bytes = 2 * event_size + 3
+        for _ in range(5):
+            self.backend.send(self.create_event())
+
+        self.backend.flush()
+
+        self.assertEqual([len(payload) for payload in self.sent_payloads()], [2, 2, 1])
+        for _, _, kwargs in self.mock_client.invoke.mock_calls:
+            self.assertLessEqual(len(kwargs['Payload']), self.backend.batch_max_bytes)
+
+    def sent_event(self):
+        """The event that is sent for `create_event()`"""
+        return {
+            'name': 'edx.test.event',
+            'context': {'user_id': 1, 'email': 'one@example.com'},
+            'data': {'foo': 'bar', 'email': 'one@example.com', 'username': 'one'},
+        }
+
+    def test_users_resolved_with_one_query(self):
+        for _ in range(3):
+            self.backend.send(self.create_event(user_id=1, data_user_id=2))
+            self.backend.send(self.create_event(user_id=2))
+
+        self.backend.flush()
+
+        self.assertEqual(len(self.sent_payloads()[0]), 6)
+        self.mock_filter.assert_called_once_with(pk__in=set([1, 2]))
+
+    def test_events_with_missing_users_dropped(self):
+        self.backend.send(self.create_event(user_id=1))
+        self.backend.send(self.create_event(user_id=3))
+        self.backend.send(self.create_event(user_id=1, data_user_id=4))
+        self.backend.send(self.create_event(user_id=2))
+
+        self.backend.flush()
+
+        payload = self.sent_payloads()[0]
+        self.assertEqual([event['context']['user_id'] for event in payload], [1, 2])
+
+    def test_unserializable_event_dropped(self):
+        self.backend.send(self.create_event())
+        event = self.create_event()
+        event['data']['foo'] = object()
+        self.backend.send(event)
+        self.backend.send(self.create_event())
+
+        self.assertEqual(self.backend.close(), 0)
+
+        self.assertEqual(self.sent_payloads(), [[self.sent_event()] * 2])
+        self.assertEqual(self.backend.buffer.metrics['flushed_events'], 3)
+
+    def test_oversized_event_dropped(self):
+        self.backend.batch_max_bytes = 10
+        self.backend.send(self.create_event())
+        self.backend.flush()
+        self.assertFalse(self.mock_client.invoke.called)
+
+
+class TestAwsLambdaBackendWorkers(AwsLambdaTestCase):
+    """Test invoking AWS Lambda from background threads"""
+
+    def test_invocations_made_by_workers(self):
+        backend = AwsLambdaBackend(workers=2)
+        for _ in range(5):
+            backend.send(self.create_event())
+
+        self.assertEqual(backend.close(timeout=5), 0)
+        self.assertEqual(len(self.sent_payloads()), 5)
+        self.assertEqual(backend.pool.metrics['completed_tasks'], 5)
+
+    def test_client_connection_pool_size(self):
+        AwsLambdaBackend(workers=2, max_pool_connections=20).warm_up()
+        _, _, kwargs = self.mock_boto3_client.mock_calls[0]
+        self.assertEqual(kwargs['config'].max_pool_connections, 20)
+
+    def test_batches_sent_by_workers(self):
+        backend = AwsLambdaBackend(batch_size=10, batch_interval=60, workers=2)
+        for _ in range(5):
+            backend.send(self.create_event())
+
+        backend.close(timeout=5)
+        self.assertEqual([len(payload) for payload in self.sent_payloads()], [5])
+
+
+class TestAwsLambdaBackendPayloads(AwsLambdaTestCase):
+    """Test controlling the content and size of the payloads sent to AWS Lambda"""
+
+    def test_field_projection(self):
+        backend = AwsLambdaBackend(fields=['context.course_id', 'data.grade'])
+        event = self.create_event()
+        event['context']['course_id'] = 'course-v1:edX+Test+2014'
+        event['context']['path'] = '/courses'
+        event['data']['grade'] = 0.5
+        event['time'] = '2014-01-01T00:00:00'
+        backend.send(event)
+
+        self.assertEqual(self.sent_payloads(), [{
+            'name': 'edx.test.event',
+            'context': {'user_id': 1, 'email': 'one@example.com', 'course_id': 'course-v1:edX+Test+2014'},
+            'data': {'grade': 0.5, 'email': 'one@example.com', 'username': 'one'},
+        }])
+
+    def test_oversized_event_trimmed(self):
+        backend = AwsLambdaBackend(batch_max_bytes=300)
+        event = self.create_event()
+        event['data'].update({
+            'big': 'a' * 200,
+            'also_big': 'b' * 200,
+            'small': 'c',
+        })
+        backend.send(event)
+
+        payload = self.sent_payloads()[0]
+        self.assertEqual(payload['data'], {
+            'foo': 'bar',
+            'small': 'c',
+            'email': 'one@example.com',
+            'username': 'one',
+            'trimmed_fields': ['also_big', 'big'],
+        })
+        _, _, kwargs = self.mock_client.invoke.mock_calls[0]
+        self.assertLessEqual(len(kwargs['Payload']), 300)
+        self.assertIn('big', event['data'])
+
+    def test_trimming_is_deterministic(self):
+        backend = AwsLambdaBackend(batch_max_bytes=400)
+        event = self.create_event()
+        event['data'].update({
+            'first': 'a' * 200,
+            'second': 'b' * 200,
+        })
+        backend.send(event)
+
+        self.assertEqual(self.sent_payloads()[0]['data']['trimmed_fields'], ['first'])
+
+    def test_event_too_large_to_trim(self):
+        backend = AwsLambdaBackend(batch_max_bytes=100)
+        event = self.create_event()
+        event['context']['big'] = 'a' * 200
+        backend.send(event)
+
+        self.assertFalse(self.mock_client.invoke.called)
+
+    def test_batched_events_trimmed(self):
+        backend = AwsLambdaBackend(batch_size=10, batch_interval=60, batch_max_bytes=300)
+        self.addCleanup(backend.buffer.close)
+        event = self.create_event()
+        event['data']['big'] = 'a' * 300
+        backend.send(event)
+        backend.flush()
+
+        self.assertEqual(self.sent_payloads()[0][0]['data']['trimmed_fields'], ['big'])
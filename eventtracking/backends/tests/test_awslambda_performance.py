@@ -0,0 +1,96 @@
+"""
+Runs performance tests to compare the different ways the AwsLambdaBackend can
+invoke Lambda. Events are sent to an in-process stand-in instead of AWS.
+
+In addition to the parameters read by `PerformanceTestCase`, the following
+environment variables are used:
+
+* EVENT_TRACKING_PERF_LAMBDA_LATENCY - Number of seconds each simulated
+  Lambda invocation takes.
+* EVENT_TRACKING_PERF_LAMBDA_BATCH_SIZE - Maximum number of events sent in a
+  single invocation by the batched path.
+* EVENT_TRACKING_PERF_LAMBDA_WORKERS - Number of threads used by the pooled
+  path.
+* EVENT_TRACKING_PERF_LAMBDA_THRESHOLD_SECONDS - Fail a test if it takes
+  longer than this number of seconds to send all of the events. These tests
+  compare the invocation paths with each other, so by default the elapsed
+  time is only reported, EVENT_TRACKING_PERF_THRESHOLD_SECONDS is sized for
+  the MongoDB backend and does not apply.
+"""
+
+from __future__ import absolute_import
+
+import os
+import time
+
+from django.test.utils import override_settings
+
+from eventtracking.backends.tests import PerformanceTestCase
+from eventtracking.backends.awslambda import AwsLambdaBackend
+from eventtracking.backends.awslambda import StandInLambdaClient
+
+
+NUM_USERS = 1000
+
+
+class TestAwsLambdaBackendPerformance(PerformanceTestCase):
+    """
+    Measures events per second and the 99th percentile latency of `send()` for the single, batched and pooled
+    invocation paths.
+    """
+
+    def setUp(self):
+        settings_override = override_settings(AWS_EVENT_TRACKER_ARN='arn:aws:lambda:us-west-2:0:function:perf')
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.latency = float(os.getenv('EVENT_TRACKING_PERF_LAMBDA_LATENCY', 0))
+        self.batch_size = int(os.getenv('EVENT_TRACKING_PERF_LAMBDA_BATCH_SIZE', 500))
+        self.workers = int(os.getenv('EVENT_TRACKING_PERF_LAMBDA_WORKERS', 8))
+        self.client = StandInLambdaClient(latency=self.latency)
+        self.threshold = float(os.getenv('EVENT_TRACKING_PERF_LAMBDA_THRESHOLD_SECONDS', -1))
+
+    def create_backend(self, **kwargs):
+        """Create a backend that sends to the stand-in and never needs to query the database"""
+        backend = AwsLambdaBackend(client=self.client, **kwargs)
+        for user_id in range(1, NUM_USERS + 1):
+            backend.user_cache.set(user_id, ('user{0}@example.com'.format(user_id), 'user{0}'.format(user_id)))
+        return backend
+
+    def send_events(self, backend):
+        """Send events to the backend and report the distribution of `send()` latencies"""
+        latencies = []
+        with self.assert_execution_time_less_than_threshold():
+            for i in range(self.num_events):
+                event = {
+                    'name': 'perf.event',
+                    'context': {'user_id': i % NUM_USERS + 1},
+                    'data': {'sequence': i, 'payload': self.random_payload}
+                }
+                start_time = time.time()
+                backend.send(event)
+                latencies.append(time.time() - start_time)
+
+            backend.close()
+
+        latencies.sort()
+        print 'p99 send() latency: {0:.6f} seconds'.format(latencies[int(len(latencies) * 0.99)])
+        print 'Invocations: {0}'.format(self.client.invocations)
+        print 'Payload bytes: {0}'.format(self.client.payload_bytes)
+
+    def test_single(self):
+        self.send_events(self.create_backend())
+
+    def test_batched(self):
+        self.send_events(self.create_backend(batch_size=self.batch_size, max_buffered_events=self.num_events))
+
+    def test_pooled(self):
+        self.send_events(self.create_backend(workers=self.workers, worker_queue_size=self.num_events))
+
+    def test_batched_and_pooled(self):
+        self.send_events(self.create_backend(
+            batch_size=self.batch_size,
+            max_buffered_events=self.num_events,
+            workers=self.workers,
+            worker_queue_size=self.num_events
+        ))
@@ -0,0 +1,96 @@
+"""Test the circuit breaker"""
+
+from __future__ import absolute_import
+
+from unittest import TestCase
+
+from mock import patch
+
+from eventtracking.backends.breaker import CircuitBreaker
+
+
+class TestCircuitBreaker(TestCase):
+    """Test the circuit breaker"""
+
+    def setUp(self):
+        patcher = patch('eventtracking.backends.breaker.time')
+        self.addCleanup(patcher.stop)
+        self.mock_time = patcher.start()
+        self.mock_time.time.return_value = 100
+
+        self.breaker = CircuitBreaker(failure_threshold=3, reset_timeout=10)
+
+    def test_closed_by_default(self):
+        self.assertTrue(self.breaker.allow())
+        self.assertEqual(self.breaker.state, 'closed')
+
+    def test_opens_after_consecutive_failures(self):
+        self.assertFalse(self.breaker.record_failure())
+        self.assertFalse(self.breaker.record_failure())
+        self.assertTrue(self.breaker.record_failure())
+        self.assertEqual(self.breaker.state, 'open')
+        self.assertFalse(self.breaker.allow())
+
+    def test_success_resets_failure_count(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.breaker.record_success()
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, 'closed')
+        self.assertTrue(self.breaker.allow())
+
+    def open_breaker(self):
+        """Record enough failures to open the breaker"""
+        for _ in range(self.breaker.failure_threshold):
+            self.breaker.record_failure()
+
+    def test_single_probe_after_reset_timeout(self):
+        self.open_breaker()
+        self.mock_time.time.return_value = 109
+        self.assertFalse(self.breaker.allow())
+
+        self.mock_time.time.return_value = 110
+        self.assertTrue(self.breaker.allow())
+        self.assertEqual(self.breaker.state, 'half_open')
+        self.assertFalse(self.breaker.allow())
+
+    def test_successful_probe_closes(self):
+        self.open_breaker()
+        self.mock_time.time.return_value = 110
+        self.breaker.allow()
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, 'closed')
+        self.assertTrue(self.breaker.allow())
+
+    def test_failed_probe_reopens(self):
+        self.open_breaker()
+        self.mock_time.time.return_value = 110
+        self.breaker.allow()
+        self.assertTrue(self.breaker.record_failure())
+        self.assertEqual(self.breaker.state, 'open')
+
+        self.mock_time.time.return_value = 119
+        self.assertFalse(self.breaker.allow())
+
+    def test_released_probe_allows_another_probe(self):
+        self.open_breaker()
+        self.mock_time.time.return_value = 110
+        self.breaker.allow()
+        self.breaker.release()
+        self.assertEqual(self.breaker.state, 'open')
+        self.assertTrue(self.breaker.allow())
+        self.assertFalse(self.breaker.allow())
+
+    def test_release_when_closed(self):
+        self.breaker.release()
+        self.assertEqual(self.breaker.state, 'closed')
+
+    def test_metrics(self):
+        self.open_breaker()
+        self.breaker.allow()
+        self.assertEqual(self.breaker.metrics, {
+            'state': 'open',
+            'consecutive_failures': 3,
+            'times_opened': 1,
+            'rejected_calls': 1,
+        })
@@ -0,0 +1,131 @@
+"""Test the event buffer"""
+
+from __future__ import absolute_import
+
+import threading
+import time
+from unittest import TestCase
+
+from mock import MagicMock, patch
+
+from eventtracking.backends.buffer import EventBuffer
+
+
+class TestEventBuffer(TestCase):
+    """Test the event buffer"""
+
+    def setUp(self):
+        self.batches = []
+        self.buffer = EventBuffer(self.batches.append, batch_size=3, flush_interval=60, max_size=5)
+        self.addCleanup(self.buffer.close)
+
+    def test_flush(self):
+        for i in range(5):
+            self.buffer.add(i)
+        self.buffer.flush()
+
+        self.assertEqual(sorted(sum(self.batches, [])), range(5))
+        self.assertTrue(all(len(batch) <= 3 for batch in self.batches))
+        self.assertEqual(len(self.buffer), 0)
+
+    def test_drops_events_when_full(self):
+        # Make sure the background thread can't empty the buffer while it is being filled
+        with self.buffer._flush_lock:  # pylint: disable=protected-access
+            results = [self.buffer.add(i) for i in range(7)]
+
+        self.assertEqual(results, [True] * 5 + [False] * 2)
+        self.assertEqual(self.buffer.metrics['dropped_events'], 2)
+
+    def test_flushes_full_batch_in_background(self):
+        flushed = threading.Event()
+        callback = MagicMock(side_effect=lambda batch: flushed.set())
+        event_buffer = EventBuffer(callback, batch_size=2, flush_interval=60)
+        self.addCleanup(event_buffer.close)
+
+        event_buffer.add(1)
+        event_buffer.add(2)
+
+        self.assertTrue(flushed.wait(5))
+        callback.assert_called_once_with([1, 2])
+
+    def test_flushes_partial_batch_after_interval(self):
+        flushed = threading.Event()
+        callback = MagicMock(side_effect=lambda batch: flushed.set())
+        event_buffer = EventBuffer(callback, batch_size=100, flush_interval=0.01)
+        self.addCleanup(event_buffer.close)
+
+        event_buffer.add(1)
+
+        self.assertTrue(flushed.wait(5))
+        callback.assert_called_once_with([1])
+
+    def test_callback_failure(self):
+        event_buffer = EventBuffer(MagicMock(side_effect=RuntimeError), flush_interval=60)
+        event_buffer.add(1)
+        self.assertEqual(event_buffer.close(), 1)
+        self.assertEqual(event_buffer.metrics['flushed_events'], 0)
+        self.assertEqual(event_buffer.metrics['failed_events'], 1)
+
+    def test_close(self):
+        self.buffer.add(1)
+        self.buffer.close()
+
+        self.assertEqual(self.batches, [[1]])
+        self.assertFalse(self.buffer.add(2))
+        self.assertEqual(self.buffer.metrics, {
+            'queue_depth': 0,
+            'dropped_events': 1,
+            'flushed_events': 1,
+            'flushed_batches': 1,
+            'failed_events': 0,
+        })
+
+    def test_flush_deadline(self):
+        # Keep the background thread from flushing the events
+        with patch.object(self.buffer, '_ensure_thread_started'):
+            for i in range(5):
+                self.buffer.add(i)
+
+        with patch('eventtracking.shutdown.time') as mock_time:
+            mock_time.time.side_effect = [100, 100, 101]
+            self.assertEqual(self.buffer.flush(timeout=1), 2)
+
+        self.assertEqual(len(sum(self.batches, [])), 3)
+
+    def test_close_while_flushing(self):
+        started = threading.Event()
+        finish = threading.Event()
+
+        def flush(_batch):
+            """Block the background thread until the test is done"""
+            started.set()
+            finish.wait(5)
+
+        event_buffer = EventBuffer(flush, batch_size=1, flush_interval=60)
+        self.addCleanup(finish.set)
+        event_buffer.add(1)
+        self.assertTrue(started.wait(5))
+        event_buffer.add(2)
+
+        self.assertEqual(event_buffer.close(timeout=0.01), 1)
+        self.assertFalse(event_buffer.add(3))
+
+    def test_flush_deadline_while_flushing(self):
+        started = threading.Event()
+        finish = threading.Event()
+
+        def flush(_batch):
+            """Block the background thread until the test is done"""
+            started.set()
+            finish.wait(5)
+
+        event_buffer = EventBuffer(flush, batch_size=1, flush_interval=60)
+        self.addCleanup(event_buffer.close)
+        self.addCleanup(finish.set)
+        event_buffer.add(1)
+        self.assertTrue(started.wait(5))
+        event_buffer.add(2)
+
+        started_at = time.time()
+        self.assertEqual(event_buffer.flush(timeout=0.05), 1)
+        self.assertLess(time.time() - started_at, 1)
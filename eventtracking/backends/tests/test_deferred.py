@@ -0,0 +1,185 @@
+"""Test the deferred routing backend and caching enricher"""
+
+from __future__ import absolute_import
+
+import threading
+from unittest import TestCase
+
+from mock import ANY, MagicMock
+
+from eventtracking.backends.deferred import DeferredRoutingBackend, CachingEnricher
+from eventtracking.backends.routing import RoutingBackend
+from eventtracking.processors.exceptions import EventEmissionExit
+
+
+class TestDeferredRoutingBackend(TestCase):
+    """Test the deferred routing backend"""
+
+    def setUp(self):
+        self.backend = MagicMock()
+        self.threads = []
+
+    def record_thread(self, event):
+        """An enricher that records which thread it ran on"""
+        self.threads.append(threading.current_thread())
+        event['enriched'] = True
+
+    def test_enriches_off_thread(self):
+        router = DeferredRoutingBackend(backends={'0': self.backend}, enrichers=[self.record_thread])
+        router.send({'name': 'test'})
+
+        self.assertEqual(router.close(5), 0)
+        self.backend.send.assert_called_once_with({'name': 'test', 'enriched': True})
+        self.assertNotEqual(self.threads, [threading.current_thread()])
+        self.assertEqual(router.metrics['completed_tasks'], 1)
+
+    def test_sibling_backends_receive_original_event(self):
+        def enrich(event):
+            """Modify the nested data of the event"""
+            event['data']['enriched'] = True
+
+        sibling = MagicMock(spec=['send'])
+        deferred = DeferredRoutingBackend(backends={'0': self.backend}, enrichers=[enrich])
+        router = RoutingBackend(backends={'0': deferred, '1': sibling})
+        event = {'name': 'test', 'data': {'foo': 'bar'}}
+        router.send(event)
+        router.send_batch([event])
+
+        self.assertEqual(deferred.close(5), 0)
+        self.assertEqual(event, {'name': 'test', 'data': {'foo': 'bar'}})
+        sibling.send.assert_called_with({'name': 'test', 'data': {'foo': 'bar'}})
+        self.assertEqual(sibling.send.call_count, 2)
+        self.backend.send.assert_called_once_with({'name': 'test', 'data': {'foo': 'bar', 'enriched': True}})
+
+    def test_processors_run_inline(self):
+        def drop(_event):
+            """Filter every event before it is queued"""
+            self.threads.append(threading.current_thread())
+            raise EventEmissionExit()
+
+        enricher = MagicMock()
+        router = DeferredRoutingBackend(backends={'0': self.backend}, processors=[drop], enrichers=[enricher])
+        router.send({'name': 'test'})
+
+        router.close(5)
+        self.assertEqual(self.threads, [threading.current_thread()])
+        self.assertFalse(enricher.called)
+        self.assertFalse(self.backend.send.called)
+        self.assertEqual(router.metrics['completed_tasks'], 0)
+
+    def test_enricher_exit(self):
+        enricher = MagicMock(side_effect=EventEmissionExit)
+        router = DeferredRoutingBackend(backends={'0': self.backend}, enrichers=[enricher])
+        router.send({'name': 'test'})
+
+        router.close(5)
+        self.assertTrue(enricher.called)
+        self.assertFalse(self.backend.send.called)
+
+    def test_enricher_error(self):
+        failing = MagicMock(side_effect=ValueError)
+        replacing = MagicMock(return_value={'name': 'replaced'})
+        router = DeferredRoutingBackend(backends={'0': self.backend}, enrichers=[failing, replacing])
+        router.send({'name': 'test'})
+
+        router.close(5)
+        self.backend.send.assert_called_once_with({'name': 'replaced'})
+
+    def test_send_batch(self):
+        def drop_second(event):
+            """Filter out one of the events"""
+            if event['name'] == 'second':
+                raise EventEmissionExit()
+
+        router = DeferredRoutingBackend(
+            backends={'0': self.backend}, processors=[drop_second], enrichers=[self.record_thread]
+        )
+        router.send_batch([{'name': 'first'}, {'name': 'second'}, {'name': 'third'}])
+
+        router.close(5)
+        self.backend.send_batch.assert_called_once_with([
+            {'name': 'first', 'enriched': True},
+            {'name': 'third', 'enriched': True},
+        ])
+        self.assertEqual(router.metrics['completed_tasks'], 1)
+
+    def test_flush(self):
+        router = DeferredRoutingBackend(backends={'0': self.backend}, enrichers=[self.record_thread])
+        self.backend.flush.return_value = None
+        for _ in range(10):
+            router.send({'name': 'test'})
+
+        self.assertEqual(router.flush(5), 0)
+        self.assertEqual(self.backend.send.call_count, 10)
+        self.backend.flush.assert_called_once_with(timeout=ANY)
+
+        router.send({'name': 'test'})
+        router.close(5)
+        self.assertEqual(self.backend.send.call_count, 11)
+
+    def test_dropped_after_close(self):
+        router = DeferredRoutingBackend(backends={'0': self.backend})
+        router.close()
+        router.send({'name': 'test'})
+        self.assertFalse(self.backend.send.called)
+        self.assertEqual(router.metrics['dropped_tasks'], 1)
+
+    def test_send_batch_dropped_after_close(self):
+        router = DeferredRoutingBackend(backends={'0': self.backend})
+        router.close()
+        self.assertEqual(router.send_batch([{'name': 'first'}, {'name': 'second'}]), 2)
+
+    def test_invalid_enricher(self):
+        with self.assertRaises(ValueError):
+            DeferredRoutingBackend(enrichers=[object()])
+
+
+class UserEmailEnricher(CachingEnricher):
+    """Add a user's email to events"""
+
+    def __init__(self, emails, **kwargs):
+        super(UserEmailEnricher, self).__init__(**kwargs)
+        self.emails = emails
+        self.lookups = []
+
+    def get_cache_key(self, event):
+        return event.get('user_id')
+
+    def lookup(self, key):
+        self.lookups.append(key)
+        return self.emails.get(key)
+
+    def apply(self, event, value):
+        event['email'] = value
+        return event
+
+
+class TestCachingEnricher(TestCase):
+    """Test the caching enricher base class"""
+
+    def setUp(self):
+        self.enricher = UserEmailEnricher({1: 'a@example.com', 2: 'b@example.com'}, cache_size=10)
+
+    def test_caches_lookups(self):
+        for user_id in [1, 2, 1, 1]:
+            self.assertEqual(self.enricher({'user_id': user_id})['email'], self.enricher.emails[user_id])
+        self.assertEqual(self.enricher.lookups, [1, 2])
+
+    def test_missing_key(self):
+        self.assertEqual(self.enricher({}), {})
+        self.assertEqual(self.enricher.lookups, [])
+
+    def test_missing_value(self):
+        self.assertEqual(self.enricher({'user_id': 3}), {'user_id': 3})
+        self.assertEqual(self.enricher({'user_id': 3}), {'user_id': 3})
+        self.assertEqual(self.enricher.lookups, [3, 3])
+
+    def test_invalidate(self):
+        self.enricher({'user_id': 1})
+        self.enricher.emails[1] = 'c@example.com'
+        self.enricher.invalidate(1)
+        self.assertEqual(self.enricher({'user_id': 1})['email'], 'c@example.com')
+
+    def test_abstract(self):
+        with self.assertRaises(NotImplementedError):
+            CachingEnricher()({})
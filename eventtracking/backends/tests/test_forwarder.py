@@ -0,0 +1,115 @@
+"""Test forwarding events over a datagram socket"""
+
+from __future__ import absolute_import
+
+from datetime import datetime
+import json
+import os
+import shutil
+import socket
+import tempfile
+from unittest import TestCase
+
+from pytz import UTC
+
+from eventtracking.backends.forwarder import (
+    SocketForwardingBackend, encode_event, decode_frames, FRAME_HEADER, SOCKET_UDP
+)
+
+
+class TestFraming(TestCase):
+    """Test encoding events as length prefixed frames"""
+
+    def test_round_trip(self):
+        events = [{'name': 'first'}, {'name': 'second', 'timestamp': datetime(2016, 1, 1, tzinfo=UTC)}]
+        frames = decode_frames(b''.join(encode_event(event) for event in events))
+        self.assertEqual([json.loads(frame) for frame in frames], [
+            {'name': 'first'},
+            {'name': 'second', 'timestamp': {'$datetime': '2016-01-01T00:00:00+00:00'}},
+        ])
+
+    def test_truncated(self):
+        frame = encode_event({'name': 'test'})
+        with self.assertRaises(ValueError):
+            decode_frames(frame[:-1])
+        with self.assertRaises(ValueError):
+            decode_frames(frame + frame[:2])
+
+
+class TestSocketForwardingBackend(TestCase):
+    """Test forwarding events to a collector"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.address = os.path.join(self.directory, 'collector.sock')
+
+        self.receiver = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.receiver.bind(self.address)
+        self.receiver.settimeout(5)
+        self.addCleanup(self.receiver.close)
+
+        self.backend = SocketForwardingBackend(address=self.address)
+        self.addCleanup(self.backend.close)
+
+    def receive(self):
+        """Receive a datagram and decode the events it contains"""
+        return [json.loads(frame) for frame in decode_frames(self.receiver.recv(65536))]
+
+    def test_send(self):
+        self.backend.send({'name': 'test'})
+        self.assertEqual(self.receive(), [{'name': 'test'}])
+        self.assertEqual(self.backend.metrics, {'sent_events': 1, 'dropped_events': 0})
+
+    def test_send_batch_packs_datagrams(self):
+        frame_size = len(encode_event({'name': 'event0'}))
+        self.backend.max_datagram_size = frame_size * 2
+        self.backend.send_batch([{'name': 'event{0}'.format(i)} for i in range(5)])
+
+        names = [[event['name'] for event in self.receive()] for _ in range(3)]
+        self.assertEqual(names, [['event0', 'event1'], ['event2', 'event3'], ['event4']])
+
+    def test_oversized_event(self):
+        self.backend.max_datagram_size = 100
+        self.backend.send_batch([{'name': 'x' * 100}, {'name': 'small'}])
+        self.assertEqual(self.receive(), [{'name': 'small'}])
+        self.assertEqual(self.backend.dropped_events, 1)
+
+    def test_unencodable_event(self):
+        self.backend.send_batch([{'name': 'invalid', 'data': object()}, {'name': 'valid'}])
+        self.assertEqual(self.receive(), [{'name': 'valid'}])
+        self.assertEqual(self.backend.dropped_events, 1)
+
+    def test_collector_not_running(self):
+        self.receiver.close()
+        os.unlink(self.address)
+
+        self.backend.send({'name': 'test'})
+        self.backend.send({'name': 'test'})
+        self.assertEqual(self.backend.metrics, {'sent_events': 0, 'dropped_events': 2})
+
+    def test_full_buffer_never_blocks(self):
+        for _ in range(10000):
+            self.backend.send({'name': 'test', 'data': {'padding': 'x' * 1000}})
+        self.assertGreater(self.backend.dropped_events, 0)
+
+    def test_udp(self):
+        receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        receiver.bind(('127.0.0.1', 0))
+        receiver.settimeout(5)
+        self.addCleanup(receiver.close)
+
+        backend = SocketForwardingBackend(address=list(receiver.getsockname()), socket_type=SOCKET_UDP)
+        backend.send({'name': 'test'})
+        self.assertEqual(decode_frames(receiver.recv(65536)), ['{"name":"test"}'])
+
+    def test_invalid_configuration(self):
+        with self.assertRaises(ValueError):
+            SocketForwardingBackend()
+        with self.assertRaises(ValueError):
+            SocketForwardingBackend(address=self.address, socket_type='tcp')
+
+    def test_frame_header(self):
+        self.backend.send({'name': 'test'})
+        datagram = self.receiver.recv(65536)
+        self.assertEqual(FRAME_HEADER.unpack_from(datagram)[0], len(datagram) - FRAME_HEADER.size)
@@ -1,12 +1,15 @@
 """Unit tests for the Mongo backend"""
 from __future__ import absolute_import
 
+from datetime import datetime
 from unittest import TestCase
+from mock import MagicMock
 from mock import patch
 from mock import sentinel
 
-from pymongo.errors import PyMongoError
+from pymongo.errors import AutoReconnect, OperationFailure, PyMongoError
 from bson.errors import BSONError
+from pytz import UTC
 
 from eventtracking.backends.mongodb import MongoBackend
 
@@ -59,3 +62,197 @@ class TestMongoBackend(TestCase):
 
         self.backend.send({'test': 1})
         # Ensure this error is caught
+
+    def test_bson_error_does_not_open_breaker(self):
+        self.backend.collection.insert.side_effect = BSONError
+
+        for _ in range(10):
+            self.backend.send({'test': 1})
+        self.assertEqual(self.backend.breaker.state, 'closed')
+
+    def test_send_batch(self):
+        events = [{'name': 'first'}, {'name': 'second'}]
+        self.backend.send_batch(events)
+        self.backend.collection.insert.assert_called_once_with(events, manipulate=False, continue_on_error=True)
+
+    def test_send_batch_single_event(self):
+        self.backend.send_batch([{'name': 'first'}])
+        self.backend.collection.insert.assert_called_once_with({'name': 'first'}, manipulate=False)
+
+    def test_send_batch_encoding_error(self):
+        self.backend.collection.insert.side_effect = [BSONError, None, None]
+        self.backend.send_batch([{'name': 'first'}, {'name': 'second'}])
+        self.assertEqual(self.backend.collection.insert.call_count, 3)
+        self.backend.collection.insert.assert_called_with({'name': 'second'}, manipulate=False)
+
+    def test_send_batch_database_error(self):
+        self.backend.fallback = MagicMock()
+        self.backend.collection.insert.side_effect = AutoReconnect
+        self.backend.send_batch([{'name': 'first'}, {'name': 'second'}])
+        self.assertEqual(self.backend.fallback.send.call_count, 2)
+        self.assertEqual(self.backend.breaker.consecutive_failures, 1)
+
+    def test_send_batch_rejected_events(self):
+        self.backend.fallback = MagicMock()
+        self.backend.collection.insert.side_effect = OperationFailure('duplicate key')
+        self.backend.send_batch([{'name': 'first'}, {'name': 'second'}])
+        self.assertFalse(self.backend.fallback.send.called)
+        self.assertEqual(self.backend.breaker.consecutive_failures, 1)
+
+    def test_warm_up(self):
+        self.assertTrue(self.backend.warm_up())
+        self.backend.connection.admin.command.assert_called_once_with('ping')
+
+        self.backend.connection.admin.command.side_effect = PyMongoError
+        with self.assertRaises(PyMongoError):
+            self.backend.warm_up()
+
+
+class TestMongoBackendCircuitBreaker(TestCase):
+    """Test the Mongo backend while the database is unavailable"""
+
+    def setUp(self):
+        self.mongo_patcher = patch('eventtracking.backends.mongodb.MongoClient')
+        self.addCleanup(self.mongo_patcher.stop)
+        self.mongo_patcher.start()
+
+        self.fallback = MagicMock()
+        self.backend = MongoBackend(failure_threshold=2, reset_timeout=10, fallback=self.fallback)
+        self.backend.collection.insert.side_effect = PyMongoError
+
+    def test_fails_fast_once_open(self):
+        for i in range(5):
+            self.backend.send({'test': i})
+
+        self.assertEqual(len(self.backend.collection.insert.mock_calls), 2)
+        self.assertEqual(self.backend.metrics['breaker']['state'], 'open')
+        self.assertEqual(self.backend.metrics['breaker']['rejected_calls'], 3)
+
+    def test_events_diverted_to_fallback(self):
+        events = [{'test': i} for i in range(5)]
+        for event in events:
+            self.backend.send(event)
+
+        self.assertEqual([args[0] for _, args, _ in self.fallback.send.mock_calls], events)
+
+    def test_fallback_failure_is_swallowed(self):
+        self.fallback.send.side_effect = RuntimeError
+        self.backend.send({'test': 1})
+
+    def test_recovers_after_successful_probe(self):
+        with patch('eventtracking.backends.breaker.time') as mock_time:
+            mock_time.time.return_value = 100
+            self.backend.send({'test': 1})
+            self.backend.send({'test': 2})
+
+            self.backend.collection.insert.side_effect = None
+            mock_time.time.return_value = 110
+            self.backend.send({'test': 3})
+
+        self.assertEqual(self.backend.breaker.state, 'closed')
+        self.assertEqual(len(self.backend.collection.insert.mock_calls), 3)
+
+    def test_encoding_error_during_probe(self):
+        with patch('eventtracking.backends.breaker.time') as mock_time:
+            mock_time.time.return_value = 100
+            self.backend.send({'test': 1})
+            self.backend.send({'test': 2})
+
+            self.backend.collection.insert.side_effect = BSONError
+            mock_time.time.return_value = 110
+            self.backend.send({'test': 3})
+
+            self.backend.collection.insert.side_effect = None
+            self.backend.send({'test': 4})
+
+        self.assertEqual(self.backend.breaker.state, 'closed')
+        self.assertEqual(len(self.backend.collection.insert.mock_calls), 4)
+
+    def test_batch_encoding_error_during_probe(self):
+        with patch('eventtracking.backends.breaker.time') as mock_time:
+            mock_time.time.return_value = 100
+            self.backend.send({'test': 1})
+            self.backend.send({'test': 2})
+
+            self.backend.collection.insert.side_effect = [BSONError, None, None]
+            mock_time.time.return_value = 110
+            self.fallback.reset_mock()
+            self.backend.send_batch([{'test': 3}, {'test': 4}])
+
+        self.assertEqual(self.backend.breaker.state, 'closed')
+        self.assertFalse(self.fallback.send.called)
+        self.assertEqual(len(self.backend.collection.insert.mock_calls), 5)
+
+
+class TestMongoBackendBucketing(TestCase):
+    """Test storing high frequency events in buckets"""
+
+    def setUp(self):
+        self.mongo_patcher = patch('eventtracking.backends.mongodb.MongoClient')
+        self.addCleanup(self.mongo_patcher.stop)
+        self.mongo_patcher.start()
+
+        self.backend = MongoBackend(bucket_events=['video.heartbeat'], bucket_window=60, bucket_size=50)
+
+    def test_event_added_to_bucket(self):
+        event = {
+            'name': 'video.heartbeat',
+            'time': datetime(2014, 1, 1, 12, 5, 33, 12, tzinfo=UTC),
+            'data': {'position': 10}
+        }
+        self.backend.send(event)
+
+        self.assertFalse(self.backend.collection.insert.called)
+        self.backend.collection.update.assert_called_once_with(
+            {
+                'name': 'video.heartbeat',
+                'time': datetime(2014, 1, 1, 12, 5, tzinfo=UTC),
+                'bucket_size': {'$lt': 50}
+            },
+            {
+                '$push': {
+                    'events': {
+                        'time': datetime(2014, 1, 1, 12, 5, 33, 12, tzinfo=UTC),
+                        'data': {'position': 10}
+                    }
+                },
+                '$inc': {'bucket_size': 1}
+            },
+            upsert=True
+        )
+        self.assertEqual(event['name'], 'video.heartbeat')
+
+    def test_other_events_inserted(self):
+        event = {'name': 'user.login'}
+        self.backend.send(event)
+
+        self.assertFalse(self.backend.collection.update.called)
+        self.backend.collection.insert.assert_called_once_with(event, manipulate=False)
+
+    def test_window_uses_timestamp_field(self):
+        self.backend.send({
+            'name': 'video.heartbeat',
+            'timestamp': datetime(2014, 1, 1, 12, 5, 59, tzinfo=UTC)
+        })
+        _, args, _ = self.backend.collection.update.mock_calls[0]
+        self.assertEqual(args[0]['time'], datetime(2014, 1, 1, 12, 5, tzinfo=UTC))
+
+    def test_find_unpacks_buckets(self):
+        window = datetime(2014, 1, 1, 12, 5, tzinfo=UTC)
+        self.backend.collection.find.return_value = [
+            {'_id': 1, 'name': 'user.login', 'time': window},
+            {
+                '_id': 2,
+                'name': 'video.heartbeat',
+                'time': window,
+                'bucket_size': 2,
+                'events': [{'data': {'position': 1}}, {'data': {'position': 2}}]
+            },
+        ]
+
+        self.assertEqual(list(self.backend.find({'time': window})), [
+            {'_id': 1, 'name': 'user.login', 'time': window},
+            {'name': 'video.heartbeat', 'data': {'position': 1}},
+            {'name': 'video.heartbeat', 'data': {'position': 2}},
+        ])
+        self.backend.collection.find.assert_called_once_with({'time': window})
@@ -82,3 +82,32 @@ class TestMongoIntegration(IntegrationTestCase):
         """Truncate the microseconds from the event timestamp"""
         event['timestamp'] = event['timestamp'].replace(microsecond=0)
         event['data']['current_time'] = event['data']['current_time'].replace(microsecond=0)
+
+
+class TestMongoBucketingIntegration(IntegrationTestCase):
+    """Ensure bucketed events are stored in MongoDB and can be read back"""
+
+    def setUp(self):
+        self.database_name = 'test_eventtracking_' + str(uuid4())
+        self.mongo_backend = MongoBackend(
+            database=self.database_name,
+            bucket_events=['org.test.video.heartbeat'],
+            bucket_size=4,
+            extra={'w': 1}
+        )
+        self.tracker = Tracker({'mongo': self.mongo_backend})
+
+    def tearDown(self):
+        self.mongo_backend.connection.drop_database(self.database_name)
+
+    def test_bucketed_events(self):
+        for i in range(10):
+            self.tracker.emit('org.test.video.heartbeat', {'sequence': i})
+        self.tracker.emit('org.test.user.login', {'sequence': 10})
+
+        self.mongo_backend.connection.fsync()
+
+        self.assertLessEqual(self.mongo_backend.collection.find().count(), 5)
+
+        sequences = sorted(event['data']['sequence'] for event in self.mongo_backend.find())
+        self.assertEquals(sequences, range(11))
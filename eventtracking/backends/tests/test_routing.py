@@ -5,6 +5,7 @@ from __future__ import absolute_import
 from unittest import TestCase
 
 from mock import MagicMock
+from mock import call
 from mock import sentinel
 
 from eventtracking.processors.exceptions import EventEmissionExit
@@ -275,3 +276,140 @@ class TestRoutingBackend(TestCase):
 
         router.send(self.sample_event)
         self.assertEqual(call_order, ['0', '1', '2', '3', '4'])
+
+
+class TestRoutingBackendScopedProcessors(TestCase):
+    """Test processors that only apply to some event names"""
+
+    def setUp(self):
+        self.mock_backend = MagicMock()
+        self.calls = []
+        self.router = RoutingBackend(backends={'0': self.mock_backend})
+
+    def create_processor(self, label, event_names=None):
+        """Build a processor that records the events it is called for"""
+        def processor(event):
+            """Record the call"""
+            self.calls.append((label, event['name']))
+        if event_names is not None:
+            processor.event_names = event_names
+        return processor
+
+    def test_scoped_processors(self):
+        self.router.register_processor(self.create_processor('video', ['edx.video.*']))
+        self.router.register_processor(self.create_processor('all'))
+        self.router.register_processor(self.create_processor('problem', ('problem_check',)))
+
+        for name in ['edx.video.played', 'problem_check', 'other']:
+            self.router.send({'name': name})
+
+        self.assertEqual(self.calls, [
+            ('video', 'edx.video.played'),
+            ('all', 'edx.video.played'),
+            ('all', 'problem_check'),
+            ('problem', 'problem_check'),
+            ('all', 'other'),
+        ])
+        self.assertEqual(len(self.mock_backend.send.mock_calls), 3)
+
+    def test_events_skip_unrelated_processors(self):
+        self.router.register_processor(self.create_processor('video', ['edx.video.*']))
+        self.assertEqual(self.router.get_processor_chain('other'), ())
+
+        self.router.send({'name': 'other'})
+        self.assertEqual(self.calls, [])
+        self.mock_backend.send.assert_called_once_with({'name': 'other'})
+
+    def test_chains_cached(self):
+        self.router.register_processor(self.create_processor('video', ['edx.video.*']))
+        for _ in range(3):
+            self.router.send({'name': 'edx.video.played'})
+        self.assertEqual(self.router.processor_chains.hits, 2)
+
+    def test_registering_resets_cache(self):
+        self.router.send({'name': 'edx.video.played'})
+        self.router.register_processor(self.create_processor('video', ['edx.video.*']))
+        self.router.send({'name': 'edx.video.played'})
+        self.assertEqual(self.calls, [('video', 'edx.video.played')])
+
+    def test_unhashable_name(self):
+        self.router.register_processor(self.create_processor('all'))
+        self.router.send({'name': ['not', 'hashable']})
+        self.assertEqual(len(self.calls), 1)
+
+
+class TestRoutingBackendBatches(TestCase):
+    """Test sending several events together"""
+
+    def setUp(self):
+        self.batch_backend = MagicMock()
+        self.single_backend = MagicMock(spec=['send'])
+        self.router = RoutingBackend(backends={'0': self.batch_backend, '1': self.single_backend})
+
+    def test_send_batch(self):
+        def drop_second(event):
+            """Filter out one of the events"""
+            if event['name'] == 'second':
+                raise EventEmissionExit()
+            event['processed'] = True
+
+        self.router.register_processor(drop_second)
+        self.router.send_batch([{'name': 'first'}, {'name': 'second'}, {'name': 'third'}])
+
+        expected = [{'name': 'first', 'processed': True}, {'name': 'third', 'processed': True}]
+        self.batch_backend.send_batch.assert_called_once_with(expected)
+        self.assertFalse(self.batch_backend.send.called)
+        self.assertEqual(self.single_backend.send.mock_calls, [call(event) for event in expected])
+
+    def test_all_filtered(self):
+        self.router.register_processor(MagicMock(side_effect=EventEmissionExit))
+        self.router.send_batch([{'name': 'first'}])
+        self.assertFalse(self.batch_backend.send_batch.called)
+        self.assertFalse(self.single_backend.send.called)
+
+    def test_backend_errors(self):
+        self.batch_backend.send_batch.side_effect = ValueError
+        self.single_backend.send.side_effect = [ValueError, None]
+        self.assertEqual(self.router.send_batch([{'name': 'first'}, {'name': 'second'}]), 2)
+        self.single_backend.send.assert_called_with({'name': 'second'})
+
+    def test_reported_failures(self):
+        self.batch_backend.send_batch.return_value = 1
+        self.assertEqual(self.router.send_batch([{'name': 'first'}, {'name': 'second'}]), 1)
+
+        self.batch_backend.send_batch.return_value = None
+        self.assertEqual(self.router.send_batch([{'name': 'first'}, {'name': 'second'}]), 0)
+
+        self.router.register_processor(MagicMock(side_effect=EventEmissionExit))
+        self.assertEqual(self.router.send_batch([{'name': 'first'}]), 0)
+
+    def test_nested_router(self):
+        outer = RoutingBackend(backends={'inner': self.router})
+        outer.send_batch([{'name': 'first'}])
+        self.batch_backend.send_batch.assert_called_once_with([{'name': 'first'}])
+
+
+class TestRoutingBackendDrain(TestCase):
+    """Test flushing and closing processors and backends"""
+
+    def setUp(self):
+        self.calls = MagicMock()
+        self.processor = self.calls.processor
+        self.processor.flush.return_value = 0
+        self.backend = self.calls.backend
+        self.backend.flush.return_value = 2
+        self.backend.close.return_value = 1
+        self.router = RoutingBackend(backends={'0': self.backend}, processors=[self.processor])
+
+    def test_flush_order(self):
+        self.assertEqual(self.router.flush(5), 2)
+        self.assertEqual(
+            [name for name, _args, _kwargs in self.calls.mock_calls],
+            ['processor.flush', 'backend.flush']
+        )
+
+    def test_nested_close(self):
+        outer = RoutingBackend(backends={'inner': self.router, 'plain': MagicMock(spec=['send'])})
+        self.assertEqual(outer.close(), 1)
+        self.processor.close.assert_called_once_with(timeout=None)
+        self.backend.close.assert_called_once_with(timeout=None)
@@ -3,6 +3,7 @@
 from __future__ import absolute_import
 
 from unittest import TestCase
+from mock import call
 from mock import patch
 from mock import sentinel
 
@@ -73,6 +74,116 @@ class TestSegmentBackend(TestCase):
             sentinel.user_id, sentinel.name, event, context=expected_segment_context)
 
 
+class TestSegmentBackendProperties(TestCase):
+    """Test selecting the properties sent to segment.com"""
+
+    def setUp(self):
+        patcher = patch('eventtracking.backends.segment.analytics')
+        self.addCleanup(patcher.stop)
+        self.mock_analytics = patcher.start()
+
+    def create_event(self, name):
+        """Build an event with some context and data"""
+        return {
+            'name': name,
+            'context': {
+                'user_id': sentinel.user_id,
+                'course_id': sentinel.course_id,
+            },
+            'data': {
+                'id': sentinel.video_id,
+                'large': sentinel.large
+            }
+        }
+
+    def test_projection_by_name(self):
+        backend = SegmentBackend(properties={
+            'video.played': ['name', 'data.id'],
+            '*': ['context.course_id'],
+        })
+        backend.send(self.create_event('video.played'))
+        backend.send(self.create_event('other'))
+
+        self.assertEqual(self.mock_analytics.track.mock_calls, [
+            call(sentinel.user_id, 'video.played', {'name': 'video.played', 'data': {'id': sentinel.video_id}},
+                 context={}),
+            call(sentinel.user_id, 'other', {'context': {'course_id': sentinel.course_id}}, context={}),
+        ])
+
+    def test_unlisted_events_sent_whole(self):
+        backend = SegmentBackend(properties={'video.played': ['name']})
+        event = self.create_event('other')
+        backend.send(event)
+        self.mock_analytics.track.assert_called_once_with(sentinel.user_id, 'other', event, context={})
+
+
+class TestBufferedSegmentBackend(TestCase):
+    """Test buffering events sent to segment.com"""
+
+    def setUp(self):
+        patcher = patch('eventtracking.backends.segment.analytics')
+        self.addCleanup(patcher.stop)
+        self.mock_analytics = patcher.start()
+        self.backend = SegmentBackend(batch_size=10, flush_interval=60, max_queue_size=3)
+        self.addCleanup(self.backend.close)
+
+    def create_event(self):
+        """Build an event that will be sent to segment.com"""
+        return {
+            'name': sentinel.name,
+            'context': {
+                'user_id': sentinel.user_id
+            }
+        }
+
+    def test_events_sent_on_flush(self):
+        events = [self.create_event() for _ in range(2)]
+        for event in events:
+            self.backend.send(event)
+        self.assertFalse(self.mock_analytics.track.called)
+
+        self.backend.flush()
+
+        self.assertEqual(self.mock_analytics.track.mock_calls, [
+            call(sentinel.user_id, sentinel.name, event, context={})
+            for event in events
+        ])
+        self.mock_analytics.flush.assert_called_once_with()
+
+    def test_queue_depth_and_drops(self):
+        # Make sure the background thread can't empty the buffer while it is being filled
+        with self.backend.buffer._flush_lock:  # pylint: disable=protected-access
+            for _ in range(5):
+                self.backend.send(self.create_event())
+
+            self.assertEqual(self.backend.metrics['queue_depth'], 3)
+            self.assertEqual(self.backend.metrics['dropped_events'], 2)
+
+    def test_events_sent_on_close(self):
+        self.backend.send(self.create_event())
+        self.backend.close()
+        self.assertEqual(len(self.mock_analytics.track.mock_calls), 1)
+
+    def test_events_lost_on_close(self):
+        self.backend.send(self.create_event())
+        self.backend.send(self.create_event())
+        with patch('eventtracking.shutdown.time') as mock_time:
+            mock_time.time.return_value = 100
+            self.assertEqual(self.backend.close(timeout=0), 2)
+        self.assertFalse(self.mock_analytics.track.called)
+
+    def test_unbuffered_flush(self):
+        self.assertEqual(SegmentBackend().flush(), 0)
+        self.assertEqual(SegmentBackend().close(), 0)
+
+    def test_invalid_events_not_buffered(self):
+        self.backend.send({'name': sentinel.name})
+        self.assertEqual(self.backend.metrics['queue_depth'], 0)
+
+    def test_unbuffered_metrics(self):
+        self.assertEqual(SegmentBackend().metrics, {})
+
+
 class TestSegmentBackendMissingDependency(TestCase):
     """Test the segment.com backend without the package installed"""
 
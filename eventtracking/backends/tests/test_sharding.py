@@ -0,0 +1,170 @@
+"""Test the consistent hash sharding backend"""
+
+from __future__ import absolute_import
+
+from collections import Counter
+from unittest import TestCase
+
+from mock import MagicMock, patch
+
+from eventtracking.backends.sharding import ConsistentHashRing, ShardedBackend, hash_key
+
+
+class TestConsistentHashRing(TestCase):
+    """Test assigning keys to nodes"""
+
+    def setUp(self):
+        self.ring = ConsistentHashRing(virtual_nodes=100)
+        for node in ['a', 'b', 'c']:
+            self.ring.add_node(node)
+        self.keys = [str(i) for i in range(3000)]
+
+    def assignments(self):
+        """The node of each key"""
+        return dict((key, self.ring.get_node(key)) for key in self.keys)
+
+    def test_empty(self):
+        self.assertIsNone(ConsistentHashRing().get_node('key'))
+
+    def test_stable_hash(self):
+        self.assertEqual(hash_key('key'), hash_key(u'key'))
+        self.assertEqual(hash_key('key'), 0x3c6e0b8a9c15224a)
+
+    def test_balanced(self):
+        counts = Counter(self.assignments().values())
+        self.assertEqual(sorted(counts), ['a', 'b', 'c'])
+        for count in counts.values():
+            self.assertGreater(count, 700)
+
+    def test_adding_node_moves_few_keys(self):
+        before = self.assignments()
+        self.ring.add_node('d')
+        after = self.assignments()
+
+        moved = [key for key in self.keys if before[key] != after[key]]
+        self.assertTrue(all(after[key] == 'd' for key in moved))
+        self.assertLess(len(moved), len(self.keys) / 3)
+        self.assertGreater(len(moved), len(self.keys) / 8)
+
+    def test_removing_node(self):
+        before = self.assignments()
+        self.ring.remove_node('c')
+        after = self.assignments()
+
+        self.assertEqual(len(self.ring), 2)
+        for key in self.keys:
+            if before[key] != 'c':
+                self.assertEqual(before[key], after[key])
+            else:
+                self.assertIn(after[key], ['a', 'b'])
+
+    def test_weights(self):
+        self.ring.add_node('a', weight=3)
+        counts = Counter(self.assignments().values())
+        self.assertGreater(counts['a'], counts['b'] + counts['c'])
+
+
+class TestShardedBackend(TestCase):
+    """Test sending events to shards"""
+
+    def setUp(self):
+        self.shards = {'shard0': MagicMock(), 'shard1': MagicMock(), 'shard2': MagicMock()}
+        self.backend = ShardedBackend(backends=self.shards, shard_key=['context.user_id', 'context.course_id'])
+
+    def event(self, user_id, course_id='course'):
+        """Build an event for a user"""
+        return {'name': 'test', 'context': {'user_id': user_id, 'course_id': course_id}}
+
+    def test_same_key_same_shard(self):
+        events = [self.event(10) for _ in range(5)]
+        for event in events:
+            self.backend.send(event)
+
+        shard = self.backend.get_shard(events[0])
+        self.assertEqual(self.shards[shard].send.call_count, 5)
+        self.assertEqual(self.backend.metrics, {'sent_events': {shard: 5}})
+
+    def test_spread(self):
+        for user_id in range(300):
+            self.backend.send(self.event(user_id))
+        for shard in self.shards.values():
+            self.assertGreater(shard.send.call_count, 50)
+
+    def test_composite_key(self):
+        self.assertEqual(self.backend.get_key(self.event(10, 'a')), u'10|a')
+        self.assertEqual(self.backend.get_key({'name': 'test'}), u'|')
+
+    def test_single_key(self):
+        backend = ShardedBackend(backends=self.shards, shard_key='data.course_id')
+        self.assertEqual(backend.get_key({'data': {'course_id': u'\u00e9'}}), u'\u00e9')
+
+    def test_send_batch(self):
+        events = [self.event(user_id) for user_id in range(30)]
+        self.backend.send_batch(events)
+
+        batched = []
+        for name, shard in self.shards.iteritems():
+            (batch,), _kwargs = shard.send_batch.call_args
+            self.assertTrue(all(self.backend.get_shard(event) == name for event in batch))
+            batched.extend(batch)
+        self.assertEqual(len(batched), 30)
+
+    def test_send_batch_failures(self):
+        events = [self.event(user_id) for user_id in range(30)]
+        self.shards['shard0'].send_batch.side_effect = ValueError
+        self.shards['shard1'].send_batch.return_value = 1
+        expected = len([event for event in events if self.backend.get_shard(event) == 'shard0']) + 1
+        self.assertEqual(self.backend.send_batch(events), expected)
+        self.assertEqual(sum(self.backend.metrics['sent_events'].values()), 30 - expected)
+
+    def test_send_batch_without_batch_support(self):
+        shard = MagicMock(spec=['send'])
+        backend = ShardedBackend(backends={'only': shard})
+        backend.send_batch([self.event(1), self.event(2)])
+        self.assertEqual(shard.send.call_count, 2)
+
+    def test_add_shard(self):
+        events = [self.event(user_id) for user_id in range(300)]
+        before = [self.backend.get_shard(event) for event in events]
+
+        self.backend.add_shard('shard3', MagicMock())
+        after = [self.backend.get_shard(event) for event in events]
+        moved = [new for old, new in zip(before, after) if old != new]
+        self.assertTrue(moved)
+        self.assertEqual(set(moved), set(['shard3']))
+
+    def test_remove_shard(self):
+        self.assertIs(self.backend.remove_shard('shard0'), self.shards['shard0'])
+        for user_id in range(100):
+            self.assertNotEqual(self.backend.get_shard(self.event(user_id)), 'shard0')
+
+    def test_shard_removed_while_sending(self):
+        with patch.object(self.backend, 'get_shard', return_value='removed'):
+            self.backend.send(self.event(1))
+            self.backend.send_batch([self.event(1)])
+        self.assertEqual(self.backend.metrics['sent_events'], {})
+
+    def test_warm_up_failure(self):
+        self.shards['shard1'].warm_up.side_effect = ValueError
+        with self.assertRaisesRegexp(RuntimeError, 'shard1'):
+            self.backend.warm_up()
+        self.shards['shard0'].warm_up.assert_called_once_with()
+
+    def test_no_shards(self):
+        backend = ShardedBackend()
+        backend.send(self.event(1))
+        backend.send_batch([self.event(1)])
+
+    def test_invalid_backend(self):
+        with self.assertRaises(ValueError):
+            ShardedBackend(backends={'invalid': object()})
+
+    def test_drain_and_warm_up(self):
+        for shard in self.shards.values():
+            shard.close.return_value = 1
+        self.assertEqual(self.backend.close(5), 3)
+        self.backend.flush()
+        self.backend.warm_up()
+        for shard in self.shards.values():
+            self.assertTrue(shard.flush.called)
+            shard.warm_up.assert_called_once_with()
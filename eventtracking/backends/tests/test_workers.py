@@ -0,0 +1,104 @@
+"""Test the worker pool"""
+
+from __future__ import absolute_import
+
+import threading
+from unittest import TestCase
+
+from eventtracking.backends.workers import WorkerPool
+
+
+class TestWorkerPool(TestCase):
+    """Test the worker pool"""
+
+    def setUp(self):
+        self.results = []
+        self.unblock = threading.Event()
+        self.started = threading.Event()
+
+    def blocking_task(self):
+        """Occupy a worker thread until the test unblocks it"""
+        self.started.set()
+        self.unblock.wait(5)
+
+    def test_runs_tasks(self):
+        pool = WorkerPool(workers=2)
+        for i in range(10):
+            self.assertTrue(pool.submit(self.results.append, i))
+
+        self.assertEqual(pool.close(), 0)
+        self.assertEqual(sorted(self.results), range(10))
+        self.assertEqual(pool.metrics['completed_tasks'], 10)
+
+    def test_wait(self):
+        pool = WorkerPool(workers=1, queue_size=10)
+        self.assertEqual(pool.wait(), 0)
+
+        pool.submit(self.blocking_task)
+        self.assertTrue(self.started.wait(5))
+        pool.submit(self.results.append, 1)
+        self.assertEqual(pool.wait(0.05), 1)
+
+        self.unblock.set()
+        self.assertEqual(pool.wait(5), 0)
+        self.assertEqual(self.results, [1])
+        self.assertTrue(pool.submit(self.results.append, 2))
+        pool.close()
+
+    def fill_pool(self, pool):
+        """Block the only worker thread and fill the queue"""
+        pool.submit(self.blocking_task)
+        self.assertTrue(self.started.wait(5))
+        for i in range(pool.queue_size):
+            self.assertTrue(pool.submit(self.results.append, i))
+
+    def test_drop_newest(self):
+        pool = WorkerPool(workers=1, queue_size=2)
+        self.fill_pool(pool)
+
+        self.assertFalse(pool.submit(self.results.append, 'new'))
+
+        self.unblock.set()
+        pool.close()
+        self.assertEqual(self.results, [0, 1])
+        self.assertEqual(pool.metrics['dropped_tasks'], 1)
+
+    def test_drop_oldest(self):
+        pool = WorkerPool(workers=1, queue_size=2, drop_policy='drop_oldest')
+        self.fill_pool(pool)
+
+        self.assertTrue(pool.submit(self.results.append, 'new'))
+
+        self.unblock.set()
+        pool.close()
+        self.assertEqual(self.results, [1, 'new'])
+        self.assertEqual(pool.metrics['dropped_tasks'], 1)
+
+    def test_invalid_drop_policy(self):
+        with self.assertRaises(ValueError):
+            WorkerPool(drop_policy='random')
+
+    def test_failing_task(self):
+        def fail():
+            """Always raises an error"""
+            raise RuntimeError
+
+        pool = WorkerPool(workers=1)
+        pool.submit(fail)
+        pool.submit(self.results.append, 1)
+        pool.close()
+
+        self.assertEqual(self.results, [1])
+        self.assertEqual(pool.metrics['failed_tasks'], 1)
+
+    def test_close_with_timeout_reports_lost_tasks(self):
+        pool = WorkerPool(workers=1, queue_size=3)
+        self.fill_pool(pool)
+
+        self.assertEqual(pool.close(timeout=0.01), 3)
+        self.unblock.set()
+
+    def test_rejects_tasks_after_close(self):
+        pool = WorkerPool(workers=1)
+        pool.close()
+        self.assertFalse(pool.submit(self.results.append, 1))
@@ -0,0 +1,192 @@
+"""Bounded pool of background threads that lets backends move slow calls out of the emitting thread"""
+
+from __future__ import absolute_import
+
+import logging
+import os
+import threading
+import time
+from Queue import Queue, Full, Empty
+
+
+log = logging.getLogger(__name__)
+
+DROP_NEWEST = 'drop_newest'
+DROP_OLDEST = 'drop_oldest'
+
+_STOP = object()
+
+
+class WorkerPool(object):
+    """
+    Run tasks on a fixed number of daemon threads, fed by a bounded queue.
+
+    When the queue is full, new tasks are dropped according to `drop_policy`: "drop_newest" discards the task being
+    submitted, "drop_oldest" discards the task that has been waiting the longest to make room for the new one.
+
+    Threads are started when the first task is submitted, and are restarted if the process forks, so it is safe to
+    create the pool before a web server forks its workers.
+
+    Any exception raised by a task is logged and swallowed.
+
+    `name` is used to identify the pool in log messages and thread names.
+    `workers` is the number of threads that run tasks.
+    `queue_size` is the maximum number of tasks waiting to be run.
+    """
+
+    def __init__(self, name='', workers=4, queue_size=1000, drop_policy=DROP_NEWEST):
+        if drop_policy not in (DROP_NEWEST, DROP_OLDEST):
+            raise ValueError('Unknown drop policy %s' % drop_policy)
+
+        self.name = name
+        self.workers = workers
+        self.queue_size = queue_size
+        self.drop_policy = drop_policy
+
+        self.dropped_tasks = 0
+        self.completed_tasks = 0
+        self.failed_tasks = 0
+
+        self._queue = Queue(queue_size)
+        self._lock = threading.Lock()
+        self._threads = []
+        self._pid = None
+        self._closed = False
+
+    def submit(self, func, *args, **kwargs):
+        """
+        Queue `func(*args, **kwargs)` to be run on one of the worker threads.
+
+        Never blocks. Returns False if the task was dropped.
+        """
+        if self._closed:
+            self.dropped_tasks += 1
+            return False
+
+        self._ensure_threads_started()
+        task = (func, args, kwargs)
+        try:
+            self._queue.put_nowait(task)
+            return True
+        except Full:
+            pass
+
+        self.dropped_tasks += 1
+        if self.drop_policy == DROP_NEWEST:
+            return False
+
+        try:
+            self._queue.get_nowait()
+            self._queue.task_done()
+        except Empty:
+            pass
+        try:
+            self._queue.put_nowait(task)
+            return True
+        except Full:
+            return False
+
+    def _ensure_threads_started(self):
+        """Start the worker threads if they are not running in this process"""
+        if self._threads and self._pid == os.getpid():
+            return
+
+        with self._lock:
+            if self._threads and self._pid == os.getpid():
+                return
+
+            self._pid = os.getpid()
+            self._threads = []
+            for index in range(self.workers):
+                thread = threading.Thread(target=self._run, name='WorkerPool-{0}-{1}'.format(self.name, index))
+                thread.daemon = True
+                thread.start()
+                self._threads.append(thread)
+
+    def _run(self):
+        """Run tasks until told to stop"""
+        while True:
+            task = self._queue.get()
+            if task is _STOP:
+                self._queue.task_done()
+                return
+
+            func, args, kwargs = task
+            try:
+                func(*args, **kwargs)
+            except Exception:  # pylint: disable=broad-except
+                self.failed_tasks += 1
+                log.exception('Task failed in worker pool %s', self.name)
+            else:
+                self.completed_tasks += 1
+            finally:
+                self._queue.task_done()
+
+    def wait(self, timeout=None):
+        """
+        Wait up to `timeout` seconds for all submitted tasks to finish, without closing the pool.
+
+        Returns the number of tasks that were still queued when the deadline passed.
+        """
+        if not self._threads or self._pid != os.getpid():
+            return self.queue_depth
+
+        deadline = None if timeout is None else time.time() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = self._remaining(deadline)
+                if remaining == 0:
+                    break
+                self._queue.all_tasks_done.wait(remaining)
+
+        return self.queue_depth
+
+    def close(self, timeout=None):
+        """
+        Stop accepting tasks and wait up to `timeout` seconds for the queued tasks to finish.
+
+        Returns the number of tasks that were still queued when the deadline passed.
+        """
+        self._closed = True
+        if not self._threads or self._pid != os.getpid():
+            return self.queue_depth
+
+        deadline = None if timeout is None else time.time() + timeout
+
+        # The stop markers are queued after all pending tasks, so the threads run every task before stopping
+        for _ in self._threads:
+            try:
+                self._queue.put(_STOP, timeout=self._remaining(deadline))
+            except Full:
+                break
+
+        for thread in self._threads:
+            thread.join(self._remaining(deadline))
+
+        lost = self.queue_depth
+        if lost:
+            log.warning('Worker pool %s closed with %d tasks still queued', self.name, lost)
+        return lost
+
+    @staticmethod
+    def _remaining(deadline):
+        """Seconds until `deadline`, or None if there is no deadline"""
+        if deadline is None:
+            return None
+        return max(deadline - time.time(), 0)
+
+    @property
+    def queue_depth(self):
+        """The number of tasks waiting to be run"""
+        with self._queue.mutex:
+            return sum(1 for task in self._queue.queue if task is not _STOP)
+
+    @property
+    def metrics(self):
+        """A dictionary describing the current state of the pool"""
+        return {
+            'queue_depth': self.queue_depth,
+            'dropped_tasks': self.dropped_tasks,
+            'completed_tasks': self.completed_tasks,
+            'failed_tasks': self.failed_tasks,
+        }
@@ -0,0 +1,80 @@
+"""
+Bounded in-process caches.
+
+These are intended to hold small amounts of frequently used data (for example
+user details or decisions computed per event name) without letting memory
+usage grow with the number of distinct keys seen over the life of a process.
+"""
+
+from __future__ import absolute_import
+
+from collections import OrderedDict
+import threading
+import time
+
+
+class LRUCache(object):
+    """
+    A thread-safe mapping that holds at most `max_size` entries, evicting the least recently used entry when full.
+
+    `max_size` is the maximum number of entries kept in the cache.
+    `ttl` is the number of seconds an entry stays valid after it was set. Entries never expire if it is `None`.
+    """
+
+    def __init__(self, max_size=1000, ttl=None):
+        if max_size < 1:
+            raise ValueError('The LRUCache max_size must be a positive integer.')
+
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """Return the value cached for `key`, or `default` if it is missing or has expired"""
+        with self._lock:
+            try:
+                value, expires_at = self._entries.pop(key)
+            except KeyError:
+                self.misses += 1
+                return default
+
+            if expires_at is not None and expires_at <= time.time():
+                self.misses += 1
+                return default
+
+            # Re-insert the entry to mark it as the most recently used
+            self._entries[key] = (value, expires_at)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        """Cache `value` for `key`, evicting the least recently used entry if the cache is full"""
+        expires_at = None
+        if self.ttl is not None:
+            expires_at = time.time() + self.ttl
+
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (value, expires_at)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        """Remove `key` from the cache if it is present"""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """Remove all entries from the cache"""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return self.get(key, self) is not self
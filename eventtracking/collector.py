@@ -0,0 +1,233 @@
+"""
+Receive events forwarded by `eventtracking.backends.forwarder.SocketForwardingBackend` and send them to real backends.
+
+Running a single collector per host moves the work done by backends, such as
+database connections and HTTP requests, out of every web worker. Events are
+read from a local datagram socket and sent to the backend in batches, see
+`eventtracking.backends.routing.RoutingBackend.send_batch()`.
+"""
+
+from __future__ import absolute_import
+
+from datetime import datetime
+import json
+import logging
+import os
+import socket
+import time
+
+from pytz import UTC
+
+from eventtracking import shutdown
+from eventtracking.backends.forwarder import (
+    DATE_TAG, DATETIME_TAG, MAX_DATAGRAM_SIZE, SOCKET_UNIX, create_socket, decode_frames
+)
+
+LOG = logging.getLogger(__name__)
+
+# Formats of the datetimes written by `eventtracking.backends.forwarder.TaggedJSONEncoder`, once the UTC offset is
+# removed
+DATETIME_FORMATS = ('%Y-%m-%dT%H:%M:%S.%f', '%Y-%m-%dT%H:%M:%S')
+DATE_FORMAT = '%Y-%m-%d'
+UTC_OFFSET = '+00:00'
+
+
+def decode_event(frame):
+    """
+    Decode an event encoded by `eventtracking.backends.forwarder.encode_event()`.
+
+    Tagged datetimes and dates are decoded wherever they appear in the event, datetimes are timezone aware and in UTC.
+    """
+    return json.loads(frame.decode('utf-8'), object_hook=_decode_tagged)
+
+
+def _decode_tagged(obj):
+    """Decode a JSON object if it is a tagged datetime or date, otherwise return it unchanged"""
+    if len(obj) != 1:
+        return obj
+
+    value = obj.get(DATETIME_TAG)
+    if isinstance(value, basestring) and value.endswith(UTC_OFFSET):
+        for datetime_format in DATETIME_FORMATS:
+            try:
+                return datetime.strptime(value[:-len(UTC_OFFSET)], datetime_format).replace(tzinfo=UTC)
+            except ValueError:
+                continue
+
+    value = obj.get(DATE_TAG)
+    if isinstance(value, basestring):
+        try:
+            return datetime.strptime(value, DATE_FORMAT).date()
+        except ValueError:
+            pass
+
+    return obj
+
+
+class EventCollector(object):
+    """
+    Read events from a datagram socket and send them to `backend` in batches.
+
+    A batch is sent as soon as `batch_size` events have been received, or once `flush_interval` seconds have passed
+    since the previous batch was sent. Backends without a `send_batch()` method receive the events one at a time.
+
+    `address` is the path of a Unix socket, or a `(host, port)` pair for UDP.
+    `backend` is the backend the events are sent to, typically a `RoutingBackend`.
+    `socket_type` is either "unix" or "udp".
+    `max_datagram_size` is the size of the largest datagram that can be received, it must be at least as large as the
+        `max_datagram_size` of the forwarding backends.
+    `receive_buffer_size` sets the size of the socket receive buffer in bytes, a larger buffer absorbs larger bursts
+        of events.
+    """
+
+    def __init__(
+            self, address, backend, socket_type=SOCKET_UNIX, batch_size=100, flush_interval=1.0,
+            max_datagram_size=MAX_DATAGRAM_SIZE, receive_buffer_size=None
+    ):  # pylint: disable=too-many-arguments
+        self.address = address if socket_type == SOCKET_UNIX else tuple(address)
+        self.backend = backend
+        self.socket_type = socket_type
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_datagram_size = max_datagram_size
+        self.receive_buffer_size = receive_buffer_size
+
+        self.received_events = 0
+        self.invalid_datagrams = 0
+        self.sent_batches = 0
+        self.sent_events = 0
+        self.failed_batches = 0
+        self.failed_events = 0
+
+        self.socket = None
+        self._events = []
+        self._last_flush = time.time()
+        self._stopped = False
+
+    def bind(self):
+        """Create the socket and start listening on the address"""
+        sock = create_socket(self.socket_type)
+        if self.socket_type == SOCKET_UNIX and os.path.exists(self.address):
+            # Remove the socket left behind by a previous collector
+            os.unlink(self.address)
+        if self.receive_buffer_size:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.receive_buffer_size)
+        sock.bind(self.address)
+        sock.settimeout(self.flush_interval)
+        self.socket = sock
+
+    def serve_forever(self):
+        """Receive and send events until `stop()` is called"""
+        if self.socket is None:
+            self.bind()
+
+        LOG.info('Collecting events on %s', self.address)
+        while not self._stopped:
+            self.receive()
+            if len(self._events) >= self.batch_size or time.time() - self._last_flush >= self.flush_interval:
+                self.flush()
+
+    def receive(self):
+        """
+        Wait for a single datagram and add the events it contains to the current batch.
+
+        Returns False if no datagram was received before the socket timed out.
+        """
+        try:
+            datagram = self.socket.recv(self.max_datagram_size)
+        except socket.timeout:
+            return False
+        except socket.error as error:
+            # Interrupted by a signal, such as the one that stops the collector, or nothing left to read
+            LOG.debug('Error receiving events: %s', error)
+            return False
+
+        try:
+            events = [decode_event(frame) for frame in decode_frames(datagram)]
+        except ValueError:
+            self.invalid_datagrams += 1
+            LOG.warning('Discarded an invalid datagram of %d bytes', len(datagram))
+            return True
+
+        self.received_events += len(events)
+        self._events.extend(events)
+        return True
+
+    def flush(self):
+        """
+        Send the events received so far to the backend.
+
+        Events the backend fails to send are logged and dropped, they are counted in the metrics of the collector. A
+        `send_batch()` method of the backend that swallows errors can report how many events it could not send by
+        returning an integer, as `eventtracking.backends.routing.RoutingBackend.send_batch()` does.
+        """
+        self._last_flush = time.time()
+        events = self._events
+        if not events:
+            return
+        self._events = []
+
+        send_batch = getattr(self.backend, 'send_batch', None)
+        if callable(send_batch):
+            try:
+                failed = send_batch(events)
+            except Exception:  # pylint: disable=broad-except
+                LOG.exception('Unable to send %d events', len(events))
+                failed = len(events)
+            else:
+                if not isinstance(failed, (int, long)) or isinstance(failed, bool):
+                    failed = 0
+                failed = min(failed, len(events))
+        else:
+            failed = 0
+            for event in events:
+                try:
+                    self.backend.send(event)
+                except Exception:  # pylint: disable=broad-except
+                    LOG.exception('Unable to send event %s', event.get('name'))
+                    failed += 1
+
+        if failed:
+            self.failed_batches += 1
+        else:
+            self.sent_batches += 1
+        self.sent_events += len(events) - failed
+        self.failed_events += failed
+
+    def stop(self):
+        """Stop serving, safe to call from a signal handler"""
+        self._stopped = True
+
+    def close(self, timeout=None):
+        """
+        Send the pending events, close the backend and the socket, waiting at most `timeout` seconds for the backend.
+
+        Datagrams that were already waiting in the socket are read and sent too. Returns the number of events lost by
+        the backend.
+        """
+        if self.socket is not None:
+            self.socket.setblocking(False)
+            while self.receive():
+                pass
+        self.flush()
+        lost = shutdown.drain_component(self.backend, shutdown.CLOSE, timeout)
+
+        if self.socket is not None:
+            self.socket.close()
+            self.socket = None
+            if self.socket_type == SOCKET_UNIX and os.path.exists(self.address):
+                os.unlink(self.address)
+        return lost
+
+    @property
+    def metrics(self):
+        """A dictionary describing the events received, and those sent to the backend or lost because it failed"""
+        return {
+            'received_events': self.received_events,
+            'invalid_datagrams': self.invalid_datagrams,
+            'sent_batches': self.sent_batches,
+            'sent_events': self.sent_events,
+            'failed_batches': self.failed_batches,
+            'failed_events': self.failed_events,
+            'queue_depth': len(self._events),
+        }
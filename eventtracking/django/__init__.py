@@ -2,11 +2,14 @@
 
 from __future__ import absolute_import
 
+from functools import partial
 from importlib import import_module
 
 from django.conf import settings
 
 from eventtracking import tracker
+from eventtracking.lazy import LazyBackend, LazyProcessor
+from eventtracking.shutdown import install_shutdown_hooks
 from eventtracking.tracker import Tracker
 from eventtracking.locator import ThreadLocalContextLocator
 
@@ -14,12 +17,23 @@ from eventtracking.locator import ThreadLocalContextLocator
 DJANGO_BACKEND_SETTING_NAME = 'EVENT_TRACKING_BACKENDS'
 DJANGO_PROCESSOR_SETTING_NAME = 'EVENT_TRACKING_PROCESSORS'
 DJANGO_ENABLED_SETTING_NAME = 'EVENT_TRACKING_ENABLED'
+DJANGO_LAZY_SETTING_NAME = 'EVENT_TRACKING_LAZY'
+DJANGO_SHUTDOWN_HOOKS_SETTING_NAME = 'EVENT_TRACKING_SHUTDOWN_HOOKS'
+DJANGO_SHUTDOWN_TIMEOUT_SETTING_NAME = 'EVENT_TRACKING_SHUTDOWN_TIMEOUT'
 
 
 class DjangoTracker(Tracker):
     """
     A `eventtracking.tracker.Tracker` that constructs its backends from
     Django settings.
+
+    If the Django setting "EVENT_TRACKING_LAZY" is True, each backend and
+    processor is wrapped in a proxy (see `eventtracking.lazy`) and only
+    constructed when the first event is sent to it. Configuration errors,
+    such as an unknown "ENGINE", are then raised by that first event instead
+    of when the tracker is created. If constructing an object fails, for
+    example because its database can't be reached, it is retried at most
+    every 30 seconds and the events sent to it are dropped in the meantime.
     """
 
     def __init__(self):
@@ -51,7 +65,12 @@ class DjangoTracker(Tracker):
         """
         config = getattr(settings, DJANGO_BACKEND_SETTING_NAME, {})
 
-        backends = self.instantiate_objects(config)
+        if self.is_lazy:
+            backends = {}
+            for name, backend_config in config.iteritems():
+                backends[name] = self.instantiate_lazily(backend_config, LazyBackend, name)
+        else:
+            backends = self.instantiate_objects(config)
 
         return backends
 
@@ -141,6 +160,23 @@ class DjangoTracker(Tracker):
 
         return cls(**options)
 
+    @property
+    def is_lazy(self):
+        """True if backends and processors should only be constructed when they are first used"""
+        return getattr(settings, DJANGO_LAZY_SETTING_NAME, False)
+
+    def instantiate_lazily(self, node, proxy_class, name=None):
+        """
+        Wrap the object described by `node` in a `proxy_class` that will construct it when it is first used.
+
+        `name` identifies the object in its representation, it defaults to the "ENGINE" of the object.
+
+        Nodes that don't describe an object, because they don't contain an "ENGINE" key, are processed immediately.
+        """
+        if not isinstance(node, dict) or 'ENGINE' not in node:
+            return self.instantiate_objects(node)
+        return proxy_class(partial(self.instantiate_from_dict, node), name=name or node['ENGINE'])
+
     def create_processors_from_settings(self):
         """
         Expects the Django setting "EVENT_TRACKING_PROCESSORS" to be defined and
@@ -162,15 +198,32 @@ class DjangoTracker(Tracker):
         """
         config = getattr(settings, DJANGO_PROCESSOR_SETTING_NAME, [])
 
-        processors = self.instantiate_objects(config)
+        if self.is_lazy:
+            processors = []
+            for processor_config in config:
+                options = processor_config.get('OPTIONS', {}) if isinstance(processor_config, dict) else {}
+                proxy_class = partial(LazyProcessor, event_names=options.get('event_names'))
+                processors.append(self.instantiate_lazily(processor_config, proxy_class))
+        else:
+            processors = self.instantiate_objects(config)
 
         return processors
 
 
 def override_default_tracker():
-    """Sets the default tracker to a DjangoTracker"""
+    """
+    Sets the default tracker to a DjangoTracker
+
+    If the Django setting "EVENT_TRACKING_SHUTDOWN_HOOKS" is True, the tracker is
+    also closed when the process exits or receives SIGTERM, giving it
+    "EVENT_TRACKING_SHUTDOWN_TIMEOUT" seconds (10 by default) to send the events
+    it holds in memory. See `eventtracking.shutdown`.
+    """
     if getattr(settings, DJANGO_ENABLED_SETTING_NAME, False):
         tracker.register_tracker(DjangoTracker())
 
+        if getattr(settings, DJANGO_SHUTDOWN_HOOKS_SETTING_NAME, False):
+            install_shutdown_hooks(timeout=getattr(settings, DJANGO_SHUTDOWN_TIMEOUT_SETTING_NAME, 10))
+
 
 override_default_tracker()
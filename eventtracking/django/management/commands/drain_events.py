@@ -0,0 +1,37 @@
+"""
+Run a management command and then send the events it left in memory.
+
+Example::
+
+    python manage.py drain_events --timeout 30 some_command --some-option
+"""
+
+from __future__ import absolute_import
+
+import argparse
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+from eventtracking import tracker
+
+
+class Command(BaseCommand):
+    """Run a management command and then close the default tracker, reporting how many events were lost"""
+
+    help = 'Run a management command, then flush and close the event tracker within a deadline.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--timeout', type=float, default=10,
+            help='Number of seconds allowed to send the events held in memory.'
+        )
+        parser.add_argument('command_name', help='The management command to run.')
+        parser.add_argument('command_args', nargs=argparse.REMAINDER, help='Arguments passed to the command.')
+
+    def handle(self, *args, **options):
+        try:
+            call_command(options['command_name'], *options['command_args'])
+        finally:
+            lost = tracker.close(timeout=options['timeout'])
+            self.stdout.write('Closed the event tracker, {0} events were lost.'.format(lost))
@@ -0,0 +1,66 @@
+"""
+Run a collector that receives the events forwarded by web workers and sends them to the configured backends.
+
+Run it with settings whose "EVENT_TRACKING_BACKENDS" contain the real backends, while the web workers use a
+`eventtracking.backends.forwarder.SocketForwardingBackend` pointing at the same address. Processors already ran in the
+web workers, so the collector settings usually don't configure any. Example::
+
+    DJANGO_SETTINGS_MODULE=myproject.collector_settings python manage.py run_event_collector /run/tracking.sock
+"""
+
+from __future__ import absolute_import
+
+import signal
+
+from django.core.management.base import BaseCommand, CommandError
+
+from eventtracking import tracker
+from eventtracking.backends.forwarder import SOCKET_UNIX, SOCKET_UDP
+from eventtracking.collector import EventCollector
+
+
+class Command(BaseCommand):
+    """Receive forwarded events and send them to the backends of the default tracker"""
+
+    help = 'Receive events forwarded over a local socket and send them to the configured backends.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('address', help='Path of the Unix socket, or host:port when using UDP.')
+        parser.add_argument('--udp', action='store_true', help='Listen on a UDP port instead of a Unix socket.')
+        parser.add_argument('--batch-size', type=int, default=100, help='Maximum number of events sent together.')
+        parser.add_argument(
+            '--flush-interval', type=float, default=1.0, help='Maximum number of seconds events wait to be sent.'
+        )
+        parser.add_argument(
+            '--timeout', type=float, default=10, help='Number of seconds allowed to send pending events on exit.'
+        )
+
+    def handle(self, *args, **options):
+        collector = EventCollector(
+            self.parse_address(options['address'], options['udp']),
+            tracker.get_tracker().routing_backend,
+            socket_type=SOCKET_UDP if options['udp'] else SOCKET_UNIX,
+            batch_size=options['batch_size'],
+            flush_interval=options['flush_interval'],
+        )
+
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, lambda _signum, _frame: collector.stop())
+
+        try:
+            collector.serve_forever()
+        finally:
+            lost = collector.close(options['timeout'])
+            self.stdout.write('Stopped the event collector, {0} events were lost.'.format(lost))
+
+    @staticmethod
+    def parse_address(address, udp):
+        """Convert a host:port string to a tuple when using UDP"""
+        if not udp:
+            return address
+
+        host, _, port = address.rpartition(':')
+        try:
+            return (host or 'localhost', int(port))
+        except ValueError:
+            raise CommandError('Invalid UDP address %s, expected host:port' % address)
@@ -0,0 +1,188 @@
+"""Django middleware that integrates the tracker with the request cycle"""
+
+from __future__ import absolute_import
+
+from collections import Mapping
+import logging
+
+from django.core.exceptions import SuspiciousOperation
+
+from eventtracking import tracker
+
+LOG = logging.getLogger(__name__)
+
+REQUEST_CONTEXT_NAME = 'django.request'
+
+
+class TrackerMiddleware(object):
+    """Base class for middleware that uses the tracker registered as `tracker_name`"""
+
+    tracker_name = tracker.DEFAULT_TRACKER_NAME
+
+    def get_tracker(self):
+        """The tracker used by this middleware, or None if it hasn't been registered"""
+        try:
+            return tracker.get_tracker(self.tracker_name)
+        except KeyError:
+            return None
+
+    @staticmethod
+    def call_after_response(response, callback):
+        """
+        Call `callback` once the response has been sent.
+
+        Regular responses are complete when they are returned by the middleware, so the callback is called immediately.
+        The callback is called once streaming responses are exhausted or closed.
+        """
+        if not getattr(response, 'streaming', False):
+            callback()
+            return
+
+        def stream(content):
+            """Yield the streamed content, calling the callback afterwards"""
+            try:
+                for chunk in content:
+                    yield chunk
+            finally:
+                callback()
+
+        response.streaming_content = stream(response.streaming_content)
+
+
+class RequestContext(Mapping):
+    """
+    The tracking context of a Django request.
+
+    The fields are only read from the request the first time the context is used, so requests that don't emit any
+    events don't pay for them. The values are then reused for every event emitted by the request.
+    """
+
+    def __init__(self, request):
+        self.request = request
+        self._fields = None
+
+    @property
+    def fields(self):
+        """A dictionary containing the context fields"""
+        if self._fields is None:
+            self._fields = self.build()
+        return self._fields
+
+    def build(self):
+        """Read the context fields from the request"""
+        request = self.request
+        meta = request.META
+
+        user = getattr(request, 'user', None)
+        user_id = None
+        if user is not None and user.is_authenticated():
+            user_id = user.pk
+
+        session = getattr(request, 'session', None)
+
+        try:
+            host = request.get_host()
+        except SuspiciousOperation:
+            host = meta.get('SERVER_NAME', '')
+
+        forwarded_for = meta.get('HTTP_X_FORWARDED_FOR')
+        if forwarded_for:
+            ip_address = forwarded_for.split(',')[0].strip()
+        else:
+            ip_address = meta.get('REMOTE_ADDR', '')
+
+        return {
+            'user_id': user_id,
+            'session': getattr(session, 'session_key', None) or '',
+            'path': request.path,
+            'agent': meta.get('HTTP_USER_AGENT', ''),
+            'host': host,
+            'ip': ip_address,
+        }
+
+    def __getitem__(self, key):
+        return self.fields[key]
+
+    def __iter__(self):
+        return iter(self.fields)
+
+    def __len__(self):
+        return len(self.fields)
+
+    def keys(self):
+        return self.fields.keys()
+
+
+class RequestContextMiddleware(TrackerMiddleware):
+    """
+    Add the details of the current request to the context of the events it emits.
+
+    The context contains the `user_id`, `session` key, `path`, user `agent`, `host` and `ip` address of the request.
+    It is entered once per request, and computed the first time an event is emitted, see `RequestContext`.
+
+    Add it after the session and authentication middleware in `MIDDLEWARE_CLASSES`, so that it can read the user and
+    session of the request.
+    """
+
+    context_name = REQUEST_CONTEXT_NAME
+
+    def process_request(self, request):
+        """Enter the context of the request"""
+        context_tracker = self.get_tracker()
+        if context_tracker is not None:
+            context_tracker.enter_context(self.context_name, RequestContext(request))
+
+    def process_response(self, _request, response):
+        """Exit the context of the request once the response has been sent"""
+        context_tracker = self.get_tracker()
+        if context_tracker is not None:
+            self.call_after_response(response, lambda: self._exit_context(context_tracker))
+        return response
+
+    def _exit_context(self, context_tracker):
+        """Exit the context of the request if it is still active"""
+        try:
+            context_tracker.exit_context(self.context_name)
+        except KeyError:
+            pass
+
+
+class EventBatchingMiddleware(TrackerMiddleware):
+    """
+    Collect the events emitted while handling a request and send them together once the response is ready.
+
+    Each event still goes through the processors individually, but backends that support batches receive all of the
+    events emitted by a request in a single `send_batch()` call, see
+    `eventtracking.backends.routing.RoutingBackend.send_batch()`. The events of streaming responses are sent after the
+    whole response has been streamed.
+
+    Add it to the start of `MIDDLEWARE_CLASSES` so that events emitted by other middleware are included::
+
+        MIDDLEWARE_CLASSES = (
+            'eventtracking.django.middleware.EventBatchingMiddleware',
+            ...
+        )
+    """
+
+    def process_request(self, _request):
+        """Start collecting the events emitted by this request"""
+        batching_tracker = self.get_tracker()
+        if batching_tracker is None:
+            return
+
+        if batching_tracker.is_batching:
+            # A previous request on this thread never completed its batch, send its events now
+            LOG.warning('Sending events left over from a previous request')
+            while batching_tracker.is_batching:
+                batching_tracker.end_batch()
+
+        batching_tracker.begin_batch()
+
+    def process_response(self, _request, response):
+        """Send the events emitted by this request, or arrange for them to be sent once the response is streamed"""
+        batching_tracker = self.get_tracker()
+        if batching_tracker is None or not batching_tracker.is_batching:
+            return response
+
+        self.call_after_response(response, batching_tracker.end_batch)
+        return response
@@ -18,6 +18,8 @@ MIDDLEWARE_CLASSES = (
 )
 
 INSTALLED_APPS = [
+    'django.contrib.auth',
+    'django.contrib.contenttypes',
     'django_nose',
     'eventtracking.django'
 ]
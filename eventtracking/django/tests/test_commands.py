@@ -0,0 +1,98 @@
+"""Tests for the Django management commands"""
+
+from __future__ import absolute_import
+
+from StringIO import StringIO
+from unittest import TestCase
+
+from django.core.management.base import CommandError
+from mock import patch, sentinel
+
+from eventtracking.django.management.commands import drain_events, run_event_collector
+
+
+class TestDrainEventsCommand(TestCase):
+    """Test running a command and draining the tracker afterwards"""
+
+    def setUp(self):
+        call_command_patcher = patch('eventtracking.django.management.commands.drain_events.call_command')
+        self.call_command = call_command_patcher.start()
+        self.addCleanup(call_command_patcher.stop)
+
+        tracker_patcher = patch('eventtracking.django.management.commands.drain_events.tracker')
+        self.tracker = tracker_patcher.start()
+        self.addCleanup(tracker_patcher.stop)
+        self.tracker.close.return_value = 3
+
+        self.out = StringIO()
+
+    def run_command(self, *args):
+        """Parse the arguments and run the command"""
+        command = drain_events.Command(stdout=self.out)
+        options = command.create_parser('manage.py', 'drain_events').parse_args(args)
+        command.handle(**vars(options))
+
+    def test_drain_events(self):
+        self.run_command('--timeout', '2.5', 'some_command', 'arg', '--option')
+
+        self.call_command.assert_called_once_with('some_command', 'arg', '--option')
+        self.tracker.close.assert_called_once_with(timeout=2.5)
+        self.assertIn('3 events were lost', self.out.getvalue())
+
+    def test_drains_after_failure(self):
+        self.call_command.side_effect = ValueError
+        with self.assertRaises(ValueError):
+            self.run_command('some_command')
+        self.tracker.close.assert_called_once_with(timeout=10)
+
+
+class TestRunEventCollectorCommand(TestCase):
+    """Test running the event collector"""
+
+    def setUp(self):
+        collector_patcher = patch('eventtracking.django.management.commands.run_event_collector.EventCollector')
+        self.collector_class = collector_patcher.start()
+        self.addCleanup(collector_patcher.stop)
+        self.collector = self.collector_class.return_value
+        self.collector.close.return_value = 0
+
+        tracker_patcher = patch('eventtracking.django.management.commands.run_event_collector.tracker')
+        self.tracker = tracker_patcher.start()
+        self.addCleanup(tracker_patcher.stop)
+        self.tracker.get_tracker.return_value.routing_backend = sentinel.backend
+
+        signal_patcher = patch('eventtracking.django.management.commands.run_event_collector.signal')
+        self.signal = signal_patcher.start()
+        self.addCleanup(signal_patcher.stop)
+
+        self.out = StringIO()
+
+    def run_command(self, *args):
+        """Parse the arguments and run the command"""
+        command = run_event_collector.Command(stdout=self.out)
+        options = command.create_parser('manage.py', 'run_event_collector').parse_args(args)
+        command.handle(**vars(options))
+
+    def test_unix_socket(self):
+        self.run_command('/run/tracking.sock', '--batch-size', '50', '--timeout', '3')
+
+        self.collector_class.assert_called_once_with(
+            '/run/tracking.sock', sentinel.backend, socket_type='unix', batch_size=50, flush_interval=1.0
+        )
+        self.collector.serve_forever.assert_called_once_with()
+        self.collector.close.assert_called_once_with(3)
+        self.assertIn('0 events were lost', self.out.getvalue())
+
+        (_signum, handler), _kwargs = self.signal.signal.call_args
+        handler(None, None)
+        self.collector.stop.assert_called_once_with()
+
+    def test_udp(self):
+        self.run_command('127.0.0.1:9999', '--udp')
+        args, kwargs = self.collector_class.call_args
+        self.assertEqual(args[0], ('127.0.0.1', 9999))
+        self.assertEqual(kwargs['socket_type'], 'udp')
+
+    def test_invalid_udp_address(self):
+        with self.assertRaises(CommandError):
+            self.run_command('localhost', '--udp')
@@ -6,6 +6,7 @@ from unittest import TestCase
 
 from django.test.utils import override_settings
 
+from mock import patch
 from mock import sentinel
 
 from eventtracking import django
@@ -181,6 +182,22 @@ class TestConfiguration(TestCase):
         django.override_default_tracker()
         self.assertTrue(isinstance(tracker.get_tracker(), django.DjangoTracker))
 
+    @override_settings(
+        EVENT_TRACKING_ENABLED=True,
+        EVENT_TRACKING_SHUTDOWN_HOOKS=True,
+        EVENT_TRACKING_SHUTDOWN_TIMEOUT=3
+    )
+    @patch('eventtracking.django.install_shutdown_hooks')
+    def test_installs_shutdown_hooks(self, mock_install):
+        django.override_default_tracker()
+        mock_install.assert_called_once_with(timeout=3)
+
+    @override_settings(EVENT_TRACKING_ENABLED=True)
+    @patch('eventtracking.django.install_shutdown_hooks')
+    def test_shutdown_hooks_disabled(self, mock_install):
+        django.override_default_tracker()
+        self.assertFalse(mock_install.called)
+
     @override_settings(EVENT_TRACKING_ENABLED=False)
     def test_leaves_default_tracker_alone(self):
         django.override_default_tracker()
@@ -231,6 +248,70 @@ class TestConfiguration(TestCase):
         self.assertTrue(isinstance(self.tracker.processors[0], NopProcessor))
         self.assertTrue(isinstance(self.tracker.processors[1], NopProcessor))
 
+    @override_settings(
+        EVENT_TRACKING_LAZY=True,
+        EVENT_TRACKING_BACKENDS={
+            'lazy': {
+                'ENGINE': 'eventtracking.django.tests.test_configuration.CountingBackend',
+                'OPTIONS': {
+                    'option': sentinel.option_value
+                }
+            }
+        },
+        EVENT_TRACKING_PROCESSORS=[
+            {
+                'ENGINE': 'eventtracking.django.tests.test_configuration.ProcessorWithOptions',
+                'OPTIONS': {
+                    'event_names': ['edx.video.*']
+                }
+            }
+        ]
+    )
+    def test_lazy(self):
+        CountingBackend.instances = 0
+        self.configure_tracker()
+        backend = self.tracker.get_backend('lazy')
+        processor = self.tracker.processors[0]
+        self.assertFalse(backend.is_loaded)
+        self.assertFalse(processor.is_loaded)
+        self.assertEqual(processor.event_names, ['edx.video.*'])
+        self.assertEqual(CountingBackend.instances, 0)
+
+        self.tracker.emit('other')
+        self.assertTrue(backend.is_loaded)
+        self.assertFalse(processor.is_loaded)
+        self.assertEqual(backend.option, sentinel.option_value)
+
+        self.tracker.emit('edx.video.played')
+        self.assertTrue(processor.is_loaded)
+        self.assertEqual(CountingBackend.instances, 1)
+        self.assertEqual(len(backend.events), 2)
+
+    @override_settings(
+        EVENT_TRACKING_LAZY=True,
+        EVENT_TRACKING_BACKENDS={
+            'invalid_class': {
+                'ENGINE': 'eventtracking.django.tests.test_configuration.BarBackend'
+            }
+        }
+    )
+    def test_lazy_invalid_class(self):
+        self.configure_tracker()
+        with self.assertRaises(ValueError):
+            self.tracker.get_backend('invalid_class').send({})
+
+    @override_settings(
+        EVENT_TRACKING_LAZY=True,
+        EVENT_TRACKING_BACKENDS={
+            "no_engine": {
+                'OPTIONS': {}
+            }
+        }
+    )
+    def test_lazy_ignore_no_engine(self):
+        with self.assertRaises(ValueError):
+            self.configure_tracker()
+
 
 class TrivialFakeBackend(object):
     """A trivial fake backend without any options"""
@@ -276,3 +357,17 @@ class NestedBackend(TrivialFakeBackend):
     def __init__(self, backends=None, processors=None, **_kwargs):
         self.backends = backends or {}
         self.processors = processors or []
+
+
+class CountingBackend(FakeBackendWithOptions):
+    """Counts its instances and stores the events it receives"""
+
+    instances = 0
+
+    def __init__(self, **kwargs):
+        super(CountingBackend, self).__init__(**kwargs)
+        CountingBackend.instances += 1
+        self.events = []
+
+    def send(self, event):
+        self.events.append(event)
@@ -0,0 +1,158 @@
+"""Tests for the Django middleware"""
+
+from __future__ import absolute_import
+
+from unittest import TestCase
+
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test.client import RequestFactory
+from django.test.utils import override_settings
+from mock import MagicMock, PropertyMock, sentinel
+
+from eventtracking import tracker
+from eventtracking.django.middleware import EventBatchingMiddleware, RequestContext, RequestContextMiddleware
+
+
+class TestEventBatchingMiddleware(TestCase):
+    """Test collecting the events emitted by a request in a batch"""
+
+    def setUp(self):
+        self.backend = MagicMock()
+        self.tracker = tracker.Tracker({'backend': self.backend})
+        self.middleware = EventBatchingMiddleware()
+        self.middleware.tracker_name = 'test.batching'
+        tracker.register_tracker(self.tracker, self.middleware.tracker_name)
+        self.addCleanup(tracker.TRACKERS.pop, self.middleware.tracker_name)
+
+    def sent_names(self):
+        """The names of the events sent to the backend in a batch"""
+        (events,), _kwargs = self.backend.send_batch.call_args
+        return [event['name'] for event in events]
+
+    def test_batches_request_events(self):
+        self.middleware.process_request(sentinel.request)
+        self.tracker.emit('first')
+        self.tracker.emit('second')
+        self.assertFalse(self.backend.send_batch.called)
+
+        response = HttpResponse()
+        self.assertIs(self.middleware.process_response(sentinel.request, response), response)
+        self.assertEqual(self.sent_names(), ['first', 'second'])
+        self.assertFalse(self.tracker.is_batching)
+
+    def test_streaming_response(self):
+        def content():
+            """Emit an event while streaming"""
+            yield 'a'
+            self.tracker.emit('streamed')
+            yield 'b'
+
+        self.middleware.process_request(sentinel.request)
+        self.tracker.emit('first')
+        response = self.middleware.process_response(sentinel.request, StreamingHttpResponse(content()))
+        self.assertFalse(self.backend.send_batch.called)
+
+        self.assertEqual(''.join(response.streaming_content), 'ab')
+        self.assertEqual(self.sent_names(), ['first', 'streamed'])
+
+    def test_left_over_batch(self):
+        self.tracker.begin_batch()
+        self.tracker.emit('left_over')
+
+        self.middleware.process_request(sentinel.request)
+        self.assertEqual(self.sent_names(), ['left_over'])
+        self.assertTrue(self.tracker.is_batching)
+        self.middleware.process_response(sentinel.request, HttpResponse())
+
+    def test_response_without_request(self):
+        response = HttpResponse()
+        self.assertIs(self.middleware.process_response(sentinel.request, response), response)
+
+    def test_missing_tracker(self):
+        self.middleware.tracker_name = 'missing'
+        self.middleware.process_request(sentinel.request)
+        self.middleware.process_response(sentinel.request, HttpResponse())
+
+
+class TestRequestContextMiddleware(TestCase):
+    """Test adding the details of the request to the context of its events"""
+
+    def setUp(self):
+        self.backend = MagicMock()
+        self.tracker = tracker.Tracker({'backend': self.backend})
+        self.middleware = RequestContextMiddleware()
+        self.middleware.tracker_name = 'test.context'
+        tracker.register_tracker(self.tracker, self.middleware.tracker_name)
+        self.addCleanup(tracker.TRACKERS.pop, self.middleware.tracker_name)
+
+        self.request = RequestFactory().get(
+            '/courses/', HTTP_USER_AGENT='test-agent', HTTP_X_FORWARDED_FOR='10.0.0.1, 10.0.0.2'
+        )
+        self.request.user = MagicMock(pk=10)
+        self.request.session = MagicMock(session_key='abc')
+
+    def sent_context(self, index=0):
+        """The context of an event sent to the backend"""
+        (event,), _kwargs = self.backend.send.call_args_list[index]
+        return event['context']
+
+    def test_context(self):
+        self.middleware.process_request(self.request)
+        self.tracker.emit('test')
+
+        self.assertEqual(self.sent_context(), {
+            'user_id': 10,
+            'session': 'abc',
+            'path': '/courses/',
+            'agent': 'test-agent',
+            'host': 'testserver',
+            'ip': '10.0.0.1',
+        })
+
+        self.middleware.process_response(self.request, HttpResponse())
+        self.tracker.emit('test')
+        self.assertEqual(self.sent_context(1), {})
+
+    def test_computed_once_and_lazily(self):
+        user_id = PropertyMock(return_value=10)
+        type(self.request.user).pk = user_id
+        self.middleware.process_request(self.request)
+        self.assertFalse(user_id.called)
+
+        self.tracker.emit('first')
+        self.tracker.emit('second')
+        user_id.assert_called_once_with()
+
+    def test_anonymous_request(self):
+        request = RequestFactory().get('/', REMOTE_ADDR='10.0.0.3')
+        context = dict(RequestContext(request))
+        self.assertIsNone(context['user_id'])
+        self.assertEqual(context['session'], '')
+        self.assertEqual(context['agent'], '')
+        self.assertEqual(context['ip'], '10.0.0.3')
+
+        request.user = MagicMock()
+        request.user.is_authenticated.return_value = False
+        self.assertIsNone(RequestContext(request)['user_id'])
+
+    @override_settings(ALLOWED_HOSTS=['example.com'], DEBUG=False)
+    def test_disallowed_host(self):
+        request = RequestFactory().get('/', SERVER_NAME='fallback')
+        self.assertEqual(RequestContext(request)['host'], 'fallback')
+
+    def test_streaming_response(self):
+        def content():
+            """Emit an event while streaming"""
+            self.tracker.emit('streamed')
+            yield 'a'
+
+        self.middleware.process_request(self.request)
+        response = self.middleware.process_response(self.request, StreamingHttpResponse(content()))
+        self.assertEqual(''.join(response.streaming_content), 'a')
+        self.assertEqual(self.sent_context()['path'], '/courses/')
+        self.assertEqual(self.tracker.resolve_context(), {})
+
+    def test_missing_tracker(self):
+        self.middleware.tracker_name = 'missing'
+        self.middleware.process_request(self.request)
+        self.middleware.process_response(self.request, HttpResponse())
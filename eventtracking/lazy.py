@@ -0,0 +1,118 @@
+"""
+Defer the construction of backends and processors until they are first used.
+
+Some backends open network connections or build API clients when they are
+constructed. Wrapping them in these proxies means processes that never emit
+an event, such as most management commands, never pay for that work.
+"""
+
+from __future__ import absolute_import
+
+import logging
+import threading
+import time
+
+from eventtracking.processors.exceptions import EventEmissionExit
+
+LOG = logging.getLogger(__name__)
+
+
+class ObjectUnavailable(Exception):
+    """Raised when the object wrapped by a lazy proxy can't be built at the moment"""
+
+
+class LazyObject(object):
+    """
+    Build an object by calling `factory` the first time it is needed, and delegate to it from then on.
+
+    Attributes not defined by the proxy are looked up on the wrapped object, building it if necessary. If `factory`
+    raises an exception it is propagated, and for the next `retry_interval` seconds using the object raises
+    `ObjectUnavailable` immediately instead of calling the factory again. Factories that connect to a server that is
+    down, as `pymongo.MongoClient` does, would otherwise stall every thread that uses the object. Once the interval has
+    passed a single thread calls the factory again, the others keep getting `ObjectUnavailable` until it is done.
+
+    `factory` is a callable that takes no arguments and returns the wrapped object.
+    `name` is used to identify the object in its representation.
+    `retry_interval` is the number of seconds to wait before calling the factory again after it failed.
+    """
+
+    def __init__(self, factory, name='', retry_interval=30):
+        self.factory = factory
+        self.name = name
+        self.retry_interval = retry_interval
+        self._wrapped = None
+        self._failed_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def wrapped(self):
+        """The wrapped object, built if it doesn't exist yet"""
+        if self._wrapped is not None:
+            return self._wrapped
+
+        if self._failed_at is None:
+            self._lock.acquire()
+        elif time.time() - self._failed_at < self.retry_interval or not self._lock.acquire(False):
+            raise ObjectUnavailable(self.name)
+
+        try:
+            if self._wrapped is None:
+                try:
+                    self._wrapped = self.factory()
+                except Exception:
+                    self._failed_at = time.time()
+                    raise
+                self._failed_at = None
+        finally:
+            self._lock.release()
+        return self._wrapped
+
+    @property
+    def is_loaded(self):
+        """True if the wrapped object has been built"""
+        return self._wrapped is not None
+
+    def __getattr__(self, name):
+        # Don't build the object when looking up special attributes, such as those used by copy or pickle
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return getattr(self.wrapped, name)
+
+    def __repr__(self):
+        return '<{0} {1} loaded={2}>'.format(self.__class__.__name__, self.name, self.is_loaded)
+
+
+class LazyBackend(LazyObject):
+    """A backend that is built the first time an event is sent to it, events are dropped while it can't be built"""
+
+    def send(self, event):
+        """Send the event to the wrapped backend, the event is dropped if the backend can't be built at the moment"""
+        try:
+            backend = self.wrapped
+        except ObjectUnavailable:
+            LOG.debug('Dropped an event, backend %s is unavailable', self.name)
+            return None
+        return backend.send(event)
+
+
+class LazyProcessor(LazyObject):
+    """
+    A processor that is built the first time it processes an event.
+
+    Events are dropped while the processor can't be built, see `LazyObject`.
+
+    `event_names` is copied from the configuration of the processor, so that a `RoutingBackend` can tell which events
+    the processor applies to without building it. See `eventtracking.backends.routing.RoutingBackend`.
+    """
+
+    def __init__(self, factory, name='', event_names=None, **kwargs):
+        super(LazyProcessor, self).__init__(factory, name=name, **kwargs)
+        self.event_names = event_names
+
+    def __call__(self, event):
+        try:
+            processor = self.wrapped
+        except ObjectUnavailable:
+            # The event may depend on the processor, such as one that redacts it, so it isn't sent unprocessed
+            raise EventEmissionExit()
+        return processor(event)
@@ -0,0 +1,66 @@
+"""
+Match event names against glob-style patterns.
+
+Patterns may contain `*`, which matches any sequence of characters, and `?`,
+which matches any single character. For example `edx.video.*` matches
+`edx.video.played` and `edx.video.transcript.shown`. Patterns without
+wildcards only match names that are exactly equal to them.
+"""
+
+from __future__ import absolute_import
+
+import re
+
+from eventtracking.cache import LRUCache
+
+
+WILDCARDS = ('*', '?')
+
+
+def is_pattern(name):
+    """Returns True if `name` is a string that contains wildcards"""
+    return isinstance(name, basestring) and any(wildcard in name for wildcard in WILDCARDS)
+
+
+def translate(pattern):
+    """Convert a pattern into an equivalent regular expression"""
+    return re.escape(pattern).replace(r'\*', '.*').replace(r'\?', '.')
+
+
+class NamePatternMatcher(object):
+    """
+    Decide whether event names match any of a collection of patterns.
+
+    Names without wildcards are kept in a set, so checking them costs a single lookup. All other patterns are compiled
+    into a single regular expression, which saves looping over them in Python, but the regular expression engine
+    still tries the alternatives one after another, so the cost of checking a new name grows with the number of
+    wildcard patterns. Decisions for names that are not exact matches are memoized in a bounded cache, so repeated
+    checks for the same name cost a dictionary lookup.
+
+    `patterns` is an iterable of patterns.
+    `cache_size` is the maximum number of names whose decisions are memoized.
+    """
+
+    def __init__(self, patterns, cache_size=10000):
+        self.patterns = frozenset(patterns)
+        self.names = frozenset(pattern for pattern in self.patterns if not is_pattern(pattern))
+
+        wildcard_patterns = sorted(self.patterns - self.names)
+        self.regex = None
+        if wildcard_patterns:
+            self.regex = re.compile(r'(?:{0})\Z'.format('|'.join(translate(pattern) for pattern in wildcard_patterns)))
+
+        self.cache = LRUCache(max_size=cache_size)
+
+    def matches(self, name):
+        """Returns True if `name` matches at least one of the patterns"""
+        if name in self.names:
+            return True
+        if self.regex is None:
+            return False
+
+        matched = self.cache.get(name)
+        if matched is None:
+            matched = isinstance(name, basestring) and self.regex.match(name) is not None
+            self.cache.set(name, matched)
+        return matched
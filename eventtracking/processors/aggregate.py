@@ -0,0 +1,193 @@
+"""Roll up high volume events into periodic summary events"""
+
+from __future__ import absolute_import
+
+from datetime import datetime
+import logging
+import numbers
+import threading
+import time
+
+from pytz import UTC
+
+from eventtracking import tracker
+from eventtracking.patterns import NamePatternMatcher
+from eventtracking.processors.exceptions import EventEmissionExit
+from eventtracking.projection import get_field
+from eventtracking.projection import split_path
+
+
+LOG = logging.getLogger(__name__)
+
+
+class AggregationProcessor(object):
+    """
+
+    Swallow matching events and periodically emit a single rollup event for each combination of their dimensions.
+
+    Matching events are not emitted. Instead they are counted, and optionally some of their numeric fields are summed,
+    per event name and values of the `dimensions` fields, over windows of `window` seconds. When a window ends, one
+    rollup event per combination is sent to `backend`, or to the routing backend of the tracker named `tracker_name`
+    so that it goes through the normal processing and routing path.
+
+    A rollup event has the same structure as the events it summarizes. Its name is the original name followed by
+    `rollup_suffix`, the dimension fields hold their values, the summed fields hold their totals and the data holds
+    the number of events as well as the start and end of the window. For example, rolling up `edx.video.heartbeat`
+    by `context.user_id` and `context.course_id`, summing `data.duration`, emits events like::
+
+        {
+            'name': 'edx.video.heartbeat.rollup',
+            'timestamp': <end of the window>,
+            'context': {'user_id': 10, 'course_id': 'course-v1:edX+Demo+2014'},
+            'data': {
+                'duration': 55.5,
+                'count': 12,
+                'window_start': <start of the window>,
+                'window_end': <end of the window>
+            }
+        }
+
+    At most `max_keys` combinations are held in memory, once that limit is reached the current aggregates are emitted
+    early. Call `flush()` on shutdown to emit the aggregates of the current window.
+
+    Windows are closed when any event passes through the processor after the end of the window, or when `flush()` is
+    called.
+
+    `names` is a list of event names or patterns to roll up, see `eventtracking.patterns`.
+    `dimensions` is a list of dotted paths of the fields to group by.
+    `sums` is a list of dotted paths of numeric fields to add up.
+    `window` is the length of a window in seconds.
+    `backend` is an object with a `send(event)` method that receives the rollup events.
+    `tracker_name` is the name of the tracker used when no `backend` is given.
+    """
+
+    def __init__(
+            self, names=None, dimensions=None, sums=None, window=60, max_keys=10000, rollup_suffix='.rollup',
+            backend=None, tracker_name=None, **_kwargs
+    ):  # pylint: disable=too-many-arguments
+        if not names:
+            raise ValueError('The AggregationProcessor must be passed the event names to roll up using "names".')
+
+        self.matcher = NamePatternMatcher(names)
+        self.dimensions = [split_path(path) for path in (dimensions or [])]
+        self.sums = [split_path(path) for path in (sums or [])]
+        self.window = window
+        self.max_keys = max_keys
+        self.rollup_suffix = rollup_suffix
+        self.backend = backend
+        self.tracker_name = tracker_name
+
+        self.aggregates = {}
+        self.window_start = self._get_window_start(time.time())
+        self._lock = threading.Lock()
+
+    def _get_window_start(self, now):
+        """The start of the window that contains the time `now`"""
+        return now - (now % self.window)
+
+    def __call__(self, event):
+        name = event.get('name')
+        now = time.time()
+
+        rollups = None
+        if now >= self.window_start + self.window:
+            rollups = self._close_window(now)
+
+        if isinstance(name, basestring) and self.matcher.matches(name) and not name.endswith(self.rollup_suffix):
+            self._add(name, event)
+            if len(self.aggregates) >= self.max_keys:
+                rollups = (rollups or []) + self._close_window(now)
+            self._emit(rollups)
+            raise EventEmissionExit()
+
+        self._emit(rollups)
+        return event
+
+    def _add(self, name, event):
+        """Count the event and add its summed fields to the aggregate for its dimensions"""
+        key = (name,) + tuple(get_field(event, path) for path in self.dimensions)
+        with self._lock:
+            aggregate = self.aggregates.get(key)
+            if aggregate is None:
+                # The number of events followed by the totals of each summed field
+                aggregate = [0] + [0] * len(self.sums)
+                self.aggregates[key] = aggregate
+
+            aggregate[0] += 1
+            for index, path in enumerate(self.sums):
+                value = get_field(event, path)
+                if isinstance(value, numbers.Number) and not isinstance(value, bool):
+                    aggregate[index + 1] += value
+
+    def _close_window(self, now):
+        """Build rollup events for all current aggregates and start a new window"""
+        with self._lock:
+            aggregates = self.aggregates
+            window_start = self.window_start
+            self.aggregates = {}
+            self.window_start = self._get_window_start(now)
+
+        window_end = min(now, window_start + self.window)
+        return [
+            self._create_rollup(key, aggregate, window_start, window_end)
+            for key, aggregate in sorted(aggregates.items())
+        ]
+
+    def _create_rollup(self, key, aggregate, window_start, window_end):
+        """Build a rollup event for one combination of dimensions"""
+        start = datetime.fromtimestamp(window_start, UTC)
+        end = datetime.fromtimestamp(window_end, UTC)
+        rollup = {
+            'name': key[0] + self.rollup_suffix,
+            'timestamp': end,
+            'context': {},
+            'data': {},
+        }
+        for path, value in zip(self.dimensions, key[1:]):
+            _set_field(rollup, path, value)
+        for path, value in zip(self.sums, aggregate[1:]):
+            _set_field(rollup, path, value)
+
+        rollup['data'].update({
+            'count': aggregate[0],
+            'window_start': start,
+            'window_end': end,
+        })
+        return rollup
+
+    def _emit(self, rollups):
+        """Send rollup events to the configured backend"""
+        if not rollups:
+            return
+
+        backend = self.backend
+        if backend is None:
+            if self.tracker_name is None:
+                backend = tracker.get_tracker().routing_backend
+            else:
+                backend = tracker.get_tracker(self.tracker_name).routing_backend
+
+        for rollup in rollups:
+            try:
+                backend.send(rollup)
+            except Exception:  # pylint: disable=broad-except
+                LOG.exception('Unable to emit rollup event %s', rollup['name'])
+
+    def flush(self, timeout=None):  # pylint: disable=unused-argument
+        """Emit rollup events for the current window"""
+        self._emit(self._close_window(time.time()))
+
+    def close(self, timeout=None):
+        """Emit rollup events for the current window, called when the process shuts down"""
+        self.flush(timeout)
+
+
+def _set_field(event, keys, value):
+    """Store `value` at the dotted path `keys`, creating intermediate dictionaries as needed"""
+    parent = event
+    for key in keys[:-1]:
+        child = parent.get(key)
+        if not isinstance(child, dict):
+            child = parent[key] = {}
+        parent = child
+    parent[keys[-1]] = value
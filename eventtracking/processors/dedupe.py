@@ -0,0 +1,143 @@
+"""Drop events that repeat an event seen shortly before"""
+
+from __future__ import absolute_import
+
+import hashlib
+import json
+import math
+import struct
+import threading
+import time
+
+from eventtracking.cache import LRUCache
+from eventtracking.processors.exceptions import EventEmissionExit
+from eventtracking.projection import get_field
+from eventtracking.projection import split_path
+
+
+STRATEGY_LRU = 'lru'
+STRATEGY_BLOOM = 'bloom'
+
+
+class DeduplicationProcessor(object):
+    """
+
+    Drop events whose fingerprint matches an event seen within the last `window` seconds.
+
+    The fingerprint is a digest of the values of `fields`, so two events are considered duplicates when all of those
+    fields are equal. Memory usage is fixed regardless of the number of events, using one of two strategies:
+
+    * "lru" - remember up to `capacity` fingerprints exactly, forgetting the least recently seen ones first. There are
+      no false positives, but duplicates can be missed when more than `capacity` distinct events arrive in a window.
+    * "bloom" - remember fingerprints in two Bloom filters, each sized for `capacity` events with a false positive rate
+      of `error_rate`. Every `window` seconds the older filter is discarded and a new one started, so fingerprints are
+      remembered for between one and two windows. A small fraction of distinct events, roughly twice `error_rate`, will
+      be wrongly dropped.
+
+    `fields` is a list of dotted paths of the fields that identify an event, defaults to the name, the context user_id
+        and the whole data.
+    `window` is the number of seconds during which repeats are dropped.
+    `strategy` is either "lru" or "bloom".
+    `capacity` is the expected number of distinct events in a window.
+    `error_rate` is the false positive rate of each Bloom filter.
+    `event_names` is an optional list of event names or patterns, other events are not passed to this processor by
+        `RoutingBackend`.
+    """
+
+    def __init__(
+            self, fields=None, window=10, strategy=STRATEGY_LRU, capacity=100000, error_rate=0.001, event_names=None,
+            **_kwargs
+    ):  # pylint: disable=too-many-arguments
+        self.fields = [split_path(field) for field in (fields or ['name', 'context.user_id', 'data'])]
+        self.dropped_events = 0
+        self.event_names = event_names
+
+        if strategy == STRATEGY_LRU:
+            self.seen = LRUFingerprintSet(capacity, window)
+        elif strategy == STRATEGY_BLOOM:
+            self.seen = RotatingBloomFilter(capacity, error_rate, window)
+        else:
+            raise ValueError('Unknown deduplication strategy %s' % strategy)
+
+    def fingerprint(self, event):
+        """A digest of the identifying fields of the event"""
+        values = [get_field(event, keys) for keys in self.fields]
+        return hashlib.md5(json.dumps(values, sort_keys=True, default=repr)).digest()
+
+    def __call__(self, event):
+        if self.seen.check_and_add(self.fingerprint(event)):
+            self.dropped_events += 1
+            raise EventEmissionExit()
+        return event
+
+    @property
+    def metrics(self):
+        """A dictionary describing the state of the processor"""
+        return {
+            'dropped_events': self.dropped_events,
+        }
+
+
+class LRUFingerprintSet(object):
+    """Remember up to `capacity` fingerprints for `window` seconds each"""
+
+    def __init__(self, capacity, window):
+        self.fingerprints = LRUCache(max_size=capacity, ttl=window)
+
+    def check_and_add(self, fingerprint):
+        """Returns True if the fingerprint was already seen, remembers it otherwise"""
+        if fingerprint in self.fingerprints:
+            return True
+        self.fingerprints.set(fingerprint, True)
+        return False
+
+
+class RotatingBloomFilter(object):
+    """
+    Approximately remember fingerprints for between one and two windows, using a fixed amount of memory.
+
+    Fingerprints must be at least 16 bytes long, as produced by MD5.
+    """
+
+    def __init__(self, capacity, error_rate, window):
+        self.window = window
+        # Optimal number of bits and hash functions for the capacity and error rate
+        self.num_bits = int(math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, int(round(self.num_bits / float(capacity) * math.log(2))))
+
+        self.current = self._new_filter()
+        self.previous = self._new_filter()
+        self.rotated_at = time.time()
+        self._lock = threading.Lock()
+
+    def _new_filter(self):
+        """An empty array of bits"""
+        return bytearray((self.num_bits + 7) // 8)
+
+    def _bit_positions(self, fingerprint):
+        """Derive the positions of the bits for a fingerprint using double hashing"""
+        first, second = struct.unpack('<QQ', fingerprint[:16])
+        return [(first + i * second) % self.num_bits for i in range(self.num_hashes)]
+
+    @staticmethod
+    def _contains(bits, positions):
+        """Returns True if all of the bits are set"""
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in positions)
+
+    def check_and_add(self, fingerprint):
+        """Returns True if the fingerprint was probably already seen, remembers it otherwise"""
+        positions = self._bit_positions(fingerprint)
+        now = time.time()
+
+        with self._lock:
+            if now - self.rotated_at >= self.window:
+                self.previous = self.current if now - self.rotated_at < 2 * self.window else self._new_filter()
+                self.current = self._new_filter()
+                self.rotated_at = now
+
+            if self._contains(self.current, positions) or self._contains(self.previous, positions):
+                return True
+
+            for position in positions:
+                self.current[position >> 3] |= 1 << (position & 7)
+            return False
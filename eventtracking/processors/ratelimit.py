@@ -0,0 +1,95 @@
+"""Drop events that are emitted faster than a configured rate"""
+
+from __future__ import absolute_import
+
+import threading
+import time
+
+from eventtracking.cache import LRUCache
+from eventtracking.processors.exceptions import EventEmissionExit
+
+
+class RateLimitProcessor(object):
+    """
+
+    Drop events once they are emitted faster than a configured rate, using a token bucket per key.
+
+    Each key gets a bucket holding up to `burst` tokens, which is refilled at `rate` tokens per second. Every event
+    takes a token from the bucket for its key, and is dropped if the bucket is empty. This allows short bursts of
+    events while limiting the sustained rate.
+
+    `rate` is the sustained number of events per second allowed for each key.
+    `burst` is the maximum number of events allowed in a burst, at least 1, defaults to `rate` or 1 if `rate` is
+        lower.
+    `per_name` keys the buckets by event name.
+    `per_user` keys the buckets by the `user_id` in the event context. Events without a user id are never dropped when
+        this is set.
+    `max_keys` is the maximum number of buckets kept in memory, the least recently used buckets are discarded first.
+    `event_names` is an optional list of event names or patterns, other events are not passed to this processor by
+        `RoutingBackend`.
+
+    At least one of `per_name` and `per_user` must be set.
+    """
+
+    def __init__(
+            self, rate=None, burst=None, per_name=True, per_user=False, max_keys=10000, event_names=None, **_kwargs
+    ):  # pylint: disable=too-many-arguments
+        if not rate or rate <= 0:
+            raise ValueError('The RateLimitProcessor must be passed a positive "rate".')
+        if burst is not None and burst < 1:
+            raise ValueError('The RateLimitProcessor "burst" must be at least 1.')
+        if not per_name and not per_user:
+            raise ValueError('The RateLimitProcessor must be keyed by event name, user or both.')
+
+        self.rate = float(rate)
+        self.burst = float(burst or max(1.0, rate))
+        self.per_name = per_name
+        self.per_user = per_user
+        self.buckets = LRUCache(max_size=max_keys)
+        self.event_names = event_names
+        self.dropped_events = 0
+        self._lock = threading.Lock()
+
+    def get_key(self, event):
+        """The key of the bucket used for the event, or None if the event should not be limited"""
+        if not self.per_user:
+            return event.get('name')
+
+        user_id = event.get('context', {}).get('user_id')
+        if user_id is None:
+            return None
+        if not self.per_name:
+            return user_id
+        return (event.get('name'), user_id)
+
+    def __call__(self, event):
+        key = self.get_key(event)
+        if key is None:
+            return event
+
+        now = time.time()
+        with self._lock:
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                # A bucket holds the number of tokens left and the time it was last refilled
+                bucket = [self.burst, now]
+                self.buckets.set(key, bucket)
+            else:
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+
+            if bucket[0] < 1:
+                self.dropped_events += 1
+                raise EventEmissionExit()
+
+            bucket[0] -= 1
+
+        return event
+
+    @property
+    def metrics(self):
+        """A dictionary describing the state of the rate limiter"""
+        return {
+            'dropped_events': self.dropped_events,
+            'tracked_keys': len(self.buckets),
+        }
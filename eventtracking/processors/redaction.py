@@ -0,0 +1,192 @@
+"""Remove, hash or shorten fields of events according to a declarative specification"""
+
+from __future__ import absolute_import
+
+import hashlib
+import logging
+
+from eventtracking.cache import LRUCache
+from eventtracking.patterns import NamePatternMatcher
+from eventtracking.processors.exceptions import EventEmissionExit
+from eventtracking.projection import FieldProjection
+from eventtracking.projection import split_path
+
+LOG = logging.getLogger(__name__)
+
+
+class RedactionProcessor(object):
+    """
+
+    Keep, drop, hash or truncate fields of events, according to a list of rules.
+
+    Each rule is a dictionary with the following optional keys:
+
+    * `names` - event names or patterns the rule applies to, see `eventtracking.patterns`. Defaults to all events.
+    * `keep` - dotted paths of the only fields to keep, all other fields are removed.
+    * `drop` - dotted paths of fields to remove.
+    * `hash` - dotted paths of fields whose values are replaced by their salted SHA-256 hex digest.
+    * `truncate` - a dictionary mapping dotted paths to the maximum length of the string stored in that field.
+
+    For example::
+
+        [
+            {
+                'names': ['edx.video.*'],
+                'keep': ['name', 'time', 'context.user_id', 'context.course_id', 'data.id', 'data.currentTime']
+            },
+            {
+                'drop': ['context.ip', 'context.agent'],
+                'hash': ['context.username'],
+                'truncate': {'data.answer': 100}
+            }
+        ]
+
+    The rules that apply to an event name are compiled into a single function the first time an event with that name
+    is seen, and cached. Processing an event then only touches the listed fields, and events that no rule applies to
+    are returned as is. Rules are applied in order, and within a rule fields are kept, then dropped, hashed and
+    truncated.
+
+    Dictionaries along the path to a modified field are copied rather than modified in place, so values shared with
+    other events or with the tracker context are never altered.
+
+    Redaction fails closed: a field whose value can't be hashed or truncated is removed, and an event that can't be
+    redacted for any other reason is dropped rather than passed on unredacted.
+
+    `rules` is a list of rules.
+    `hash_salt` is a secret string prepended to values before they are hashed, it is required by rules that hash
+        fields. Without it the hashes of guessable values, such as usernames and email addresses, could be reversed
+        by hashing candidate values.
+    `cache_size` is the maximum number of event names whose compiled functions are cached.
+    """
+
+    def __init__(self, rules=None, hash_salt=None, cache_size=1000, **_kwargs):
+        if not isinstance(rules, (list, tuple)):
+            raise TypeError('The RedactionProcessor must be passed a list of rules using the "rules" parameter')
+        if not hash_salt and any(rule.get('hash') for rule in rules):
+            raise ValueError('The RedactionProcessor must be passed a "hash_salt" to hash fields')
+
+        if isinstance(hash_salt, unicode):
+            hash_salt = hash_salt.encode('utf-8')
+        self.hash_salt = hash_salt or ''
+        self.rules = []
+        for rule in rules:
+            matcher = NamePatternMatcher(rule.get('names', ['*']), cache_size=1)
+            self.rules.append((matcher, self._compile_rule(rule)))
+
+        self.compiled = LRUCache(max_size=cache_size)
+
+    def _compile_rule(self, rule):
+        """Convert a rule into a list of functions that each take an event and return the modified event"""
+        operations = []
+
+        if rule.get('keep'):
+            operations.append(FieldProjection(rule['keep']))
+
+        for path in rule.get('drop', []):
+            operations.append(self._compile_drop(split_path(path)))
+
+        for path in rule.get('hash', []):
+            operations.append(self._compile_update(split_path(path), self._hash))
+
+        for path, max_length in sorted(rule.get('truncate', {}).items()):
+            operations.append(self._compile_update(split_path(path), self._make_truncate(max_length)))
+
+        return operations
+
+    def _compile_drop(self, keys):
+        """Build a function that removes the field at `keys`"""
+        parent_keys, key = keys[:-1], keys[-1]
+
+        def drop(event):
+            """Remove the field from a copy of its parent"""
+            parent = _get_dict(event, parent_keys)
+            if parent is None or key not in parent:
+                return event
+            event, parent = _copy_path(event, parent_keys)
+            del parent[key]
+            return event
+
+        return drop
+
+    def _compile_update(self, keys, transform):
+        """Build a function that replaces the value of the field at `keys` with `transform(value)`"""
+        parent_keys, key = keys[:-1], keys[-1]
+
+        def update(event):
+            """Store the transformed value in a copy of its parent"""
+            parent = _get_dict(event, parent_keys)
+            if parent is None or key not in parent:
+                return event
+            event, parent = _copy_path(event, parent_keys)
+            try:
+                parent[key] = transform(parent[key])
+            except Exception:  # pylint: disable=broad-except
+                LOG.exception('Unable to redact field %s of event %s, removing it', '.'.join(keys), event.get('name'))
+                del parent[key]
+            return event
+
+        return update
+
+    def _hash(self, value):
+        """Salted SHA-256 digest of the value"""
+        if isinstance(value, unicode):
+            value = value.encode('utf-8')
+        elif not isinstance(value, str):
+            value = str(value)
+        return hashlib.sha256(self.hash_salt + value).hexdigest()
+
+    @staticmethod
+    def _make_truncate(max_length):
+        """Build a function that shortens strings to `max_length` characters"""
+        def truncate(value):
+            """Shorten the value if it is a string"""
+            if isinstance(value, basestring) and len(value) > max_length:
+                return value[:max_length]
+            return value
+
+        return truncate
+
+    def get_operations(self, name):
+        """The compiled list of operations that apply to events with this name"""
+        operations = self.compiled.get(name)
+        if operations is None:
+            operations = []
+            for matcher, rule_operations in self.rules:
+                if matcher.matches(name):
+                    operations.extend(rule_operations)
+            operations = tuple(operations)
+            self.compiled.set(name, operations)
+        return operations
+
+    def __call__(self, event):
+        try:
+            for operation in self.get_operations(event.get('name')):
+                event = operation(event)
+        except Exception:  # pylint: disable=broad-except
+            LOG.exception('Unable to redact event %s, dropping it', event.get('name'))
+            raise EventEmissionExit()
+        return event
+
+
+def _get_dict(event, keys):
+    """Follow `keys` through nested dictionaries, returns None unless a dictionary is found"""
+    value = event
+    for key in keys:
+        value = value.get(key)
+        if not isinstance(value, dict):
+            return None
+    return value
+
+
+def _copy_path(event, keys):
+    """
+    Shallow copy the event and every dictionary along `keys`.
+
+    Returns the copied event and the copy of the innermost dictionary.
+    """
+    event = dict(event)
+    parent = event
+    for key in keys:
+        parent[key] = dict(parent[key])
+        parent = parent[key]
+    return event, parent
@@ -0,0 +1,125 @@
+"""Test the aggregation processor"""
+
+from __future__ import absolute_import
+
+from datetime import datetime
+from unittest import TestCase
+
+from mock import patch
+from pytz import UTC
+
+from eventtracking.backends.routing import RoutingBackend
+from eventtracking.backends.tests import InMemoryBackend
+from eventtracking.processors.aggregate import AggregationProcessor
+from eventtracking.processors.exceptions import EventEmissionExit
+from eventtracking.tracker import Tracker
+from eventtracking import tracker
+
+
+class TestAggregationProcessor(TestCase):
+    """Test the aggregation processor"""
+
+    def setUp(self):
+        patcher = patch('eventtracking.processors.aggregate.time')
+        self.addCleanup(patcher.stop)
+        self.mock_time = patcher.start()
+        self.mock_time.time.return_value = 1000
+
+        self.backend = InMemoryBackend()
+        self.processor = AggregationProcessor(
+            names=['edx.video.*'],
+            dimensions=['context.user_id', 'context.course_id'],
+            sums=['data.duration'],
+            window=60,
+            backend=self.backend
+        )
+
+    def create_event(self, user_id=1, duration=1.5, name='edx.video.heartbeat'):
+        """Build a heartbeat event"""
+        return {
+            'name': name,
+            'context': {'user_id': user_id, 'course_id': 'course'},
+            'data': {'duration': duration},
+        }
+
+    def process(self, event):
+        """Pass an event through the processor, returns None if it was swallowed"""
+        try:
+            return self.processor(event)
+        except EventEmissionExit:
+            return None
+
+    def test_matching_events_swallowed(self):
+        self.assertIsNone(self.process(self.create_event()))
+        event = self.create_event(name='problem_check')
+        self.assertEqual(self.process(event), event)
+        self.assertEqual(self.backend.events, [])
+
+    def test_rollup_emitted_when_window_ends(self):
+        for user_id in [1, 1, 2]:
+            self.process(self.create_event(user_id=user_id))
+        self.process(self.create_event(user_id=1, duration='not a number'))
+
+        self.mock_time.time.return_value = 1020
+        self.process(self.create_event(name='problem_check'))
+
+        self.assertEqual(self.backend.events, [
+            {
+                'name': 'edx.video.heartbeat.rollup',
+                'timestamp': datetime.fromtimestamp(1020, UTC),
+                'context': {'user_id': user_id, 'course_id': 'course'},
+                'data': {
+                    'duration': duration,
+                    'count': count,
+                    'window_start': datetime.fromtimestamp(960, UTC),
+                    'window_end': datetime.fromtimestamp(1020, UTC),
+                }
+            }
+            for user_id, count, duration in [(1, 3, 3.0), (2, 1, 1.5)]
+        ])
+
+    def test_bounded_number_of_keys(self):
+        self.processor.max_keys = 2
+        for user_id in range(3):
+            self.process(self.create_event(user_id=user_id))
+
+        self.assertEqual(len(self.backend.events), 2)
+        self.assertEqual(len(self.processor.aggregates), 1)
+
+    def test_flush(self):
+        self.process(self.create_event())
+        self.processor.flush()
+        self.processor.flush()
+
+        self.assertEqual(len(self.backend.events), 1)
+        self.assertEqual(self.backend.events[0]['data']['count'], 1)
+
+    def test_rollups_not_aggregated(self):
+        event = self.create_event(name='edx.video.heartbeat.rollup')
+        self.assertEqual(self.process(event), event)
+
+    def test_emits_through_tracker(self):
+        tracker.register_tracker(Tracker(backends={'mem': self.backend}), 'aggregation.test')
+        self.addCleanup(tracker.TRACKERS.pop, 'aggregation.test')
+        self.processor.backend = None
+        self.processor.tracker_name = 'aggregation.test'
+
+        self.process(self.create_event())
+        self.processor.flush()
+
+        self.assertEqual(self.backend.events[0]['name'], 'edx.video.heartbeat.rollup')
+
+    def test_inside_routing_backend(self):
+        router = RoutingBackend(backends={'mem': self.backend}, processors=[self.processor])
+        self.processor.backend = router
+
+        for _ in range(5):
+            router.send(self.create_event())
+        self.processor.flush()
+
+        self.assertEqual(len(self.backend.events), 1)
+        self.assertEqual(self.backend.events[0]['data']['count'], 5)
+
+    def test_names_required(self):
+        with self.assertRaises(ValueError):
+            AggregationProcessor()
@@ -0,0 +1,101 @@
+"""Test the deduplication processor"""
+
+from __future__ import absolute_import
+
+from unittest import TestCase
+
+from mock import patch
+
+from eventtracking.processors.dedupe import DeduplicationProcessor
+from eventtracking.processors.exceptions import EventEmissionExit
+
+
+class DeduplicationTestCase(TestCase):
+    """Test the deduplication processor using the LRU strategy"""
+
+    strategy = 'lru'
+
+    def setUp(self):
+        patcher = patch('eventtracking.processors.dedupe.time')
+        self.addCleanup(patcher.stop)
+        self.mock_time = patcher.start()
+        self.mock_time.time.return_value = 100
+
+        cache_patcher = patch('eventtracking.cache.time', self.mock_time)
+        self.addCleanup(cache_patcher.stop)
+        cache_patcher.start()
+
+        self.processor = DeduplicationProcessor(window=10, strategy=self.strategy, capacity=1000)
+
+    def create_event(self, user_id=1, position=10, **kwargs):
+        """Build a video event"""
+        event = {
+            'name': 'edx.video.paused',
+            'context': {'user_id': user_id, 'path': '/courses'},
+            'data': {'position': position},
+        }
+        event.update(kwargs)
+        return event
+
+    def assert_duplicate(self, event):
+        """Assert the event is dropped"""
+        with self.assertRaises(EventEmissionExit):
+            self.processor(event)
+
+    def assert_not_duplicate(self, event):
+        """Assert the event is let through"""
+        self.assertEqual(self.processor(event), event)
+
+    def test_repeat_dropped(self):
+        self.assert_not_duplicate(self.create_event())
+        self.assert_duplicate(self.create_event())
+        self.assertEqual(self.processor.metrics['dropped_events'], 1)
+
+    def test_distinct_events_allowed(self):
+        self.assert_not_duplicate(self.create_event())
+        self.assert_not_duplicate(self.create_event(user_id=2))
+        self.assert_not_duplicate(self.create_event(position=11))
+        self.assert_not_duplicate(self.create_event(name='edx.video.played'))
+
+    def test_unconfigured_fields_ignored(self):
+        self.assert_not_duplicate(self.create_event())
+        self.assert_duplicate(self.create_event(context={'user_id': 1, 'path': '/other'}))
+
+    def test_repeat_allowed_after_window(self):
+        self.assert_not_duplicate(self.create_event())
+        self.mock_time.time.return_value = 125
+        self.assert_not_duplicate(self.create_event())
+
+
+class TestBloomDeduplication(DeduplicationTestCase):
+    """Test the deduplication processor using the Bloom filter strategy"""
+
+    strategy = 'bloom'
+
+    def test_remembered_across_rotation(self):
+        self.assert_not_duplicate(self.create_event())
+        self.mock_time.time.return_value = 115
+        self.assert_duplicate(self.create_event())
+
+    def test_false_positive_rate(self):
+        processor = DeduplicationProcessor(fields=['data.sequence'], strategy='bloom', capacity=1000, error_rate=0.01)
+        for i in range(1000):
+            try:
+                processor({'data': {'sequence': i}})
+            except EventEmissionExit:
+                pass
+        self.assertLess(processor.metrics['dropped_events'], 50)
+
+
+class TestDeduplicationConfiguration(TestCase):
+    """Test configuring the deduplication processor"""
+
+    def test_unknown_strategy(self):
+        with self.assertRaises(ValueError):
+            DeduplicationProcessor(strategy='magic')
+
+    def test_custom_fields(self):
+        processor = DeduplicationProcessor(fields=['data.id'])
+        processor({'name': 'a', 'data': {'id': 1}})
+        with self.assertRaises(EventEmissionExit):
+            processor({'name': 'b', 'data': {'id': 1}})
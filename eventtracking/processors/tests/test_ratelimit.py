@@ -0,0 +1,98 @@
+"""Test the rate limiting processor"""
+
+from __future__ import absolute_import
+
+from unittest import TestCase
+
+from mock import patch
+
+from eventtracking.processors.exceptions import EventEmissionExit
+from eventtracking.processors.ratelimit import RateLimitProcessor
+
+
+class TestRateLimitProcessor(TestCase):
+    """Test the rate limiting processor"""
+
+    def setUp(self):
+        patcher = patch('eventtracking.processors.ratelimit.time')
+        self.addCleanup(patcher.stop)
+        self.mock_time = patcher.start()
+        self.mock_time.time.return_value = 100
+
+    def create_event(self, name='edx.video.heartbeat', user_id=1):
+        """Build an event emitted by a user"""
+        return {'name': name, 'context': {'user_id': user_id}}
+
+    def count_allowed(self, processor, count, **kwargs):
+        """Process `count` events and return how many were allowed through"""
+        allowed = 0
+        for _ in range(count):
+            try:
+                processor(self.create_event(**kwargs))
+                allowed += 1
+            except EventEmissionExit:
+                pass
+        return allowed
+
+    def test_burst_then_drop(self):
+        processor = RateLimitProcessor(rate=1, burst=5)
+        self.assertEqual(self.count_allowed(processor, 10), 5)
+        self.assertEqual(processor.metrics['dropped_events'], 5)
+
+    def test_refill(self):
+        processor = RateLimitProcessor(rate=2, burst=2)
+        self.assertEqual(self.count_allowed(processor, 5), 2)
+
+        self.mock_time.time.return_value = 100.5
+        self.assertEqual(self.count_allowed(processor, 5), 1)
+
+        self.mock_time.time.return_value = 1000
+        self.assertEqual(self.count_allowed(processor, 5), 2)
+
+    def test_fractional_rate(self):
+        processor = RateLimitProcessor(rate=0.5)
+        self.assertEqual(self.count_allowed(processor, 5), 1)
+
+        self.mock_time.time.return_value = 101
+        self.assertEqual(self.count_allowed(processor, 5), 0)
+
+        self.mock_time.time.return_value = 102
+        self.assertEqual(self.count_allowed(processor, 5), 1)
+
+    def test_per_name(self):
+        processor = RateLimitProcessor(rate=1)
+        self.assertEqual(self.count_allowed(processor, 2, name='a'), 1)
+        self.assertEqual(self.count_allowed(processor, 2, name='b', user_id=2), 1)
+        self.assertEqual(processor.metrics['tracked_keys'], 2)
+
+    def test_per_user(self):
+        processor = RateLimitProcessor(rate=1, per_name=False, per_user=True)
+        self.assertEqual(self.count_allowed(processor, 2, name='a', user_id=1), 1)
+        self.assertEqual(self.count_allowed(processor, 2, name='b', user_id=1), 0)
+        self.assertEqual(self.count_allowed(processor, 2, name='a', user_id=2), 1)
+
+    def test_per_name_and_user(self):
+        processor = RateLimitProcessor(rate=1, per_user=True)
+        self.assertEqual(self.count_allowed(processor, 2, name='a', user_id=1), 1)
+        self.assertEqual(self.count_allowed(processor, 2, name='b', user_id=1), 1)
+        self.assertEqual(self.count_allowed(processor, 2, name='a', user_id=2), 1)
+
+    def test_anonymous_events_not_limited(self):
+        processor = RateLimitProcessor(rate=1, per_user=True)
+        self.assertEqual(self.count_allowed(processor, 5, user_id=None), 5)
+
+    def test_bounded_number_of_buckets(self):
+        processor = RateLimitProcessor(rate=1, per_name=False, per_user=True, max_keys=10)
+        for user_id in range(100):
+            processor(self.create_event(user_id=user_id))
+        self.assertEqual(processor.metrics['tracked_keys'], 10)
+
+    def test_invalid_configuration(self):
+        with self.assertRaises(ValueError):
+            RateLimitProcessor()
+        with self.assertRaises(ValueError):
+            RateLimitProcessor(rate=-1)
+        with self.assertRaises(ValueError):
+            RateLimitProcessor(rate=1, per_name=False)
+        with self.assertRaises(ValueError):
+            RateLimitProcessor(rate=1, burst=0.5)
@@ -0,0 +1,127 @@
+"""Test the redaction processor"""
+
+from __future__ import absolute_import
+
+import hashlib
+from unittest import TestCase
+
+from mock import MagicMock
+
+from eventtracking.processors.exceptions import EventEmissionExit
+from eventtracking.processors.redaction import RedactionProcessor
+
+
+class Unprintable(object):
+    """A value that can't be converted to a string"""
+
+    def __str__(self):
+        raise ValueError()
+
+
+class TestRedactionProcessor(TestCase):
+    """Test the redaction processor"""
+
+    def setUp(self):
+        self.event = {
+            'name': 'edx.problem.check',
+            'context': {
+                'user_id': 10,
+                'username': u'tester',
+                'ip': '127.0.0.1',
+                'module': {'display_name': 'Problem 1'},
+            },
+            'data': {
+                'answer': 'a' * 50,
+                'grade': 1,
+            },
+        }
+
+    def test_keep(self):
+        processor = RedactionProcessor(rules=[{'keep': ['name', 'context.user_id']}])
+        self.assertEqual(processor(self.event), {'name': 'edx.problem.check', 'context': {'user_id': 10}})
+
+    def test_drop(self):
+        processor = RedactionProcessor(rules=[{'drop': ['context.ip', 'context.module.display_name', 'missing.path']}])
+        result = processor(self.event)
+        self.assertNotIn('ip', result['context'])
+        self.assertEqual(result['context']['module'], {})
+        self.assertEqual(result['data'], self.event['data'])
+
+    def test_hash(self):
+        processor = RedactionProcessor(rules=[{'hash': ['context.username', 'context.user_id']}], hash_salt='salt')
+        result = processor(self.event)
+        self.assertEqual(result['context']['username'], hashlib.sha256('salttester').hexdigest())
+        self.assertEqual(result['context']['user_id'], hashlib.sha256('salt10').hexdigest())
+
+    def test_hash_unicode_salt(self):
+        processor = RedactionProcessor(rules=[{'hash': ['context.username']}], hash_salt=u'pepper')
+        self.event['context']['username'] = u'j\xfcrgen'
+        result = processor(self.event)
+        self.assertEqual(result['context']['username'], hashlib.sha256(u'pepperj\xfcrgen'.encode('utf-8')).hexdigest())
+
+    def test_hash_requires_salt(self):
+        with self.assertRaises(ValueError):
+            RedactionProcessor(rules=[{'hash': ['context.username']}])
+        RedactionProcessor(rules=[{'drop': ['context.username']}])
+
+    def test_failed_hash_removes_field(self):
+        processor = RedactionProcessor(rules=[{'hash': ['context.username']}], hash_salt='salt')
+        self.event['context']['username'] = Unprintable()
+        result = processor(self.event)
+        self.assertNotIn('username', result['context'])
+        self.assertIn('username', self.event['context'])
+
+    def test_failed_rule_drops_event(self):
+        processor = RedactionProcessor(rules=[{'drop': ['context.ip']}])
+        processor.rules = [(matcher, [MagicMock(side_effect=ValueError)]) for matcher, _operations in processor.rules]
+        with self.assertRaises(EventEmissionExit):
+            processor(self.event)
+
+    def test_truncate(self):
+        processor = RedactionProcessor(rules=[{'truncate': {'data.answer': 10, 'data.grade': 10}}])
+        result = processor(self.event)
+        self.assertEqual(result['data']['answer'], 'a' * 10)
+        self.assertEqual(result['data']['grade'], 1)
+
+    def test_original_event_not_modified(self):
+        processor = RedactionProcessor(rules=[{
+            'drop': ['context.module.display_name'],
+            'hash': ['context.username'],
+            'truncate': {'data.answer': 10},
+        }], hash_salt='salt')
+        module = self.event['context']['module']
+        processor(self.event)
+
+        self.assertEqual(self.event['context']['username'], u'tester')
+        self.assertEqual(len(self.event['data']['answer']), 50)
+        self.assertEqual(module, {'display_name': 'Problem 1'})
+
+    def test_rules_by_name(self):
+        processor = RedactionProcessor(rules=[
+            {'names': ['edx.video.*'], 'drop': ['data']},
+            {'names': ['edx.problem.*'], 'drop': ['context']},
+            {'drop': ['context.ip']},
+        ])
+        result = processor(self.event)
+        self.assertNotIn('context', result)
+        self.assertIn('data', result)
+
+        video_event = dict(self.event, name='edx.video.played')
+        result = processor(video_event)
+        self.assertNotIn('data', result)
+        self.assertNotIn('ip', result['context'])
+
+    def test_unmatched_events_returned_as_is(self):
+        processor = RedactionProcessor(rules=[{'names': ['edx.video.*'], 'drop': ['data']}])
+        self.assertIs(processor(self.event), self.event)
+
+    def test_compiled_once_per_name(self):
+        processor = RedactionProcessor(rules=[{'drop': ['context.ip']}])
+        for _ in range(3):
+            processor(self.event)
+        self.assertEqual(len(processor.compiled), 1)
+        self.assertEqual(processor.compiled.hits, 2)
+
+    def test_missing_rules(self):
+        with self.assertRaisesRegexp(TypeError, r'The RedactionProcessor must be passed a list of rules'):
+            RedactionProcessor()
@@ -8,6 +8,7 @@ from mock import sentinel
 
 from eventtracking.processors.exceptions import EventEmissionExit
 from eventtracking.processors.whitelist import NameWhitelistProcessor
+from eventtracking.processors.whitelist import PatternWhitelistProcessor
 
 
 class TestNameWhitelistProcessor(TestCase):
@@ -71,3 +72,25 @@ class TestNameWhitelistProcessor(TestCase):
 
     def test_initialize_with_dict(self):
         self.assert_properly_configured({sentinel.allowed_event: sentinel.discarded})
+
+
+class TestPatternWhitelistProcessor(TestCase):
+    """Test the pattern whitelist processor"""
+
+    def setUp(self):
+        self.whitelist = PatternWhitelistProcessor(whitelist=['edx.video.*', 'edx.course.enrollment.*', 'exact'])
+
+    def test_allowed_events(self):
+        for name in ['edx.video.played', 'edx.course.enrollment.activated', 'exact']:
+            event = {'name': name}
+            self.assertEqual(self.whitelist(event), event)
+
+    def test_filtering_out(self):
+        for name in ['edx.problem.check', 'exact.not', 'edx.course.enrollment']:
+            with self.assertRaises(EventEmissionExit):
+                self.whitelist({'name': name})
+
+    def test_invalid_whitelist(self):
+        for whitelist in [None, 10, 'foobar']:
+            with self.assertRaisesRegexp(TypeError, r'The PatternWhitelistProcessor must be passed'):
+                PatternWhitelistProcessor(whitelist=whitelist)
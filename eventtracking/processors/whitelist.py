@@ -1,5 +1,6 @@
 """Filter out events whose names aren't on a pre-configured whitelist"""
 
+from eventtracking.patterns import NamePatternMatcher
 from eventtracking.processors.exceptions import EventEmissionExit
 
 
@@ -28,3 +29,32 @@ class NameWhitelistProcessor(object):
             raise EventEmissionExit()
         else:
             return event
+
+
+class PatternWhitelistProcessor(object):
+    """
+
+    Filter out events whose names don't match any of a pre-configured list of patterns.
+
+    `whitelist` is an iterable collection of event names and patterns such as `edx.video.*`, see
+        `eventtracking.patterns` for the supported syntax.
+    `cache_size` is the maximum number of event names whose decisions are remembered.
+    """
+
+    def __init__(self, whitelist=None, cache_size=10000, **_kwargs):
+        try:
+            if isinstance(whitelist, basestring):
+                raise TypeError
+
+            self.matcher = NamePatternMatcher(whitelist, cache_size=cache_size)
+        except TypeError:
+            raise TypeError(
+                'The PatternWhitelistProcessor must be passed a collection of allowed patterns '
+                'using the "whitelist" parameter'
+            )
+
+    def __call__(self, event):
+        if not self.matcher.matches(event['name']):
+            raise EventEmissionExit()
+        else:
+            return event
@@ -0,0 +1,86 @@
+"""
+Select parts of nested event dictionaries using dotted paths.
+
+A path such as `context.user_id` refers to the `user_id` key of the
+dictionary stored under the `context` key of the event. Paths are parsed and
+compiled once, so that applying them to an event only touches the listed
+fields instead of traversing the whole event.
+"""
+
+from __future__ import absolute_import
+
+
+def split_path(path):
+    """Split a dotted path into a tuple of keys"""
+    return tuple(path.split('.'))
+
+
+def get_field(event, keys, default=None):
+    """
+    Return the value found by following `keys`, a tuple of keys, through nested dictionaries.
+
+    Returns `default` if any of the keys is missing.
+    """
+    value = event
+    for key in keys:
+        try:
+            value = value[key]
+        except (KeyError, TypeError, IndexError):
+            return default
+    return value
+
+
+class FieldProjection(object):
+    """
+    Build a new event containing only the fields listed in `fields`, an iterable of dotted paths.
+
+    The structure of the event is preserved, so projecting `{'a': {'b': 1, 'c': 2}, 'd': 3}` with the fields
+    `['a.b']` results in `{'a': {'b': 1}}`. Listed fields missing from the event are left out of the result. If both a
+    field and one of its sub-fields are listed, the whole field is kept.
+
+    Values are not copied, so the projected event shares any mutable values it contains with the original event.
+    """
+
+    def __init__(self, fields):
+        self.fields = sorted(set(fields))
+
+        tree = {}
+        for field in self.fields:
+            node = tree
+            keys = split_path(field)
+            for key in keys[:-1]:
+                child = node.setdefault(key, {})
+                if child is None:
+                    # A parent field is already selected in its entirety
+                    break
+                node = child
+            else:
+                node[keys[-1]] = None
+
+        self._tree = self._compile(tree)
+
+    def _compile(self, tree):
+        """Convert the tree of selected keys into a sorted tuple of `(key, subtree)` pairs"""
+        return tuple(
+            (key, None if subtree is None else self._compile(subtree))
+            for key, subtree in sorted(tree.items())
+        )
+
+    def __call__(self, event):
+        return self._project(event, self._tree)
+
+    def _project(self, source, tree):
+        """Copy the keys selected by `tree` from `source`"""
+        result = {}
+        for key, subtree in tree:
+            try:
+                value = source[key]
+            except KeyError:
+                continue
+
+            if subtree is None:
+                result[key] = value
+            elif isinstance(value, dict):
+                result[key] = self._project(value, subtree)
+
+        return result
@@ -0,0 +1,150 @@
+"""
+Drain buffered events when a process stops.
+
+Backends that buffer or queue events in memory lose them if the process exits
+before they are sent, for example when a web server recycles a worker. The
+tracker can flush and close its whole tree of processors and backends within a
+deadline, see `eventtracking.tracker.Tracker.close()`. This module calls it
+automatically when the interpreter exits or the process is asked to terminate.
+
+Components take part by defining `flush(timeout=None)` and `close(timeout=None)`
+methods, which may return the number of events they had to give up on.
+"""
+
+from __future__ import absolute_import
+
+import atexit
+import logging
+import os
+import signal
+import threading
+import time
+
+from eventtracking.lazy import LazyObject
+
+LOG = logging.getLogger(__name__)
+
+FLUSH = 'flush'
+CLOSE = 'close'
+
+_installed = set()
+
+
+def get_deadline(timeout):
+    """The time at which `timeout` seconds will have passed, or None if there is no timeout"""
+    return None if timeout is None else time.time() + timeout
+
+
+def remaining(deadline):
+    """Seconds until `deadline`, or None if there is no deadline"""
+    return None if deadline is None else max(deadline - time.time(), 0)
+
+
+def drain_component(component, method, timeout=None):
+    """
+    Call the `flush` or `close` method (named by `method`) of `component` if it has one.
+
+    Lazy proxies whose object has not been built yet have nothing to drain and are skipped. Any exception raised is
+    logged and swallowed.
+
+    Returns the number of events lost by the component.
+    """
+    if isinstance(component, LazyObject):
+        if not component.is_loaded:
+            return 0
+        component = component.wrapped
+
+    func = getattr(component, method, None)
+    if not callable(func):
+        return 0
+
+    try:
+        lost = func(timeout=timeout)
+    except Exception:  # pylint: disable=broad-except
+        LOG.exception('Unable to %s %s', method, component)
+        return 0
+
+    # Only count integers, components are free to return other values
+    if isinstance(lost, (int, long)) and not isinstance(lost, bool):
+        return lost
+    return 0
+
+
+def drain_components(components, method, deadline=None):
+    """Drain each of the `components` in order, sharing the time left before `deadline`. Returns the events lost."""
+    lost = 0
+    for component in components:
+        lost += drain_component(component, method, remaining(deadline))
+    return lost
+
+
+def install_shutdown_hooks(tracker_name=None, timeout=10, signals=(signal.SIGTERM,)):
+    """
+    Close the tracker registered as `tracker_name` when the interpreter exits or the process receives one of `signals`.
+
+    The tracker is given `timeout` seconds to drain its events. Signal handlers that were already installed are called
+    afterwards, and the default action of the signal is performed if there was none, so the process still stops.
+
+    When a signal is received the tracker is drained on a separate thread. The signal may have interrupted the main
+    thread while it held a lock needed to drain the events, such as the lock of a worker pool queue, so draining on
+    the main thread itself could deadlock. The main thread waits at most `timeout` seconds for the drain, events it
+    could not finish sending are lost. Signal
+    handlers can only be installed from the main thread, they are skipped otherwise. Servers that install their own
+    handlers after this is called, as gunicorn does in its workers, replace these ones, call this function from a hook
+    that runs after they do, such as gunicorn's `post_worker_init`.
+
+    Hooks are only installed once per process for each tracker.
+    """
+    if tracker_name in _installed:
+        return
+    _installed.add(tracker_name)
+
+    pid = os.getpid()
+    closed = []
+
+    def close_tracker():
+        """Close the tracker once, unless this is a forked child that inherited the hook"""
+        if os.getpid() != pid or closed:
+            return
+        closed.append(True)
+
+        from eventtracking import tracker
+        try:
+            if tracker_name is None:
+                tracker_to_close = tracker.get_tracker()
+            else:
+                tracker_to_close = tracker.get_tracker(tracker_name)
+        except KeyError:
+            return
+        tracker_to_close.close(timeout)
+
+    atexit.register(close_tracker)
+
+    if not isinstance(threading.current_thread(), threading._MainThread):  # pylint: disable=protected-access
+        LOG.warning('Not installing tracker signal handlers outside of the main thread')
+        return
+
+    for signum in signals:
+        _install_signal_handler(signum, close_tracker, timeout)
+
+
+def _install_signal_handler(signum, callback, timeout=None):
+    """
+    Call `callback` on another thread when the signal is received, waiting at most `timeout` seconds for it, followed
+    by the previous handler.
+    """
+    previous = signal.getsignal(signum)
+
+    def handler(received_signum, frame):
+        """Drain the tracker, then let the signal do what it would have done"""
+        thread = threading.Thread(target=callback, name='TrackerShutdown')
+        thread.daemon = True
+        thread.start()
+        thread.join(timeout)
+        if callable(previous):
+            previous(received_signum, frame)
+        elif previous != signal.SIG_IGN:
+            signal.signal(received_signum, signal.SIG_DFL)
+            os.kill(os.getpid(), received_signum)
+
+    signal.signal(signum, handler)
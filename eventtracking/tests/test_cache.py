@@ -0,0 +1,71 @@
+"""Test the bounded caches"""
+
+from __future__ import absolute_import
+
+from unittest import TestCase
+
+from mock import patch
+from mock import sentinel
+
+from eventtracking.cache import LRUCache
+
+
+class TestLRUCache(TestCase):
+    """Test the LRU cache"""
+
+    def setUp(self):
+        patcher = patch('eventtracking.cache.time')
+        self.addCleanup(patcher.stop)
+        self.mock_time = patcher.start()
+        self.mock_time.time.return_value = 100
+
+    def test_get_and_set(self):
+        cache = LRUCache()
+        self.assertIsNone(cache.get(sentinel.key))
+        self.assertEqual(cache.get(sentinel.key, sentinel.default), sentinel.default)
+
+        cache.set(sentinel.key, sentinel.value)
+        self.assertEqual(cache.get(sentinel.key), sentinel.value)
+        self.assertIn(sentinel.key, cache)
+        self.assertEqual(cache.hits, 2)
+        self.assertEqual(cache.misses, 2)
+
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(max_size=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c'), 3)
+
+    def test_entries_expire(self):
+        cache = LRUCache(ttl=10)
+        cache.set('a', 1)
+
+        self.mock_time.time.return_value = 109
+        self.assertEqual(cache.get('a'), 1)
+
+        self.mock_time.time.return_value = 110
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(len(cache), 0)
+
+    def test_delete_and_clear(self):
+        cache = LRUCache()
+        cache.set('a', 1)
+        cache.set('b', 2)
+
+        cache.delete('a')
+        cache.delete('missing')
+        self.assertNotIn('a', cache)
+        self.assertIn('b', cache)
+
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+
+    def test_invalid_max_size(self):
+        with self.assertRaises(ValueError):
+            LRUCache(max_size=0)
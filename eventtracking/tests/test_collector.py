@@ -0,0 +1,155 @@
+"""Test the collector that receives forwarded events"""
+
+from __future__ import absolute_import
+
+from datetime import date, datetime
+import os
+import shutil
+import socket
+import tempfile
+import threading
+from unittest import TestCase
+
+from mock import MagicMock
+from pytz import UTC
+
+from eventtracking.backends.forwarder import SocketForwardingBackend, encode_event
+from eventtracking.backends.routing import RoutingBackend
+from eventtracking.collector import EventCollector, decode_event
+
+
+class TestDecodeEvent(TestCase):
+    """Test decoding forwarded events"""
+
+    def test_timestamps(self):
+        for timestamp in [datetime(2016, 1, 2, 3, 4, 5, 6, tzinfo=UTC), datetime(2016, 1, 2, 3, 4, 5, tzinfo=UTC)]:
+            frame = encode_event({'name': 'test', 'timestamp': timestamp})[4:]
+            self.assertEqual(decode_event(frame), {'name': 'test', 'timestamp': timestamp})
+
+    def test_nested_datetimes(self):
+        event = {
+            'name': 'test',
+            'context': {'received_at': datetime(2016, 1, 2, 3, 4, 5, tzinfo=UTC)},
+            'data': {'due': [date(2016, 1, 2), {'at': datetime(2016, 1, 2, 3, 4, 5, 6, tzinfo=UTC)}]},
+        }
+        self.assertEqual(decode_event(encode_event(event)[4:]), event)
+
+    def test_naive_datetimes_in_utc(self):
+        frame = encode_event({'timestamp': datetime(2016, 1, 2)})[4:]
+        self.assertEqual(decode_event(frame), {'timestamp': datetime(2016, 1, 2, tzinfo=UTC)})
+
+    def test_other_values_left_alone(self):
+        self.assertEqual(decode_event('{"timestamp": "2016-01-02T03:04:05+00:00"}'), {
+            'timestamp': '2016-01-02T03:04:05+00:00'
+        })
+        self.assertEqual(decode_event('{"timestamp": {"$datetime": "yesterday"}}'), {
+            'timestamp': {'$datetime': 'yesterday'}
+        })
+        self.assertEqual(decode_event('{"due": {"$date": 10}}'), {'due': {'$date': 10}})
+
+
+class TestEventCollector(TestCase):
+    """Test receiving events and sending them to a backend in batches"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.address = os.path.join(self.directory, 'collector.sock')
+
+        self.backend = MagicMock()
+        self.collector = EventCollector(self.address, self.backend, batch_size=3, flush_interval=0.05)
+        self.collector.bind()
+        self.addCleanup(self.collector.close)
+
+        self.forwarder = SocketForwardingBackend(address=self.address)
+        self.addCleanup(self.forwarder.close)
+
+    def sent_names(self):
+        """The names of the events in each batch sent to the backend"""
+        return [[event['name'] for event in args[0]] for args, _kwargs in self.backend.send_batch.call_args_list]
+
+    def test_batches(self):
+        for i in range(4):
+            self.forwarder.send({'name': 'event{0}'.format(i)})
+        for _ in range(4):
+            self.collector.receive()
+        self.collector.flush()
+
+        self.assertEqual(self.sent_names(), [['event0', 'event1', 'event2', 'event3']])
+        self.assertEqual(self.collector.metrics['received_events'], 4)
+        self.assertEqual(self.collector.metrics['sent_events'], 4)
+        self.assertEqual(self.collector.metrics['sent_batches'], 1)
+
+    def test_serve_forever(self):
+        thread = threading.Thread(target=self.collector.serve_forever)
+        thread.start()
+        try:
+            self.forwarder.send_batch([{'name': 'event{0}'.format(i)} for i in range(3)])
+            self.forwarder.send({'name': 'event3'})
+        finally:
+            self.collector.stop()
+            thread.join(5)
+
+        self.assertEqual(self.collector.close(), 0)
+        self.assertEqual(sum(self.sent_names(), []), ['event0', 'event1', 'event2', 'event3'])
+        self.backend.close.assert_called_once_with(timeout=None)
+        self.assertFalse(os.path.exists(self.address))
+
+    def test_invalid_datagram(self):
+        sender = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.addCleanup(sender.close)
+        sender.sendto('garbage', self.address)
+
+        self.collector.receive()
+        self.collector.flush()
+        self.assertEqual(self.collector.metrics['invalid_datagrams'], 1)
+        self.assertFalse(self.backend.send_batch.called)
+
+    def test_backend_without_batches(self):
+        backend = MagicMock(spec=['send'])
+        self.collector.backend = backend
+        self.forwarder.send_batch([{'name': 'first'}, {'name': 'second'}])
+        self.collector.receive()
+        self.collector.flush()
+        self.assertEqual(backend.send.call_count, 2)
+
+    def test_backend_error(self):
+        self.backend.send_batch.side_effect = ValueError
+        self.forwarder.send({'name': 'test'})
+        self.collector.receive()
+        self.collector.flush()
+        self.assertEqual(self.collector.metrics['queue_depth'], 0)
+        self.assertEqual(self.collector.metrics['sent_batches'], 0)
+        self.assertEqual(self.collector.metrics['failed_batches'], 1)
+        self.assertEqual(self.collector.metrics['failed_events'], 1)
+
+    def test_routing_backend_errors(self):
+        failing = MagicMock()
+        failing.send_batch.side_effect = ValueError
+        self.collector.backend = RoutingBackend(backends={'failing': failing, 'working': self.backend})
+        self.forwarder.send_batch([{'name': 'first'}, {'name': 'second'}])
+        self.collector.receive()
+        self.collector.flush()
+        self.assertEqual(self.collector.metrics['failed_events'], 2)
+        self.assertEqual(self.collector.metrics['failed_batches'], 1)
+        self.assertEqual(self.sent_names(), [['first', 'second']])
+
+    def test_backend_error_without_batches(self):
+        backend = MagicMock(spec=['send'])
+        backend.send.side_effect = [ValueError, None]
+        self.collector.backend = backend
+        self.forwarder.send_batch([{'name': 'first'}, {'name': 'second'}])
+        self.collector.receive()
+        self.collector.flush()
+        self.assertEqual(backend.send.call_count, 2)
+        self.assertEqual(self.collector.metrics['sent_events'], 1)
+        self.assertEqual(self.collector.metrics['failed_events'], 1)
+        self.assertEqual(self.collector.metrics['failed_batches'], 1)
+
+    def test_replaces_stale_socket(self):
+        self.collector.close()
+        open(self.address, 'w').close()
+        self.collector.bind()
+        self.forwarder.send({'name': 'test'})
+        self.collector.receive()
+        self.assertEqual(self.collector.metrics['received_events'], 1)
@@ -0,0 +1,96 @@
+"""Test the lazy proxies"""
+
+from __future__ import absolute_import
+
+import copy
+from unittest import TestCase
+
+from mock import MagicMock, patch, sentinel
+
+from eventtracking.lazy import LazyBackend, LazyProcessor, ObjectUnavailable
+from eventtracking.processors.exceptions import EventEmissionExit
+
+
+class TestLazyBackend(TestCase):
+    """Test the lazy backend"""
+
+    def setUp(self):
+        self.backend = MagicMock()
+        self.factory = MagicMock(return_value=self.backend)
+        self.lazy = LazyBackend(self.factory, name='test')
+
+    def test_built_on_first_send(self):
+        self.assertFalse(self.lazy.is_loaded)
+        self.assertFalse(self.factory.called)
+
+        self.lazy.send(sentinel.event)
+        self.lazy.send(sentinel.other_event)
+
+        self.assertTrue(self.lazy.is_loaded)
+        self.factory.assert_called_once_with()
+        self.assertEqual(self.backend.send.call_count, 2)
+
+    def test_delegates_attributes(self):
+        self.backend.option = sentinel.option
+        self.assertEqual(self.lazy.option, sentinel.option)
+        self.assertTrue(self.lazy.is_loaded)
+
+    def test_special_attributes_not_built(self):
+        copy.copy(self.lazy)
+        self.assertIn('loaded=False', repr(self.lazy))
+        self.assertFalse(self.factory.called)
+
+    def test_factory_error_retried(self):
+        self.factory.side_effect = [ValueError, self.backend]
+        with patch('eventtracking.lazy.time') as mock_time:
+            mock_time.time.return_value = 100
+            with self.assertRaises(ValueError):
+                self.lazy.send(sentinel.event)
+            self.assertFalse(self.lazy.is_loaded)
+
+            # Events are dropped without calling the factory until the retry interval has passed
+            mock_time.time.return_value = 129
+            self.lazy.send(sentinel.event)
+            with self.assertRaises(ObjectUnavailable):
+                self.lazy.option  # pylint: disable=pointless-statement
+            self.assertEqual(self.factory.call_count, 1)
+
+            mock_time.time.return_value = 130
+            self.lazy.send(sentinel.event)
+
+        self.assertEqual(self.factory.call_count, 2)
+        self.backend.send.assert_called_once_with(sentinel.event)
+
+    def test_retry_does_not_block(self):
+        self.factory.side_effect = ValueError
+        with self.assertRaises(ValueError):
+            self.lazy.send(sentinel.event)
+
+        self.lazy.retry_interval = 0
+        with self.lazy._lock:  # pylint: disable=protected-access
+            # Another thread is building the backend
+            self.lazy.send(sentinel.event)
+        self.assertEqual(self.factory.call_count, 1)
+
+
+class TestLazyProcessor(TestCase):
+    """Test the lazy processor"""
+
+    def test_built_on_first_call(self):
+        processor = MagicMock(return_value=sentinel.result)
+        factory = MagicMock(return_value=processor)
+        lazy = LazyProcessor(factory, event_names=['a.*'])
+
+        self.assertEqual(lazy.event_names, ['a.*'])
+        self.assertFalse(factory.called)
+        self.assertEqual(lazy(sentinel.event), sentinel.result)
+        processor.assert_called_once_with(sentinel.event)
+
+    def test_unavailable_processor_drops_events(self):
+        factory = MagicMock(side_effect=ValueError)
+        lazy = LazyProcessor(factory)
+        with self.assertRaises(ValueError):
+            lazy(sentinel.event)
+        with self.assertRaises(EventEmissionExit):
+            lazy(sentinel.event)
+        self.assertEqual(factory.call_count, 1)
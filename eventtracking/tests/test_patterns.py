@@ -0,0 +1,54 @@
+"""Test matching event names against patterns"""
+
+from __future__ import absolute_import
+
+from unittest import TestCase
+
+from mock import sentinel
+
+from eventtracking.patterns import NamePatternMatcher
+
+
+class TestNamePatternMatcher(TestCase):
+    """Test matching event names against patterns"""
+
+    def test_exact_names(self):
+        matcher = NamePatternMatcher(['edx.video.played', sentinel.name])
+        self.assertTrue(matcher.matches('edx.video.played'))
+        self.assertTrue(matcher.matches(sentinel.name))
+        self.assertFalse(matcher.matches('edx.video.played.again'))
+        self.assertIsNone(matcher.regex)
+
+    def test_prefix_pattern(self):
+        matcher = NamePatternMatcher(['edx.video.*'])
+        self.assertTrue(matcher.matches('edx.video.played'))
+        self.assertTrue(matcher.matches('edx.video.transcript.shown'))
+        self.assertFalse(matcher.matches('edx.videos'))
+        self.assertFalse(matcher.matches('problem_check'))
+
+    def test_special_characters_are_literal(self):
+        matcher = NamePatternMatcher(['/courses/*/info', 'a+b?'])
+        self.assertTrue(matcher.matches('/courses/edX/info'))
+        self.assertTrue(matcher.matches('a+bc'))
+        self.assertFalse(matcher.matches('aab'))
+        self.assertFalse(matcher.matches('/courses/edX/info/more'))
+
+    def test_many_patterns(self):
+        matcher = NamePatternMatcher(['edx.course{0}.*'.format(i) for i in range(500)])
+        self.assertTrue(matcher.matches('edx.course499.enrollment'))
+        self.assertFalse(matcher.matches('edx.course500.enrollment'))
+
+    def test_decisions_memoized(self):
+        matcher = NamePatternMatcher(['edx.video.*'], cache_size=1)
+        matcher.matches('edx.video.played')
+        matcher.matches('edx.video.played')
+        self.assertEqual(matcher.cache.hits, 1)
+        self.assertEqual(len(matcher.cache), 1)
+
+        matcher.matches('edx.video.paused')
+        self.assertEqual(len(matcher.cache), 1)
+
+    def test_non_string_names(self):
+        matcher = NamePatternMatcher(['*'])
+        self.assertTrue(matcher.matches('anything'))
+        self.assertFalse(matcher.matches(sentinel.name))
@@ -0,0 +1,74 @@
+"""Test selecting parts of events using dotted paths"""
+
+from __future__ import absolute_import
+
+from unittest import TestCase
+
+from mock import sentinel
+
+from eventtracking.projection import FieldProjection
+from eventtracking.projection import get_field
+from eventtracking.projection import split_path
+
+
+class TestFieldProjection(TestCase):
+    """Test building events that contain a subset of fields"""
+
+    def setUp(self):
+        self.event = {
+            'name': sentinel.name,
+            'context': {
+                'user_id': sentinel.user_id,
+                'course_id': sentinel.course_id,
+                'module': {'usage_key': sentinel.usage_key},
+            },
+            'data': {'foo': sentinel.foo},
+        }
+
+    def test_top_level_fields(self):
+        projection = FieldProjection(['name', 'data'])
+        self.assertEqual(projection(self.event), {
+            'name': sentinel.name,
+            'data': {'foo': sentinel.foo},
+        })
+
+    def test_nested_fields(self):
+        projection = FieldProjection(['context.user_id', 'context.module.usage_key'])
+        self.assertEqual(projection(self.event), {
+            'context': {
+                'user_id': sentinel.user_id,
+                'module': {'usage_key': sentinel.usage_key},
+            }
+        })
+
+    def test_missing_fields(self):
+        projection = FieldProjection(['missing', 'context.missing', 'name.not_a_dict'])
+        self.assertEqual(projection(self.event), {'context': {}})
+
+    def test_parent_and_child_fields(self):
+        expected = {
+            'context': {
+                'user_id': sentinel.user_id,
+                'course_id': sentinel.course_id,
+                'module': {'usage_key': sentinel.usage_key},
+            }
+        }
+        self.assertEqual(FieldProjection(['context.user_id', 'context'])(self.event), expected)
+        self.assertEqual(FieldProjection(['context', 'context.user_id'])(self.event), expected)
+
+    def test_original_not_modified(self):
+        projection = FieldProjection(['context.user_id'])
+        projection(self.event)['context']['user_id'] = sentinel.changed
+        self.assertEqual(self.event['context']['user_id'], sentinel.user_id)
+
+
+class TestGetField(TestCase):
+    """Test reading a single field of an event"""
+
+    def test_get_field(self):
+        event = {'context': {'user_id': sentinel.user_id}, 'name': 'foo'}
+        self.assertEqual(get_field(event, split_path('context.user_id')), sentinel.user_id)
+        self.assertEqual(get_field(event, split_path('name')), 'foo')
+        self.assertIsNone(get_field(event, split_path('context.missing')))
+        self.assertIsNone(get_field(event, split_path('name.missing')))
+        self.assertEqual(get_field(event, split_path('missing'), sentinel.default), sentinel.default)
@@ -0,0 +1,140 @@
+"""Test draining events when the process stops"""
+
+from __future__ import absolute_import
+
+import signal
+import threading
+import time
+from unittest import TestCase
+
+from mock import MagicMock, patch, sentinel
+
+from eventtracking import shutdown
+from eventtracking import tracker
+from eventtracking.lazy import LazyBackend
+
+
+class TestDrainComponent(TestCase):
+    """Test draining a single component"""
+
+    def test_drain(self):
+        component = MagicMock()
+        component.close.return_value = 3
+        self.assertEqual(shutdown.drain_component(component, shutdown.CLOSE, 5), 3)
+        component.close.assert_called_once_with(timeout=5)
+
+    def test_without_method(self):
+        self.assertEqual(shutdown.drain_component(object(), shutdown.FLUSH), 0)
+
+    def test_ignores_other_results(self):
+        component = MagicMock()
+        for result in [None, True, sentinel.result]:
+            component.flush.return_value = result
+            self.assertEqual(shutdown.drain_component(component, shutdown.FLUSH), 0)
+
+    def test_error(self):
+        component = MagicMock()
+        component.flush.side_effect = ValueError
+        self.assertEqual(shutdown.drain_component(component, shutdown.FLUSH), 0)
+
+    def test_lazy(self):
+        backend = MagicMock()
+        backend.close.return_value = 1
+        lazy = LazyBackend(lambda: backend)
+        self.assertEqual(shutdown.drain_component(lazy, shutdown.CLOSE), 0)
+        self.assertFalse(lazy.is_loaded)
+
+        lazy.send({})
+        self.assertEqual(shutdown.drain_component(lazy, shutdown.CLOSE), 1)
+
+    def test_shared_deadline(self):
+        components = [MagicMock(), MagicMock()]
+        components[0].flush.return_value = 1
+        components[1].flush.return_value = 2
+        with patch('eventtracking.shutdown.time') as mock_time:
+            mock_time.time.side_effect = [100, 100, 104]
+            lost = shutdown.drain_components(components, shutdown.FLUSH, shutdown.get_deadline(10))
+
+        self.assertEqual(lost, 3)
+        components[0].flush.assert_called_once_with(timeout=10)
+        components[1].flush.assert_called_once_with(timeout=6)
+
+
+class TestShutdownHooks(TestCase):
+    """Test closing the tracker when the process stops"""
+
+    def setUp(self):
+        self.tracker = MagicMock()
+        tracker.register_tracker(self.tracker, 'test.shutdown')
+        self.addCleanup(tracker.TRACKERS.pop, 'test.shutdown')
+        self.addCleanup(shutdown._installed.discard, 'test.shutdown')  # pylint: disable=protected-access
+
+        atexit_patcher = patch('eventtracking.shutdown.atexit')
+        self.atexit = atexit_patcher.start()
+        self.addCleanup(atexit_patcher.stop)
+
+        signal_patcher = patch('eventtracking.shutdown.signal')
+        self.signal = signal_patcher.start()
+        self.addCleanup(signal_patcher.stop)
+        self.signal.SIG_IGN = signal.SIG_IGN
+        self.signal.SIG_DFL = signal.SIG_DFL
+
+    def install(self):
+        """Install the hooks and return the atexit callback"""
+        shutdown.install_shutdown_hooks('test.shutdown', timeout=5, signals=[signal.SIGTERM])
+        (callback,), _kwargs = self.atexit.register.call_args
+        return callback
+
+    def installed_handler(self):
+        """The signal handler installed for SIGTERM"""
+        (signum, handler), _kwargs = self.signal.signal.call_args_list[0]
+        self.assertEqual(signum, signal.SIGTERM)
+        return handler
+
+    def test_atexit(self):
+        callback = self.install()
+        callback()
+        callback()
+        self.tracker.close.assert_called_once_with(5)
+
+    def test_installed_once(self):
+        self.install()
+        shutdown.install_shutdown_hooks('test.shutdown')
+        self.assertEqual(self.atexit.register.call_count, 1)
+
+    def test_signal_chains_previous_handler(self):
+        previous = MagicMock()
+        self.signal.getsignal.return_value = previous
+        self.install()
+
+        self.installed_handler()(signal.SIGTERM, sentinel.frame)
+        self.tracker.close.assert_called_once_with(5)
+        previous.assert_called_once_with(signal.SIGTERM, sentinel.frame)
+
+    def test_signal_drains_on_another_thread(self):
+        threads = []
+        self.tracker.close.side_effect = lambda timeout: threads.append(threading.current_thread())
+        self.install()
+
+        self.installed_handler()(signal.SIGTERM, sentinel.frame)
+        self.assertEqual(len(threads), 1)
+        self.assertNotEqual(threads[0], threading.current_thread())
+
+    def test_signal_waits_at_most_timeout(self):
+        finish = threading.Event()
+        self.addCleanup(finish.set)
+        self.tracker.close.side_effect = lambda timeout: finish.wait(5)
+        shutdown.install_shutdown_hooks('test.shutdown', timeout=0.05, signals=[signal.SIGTERM])
+
+        started_at = time.time()
+        self.installed_handler()(signal.SIGTERM, sentinel.frame)
+        self.assertLess(time.time() - started_at, 1)
+
+    def test_signal_default_action(self):
+        self.signal.getsignal.return_value = signal.SIG_DFL
+        self.install()
+
+        with patch('eventtracking.shutdown.os') as mock_os:
+            self.installed_handler()(signal.SIGTERM, sentinel.frame)
+            mock_os.kill.assert_called_once_with(mock_os.getpid.return_value, signal.SIGTERM)
+        self.signal.signal.assert_called_with(signal.SIGTERM, signal.SIG_DFL)
@@ -7,6 +7,7 @@ from __future__ import absolute_import
 from datetime import datetime
 from unittest import TestCase
 
+from mock import ANY
 from mock import MagicMock
 from mock import patch
 from mock import sentinel
@@ -167,3 +168,38 @@ class TestTrack(TestCase):  # pylint: disable=missing-docstring
         self.tracker.emit(sentinel.name)
 
         self.assert_backend_called_with(sentinel.name)
+
+    def test_batch(self):
+        with self.tracker.batch():
+            self.assertTrue(self.tracker.is_batching)
+            self.tracker.emit('first')
+            with self.tracker.batch():
+                self.tracker.emit('second')
+            self.assertFalse(self._mock_backend.send_batch.called)
+
+        self.assertFalse(self.tracker.is_batching)
+        self.assertFalse(self._mock_backend.send.called)
+        (events,), _kwargs = self._mock_backend.send_batch.call_args
+        self.assertEqual([event['name'] for event in events], ['first', 'second'])
+
+        self.tracker.emit('third')
+        self.assertEqual(self._mock_backend.send.call_count, 1)
+
+    def test_empty_batch(self):
+        with self.tracker.batch():
+            pass
+        self.tracker.end_batch()
+        self.assertFalse(self._mock_backend.send_batch.called)
+
+    def test_flush_and_close(self):
+        self._mock_backend.flush.return_value = 0
+        self._mock_backend.close.return_value = 2
+        self.assertEqual(self.tracker.flush(5), 0)
+        self._mock_backend.flush.assert_called_once_with(timeout=ANY)
+
+        self.tracker.begin_batch()
+        self.tracker.emit('batched')
+        self.assertEqual(self.tracker.close(5), 2)
+        self.assertFalse(self.tracker.is_batching)
+        self.assertTrue(self._mock_backend.send_batch.called)
+        self._mock_backend.close.assert_called_once_with(timeout=ANY)
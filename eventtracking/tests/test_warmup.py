@@ -0,0 +1,82 @@
+"""Test warming up backends and processors"""
+
+from __future__ import absolute_import
+
+import threading
+from unittest import TestCase
+
+from mock import MagicMock
+
+from eventtracking import warmup
+from eventtracking.lazy import LazyBackend
+from eventtracking.tracker import Tracker
+
+
+class TestWarmUp(TestCase):
+    """Test warming up backends and processors"""
+
+    def test_warm_up(self):
+        backend = MagicMock()
+        results = warmup.warm_up({'backend': backend})
+
+        backend.warm_up.assert_called_once_with()
+        self.assertEqual(results['backend']['status'], warmup.STATUS_OK)
+        self.assertIsNone(results['backend']['error'])
+        self.assertGreaterEqual(results['backend']['seconds'], 0)
+
+    def test_without_hook(self):
+        results = warmup.warm_up({'processor': object()})
+        self.assertEqual(results['processor']['status'], warmup.STATUS_OK)
+
+    def test_lazy(self):
+        backend = MagicMock()
+        lazy = LazyBackend(lambda: backend)
+        warmup.warm_up({'lazy': lazy})
+
+        self.assertTrue(lazy.is_loaded)
+        backend.warm_up.assert_called_once_with()
+
+    def test_error(self):
+        backend = MagicMock()
+        backend.warm_up.side_effect = ValueError('unreachable')
+        results = warmup.warm_up({'backend': backend})
+
+        self.assertEqual(results['backend']['status'], warmup.STATUS_ERROR)
+        self.assertEqual(results['backend']['error'], 'ValueError: unreachable')
+
+    def test_concurrent_with_timeout(self):
+        unblock = threading.Event()
+        barrier = threading.Semaphore(0)
+
+        def wait_for_other():
+            """Only returns if the other backend is warming up at the same time"""
+            barrier.release()
+            unblock.wait(5)
+
+        slow = MagicMock()
+        slow.warm_up.side_effect = wait_for_other
+        fast = MagicMock()
+        fast.warm_up.side_effect = barrier.acquire
+
+        try:
+            results = warmup.warm_up({'slow': slow, 'fast': fast}, timeout=0.2)
+        finally:
+            unblock.set()
+
+        self.assertEqual(results['fast']['status'], warmup.STATUS_OK)
+        self.assertEqual(results['slow']['status'], warmup.STATUS_TIMEOUT)
+
+        # The slow backend keeps warming up in the background
+        for thread in threading.enumerate():
+            if thread.name == 'WarmUp-slow':
+                thread.join(5)
+        self.assertEqual(results['slow']['status'], warmup.STATUS_OK)
+
+    def test_tracker(self):
+        backend = MagicMock()
+        processor = MagicMock()
+        results = Tracker(backends={'default': backend}, processors=[processor]).warm_up(timeout=5)
+
+        self.assertEqual(sorted(results), ['backends.default', 'processors.0'])
+        backend.warm_up.assert_called_once_with()
+        processor.warm_up.assert_called_once_with()
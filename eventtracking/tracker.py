@@ -20,11 +20,13 @@ from __future__ import absolute_import
 from contextlib import contextmanager
 from datetime import datetime
 import logging
+import threading
 
 from pytz import UTC
 
 from eventtracking.locator import DefaultContextLocator
 from eventtracking.backends.routing import RoutingBackend
+from eventtracking import warmup
 
 UNKNOWN_EVENT_TYPE = 'unknown'
 DEFAULT_TRACKER_NAME = 'default'
@@ -40,6 +42,7 @@ class Tracker(object):
     def __init__(self, backends=None, context_locator=None, processors=None):
         self.routing_backend = RoutingBackend(backends=backends, processors=processors)
         self.context_locator = context_locator or DefaultContextLocator()
+        self._batch = threading.local()
 
     @property
     def located_context(self):
@@ -62,6 +65,47 @@ class Tracker(object):
         """The dictionary of registered backends"""
         return self.routing_backend.backends
 
+    def warm_up(self, timeout=None):
+        """
+        Initialize and health-check all backends and processors concurrently, waiting at most `timeout` seconds.
+
+        Backends are named "backends.<name>" and processors "processors.<index>" in the returned dictionary, see
+        `eventtracking.warmup.warm_up()`. Lazily constructed backends and processors are constructed, so combining this
+        with lazy construction means starting the tracker takes as long as the slowest backend. Most database clients
+        are not safe to share across a fork, so call this in each worker process after the server forks it.
+        """
+        components = {}
+        for name, backend in self.backends.iteritems():
+            components['backends.{0}'.format(name)] = backend
+        for index, processor in enumerate(self.processors):
+            components['processors.{0}'.format(index)] = processor
+        return warmup.warm_up(components, timeout=timeout)
+
+    def flush(self, timeout=None):
+        """
+        Send the events held in memory by processors and backends, waiting at most `timeout` seconds.
+
+        Returns the number of events that could not be sent before the deadline.
+        """
+        lost = self.routing_backend.flush(timeout)
+        if lost:
+            LOG.warning('%d events could not be sent before the flush deadline', lost)
+        return lost
+
+    def close(self, timeout=None):
+        """
+        Send the events held in memory and stop the background threads of processors and backends.
+
+        Intended to be called when the process stops, see `eventtracking.shutdown`. Waits at most `timeout` seconds and
+        returns the number of events that were lost.
+        """
+        while self.is_batching:
+            self.end_batch()
+        lost = self.routing_backend.close(timeout)
+        if lost:
+            LOG.warning('%d events were lost when closing the tracker', lost)
+        return lost
+
     def emit(self, name=None, data=None):
         """
         Emit an event annotated with the UTC time when this function was called.
@@ -79,7 +123,57 @@ class Tracker(object):
             'context': self.resolve_context()
         }
 
-        self.routing_backend.send(event)
+        events = getattr(self._batch, 'events', None)
+        if events is not None:
+            events.append(event)
+        else:
+            self.routing_backend.send(event)
+
+    def begin_batch(self):
+        """
+        Collect the events emitted by the current thread instead of sending them, until `end_batch()` is called.
+
+        Batches may be nested, the events are only sent once the outermost batch ends.
+        """
+        depth = getattr(self._batch, 'depth', 0)
+        if depth == 0:
+            self._batch.events = []
+        self._batch.depth = depth + 1
+
+    def end_batch(self):
+        """
+        End the current batch. If it is the outermost batch, all of the events collected are sent together.
+
+        See `eventtracking.backends.routing.RoutingBackend.send_batch()`.
+        """
+        depth = getattr(self._batch, 'depth', 0)
+        if depth == 0:
+            return
+
+        self._batch.depth = depth - 1
+        if depth > 1:
+            return
+
+        events = self._batch.events
+        self._batch.events = None
+        if events:
+            self.routing_backend.send_batch(events)
+
+    @property
+    def is_batching(self):
+        """True if events emitted by the current thread are being collected in a batch"""
+        return getattr(self._batch, 'depth', 0) > 0
+
+    @contextmanager
+    def batch(self):
+        """
+        Collect the events emitted by the current thread while the block is executed and send them together at the end.
+        """
+        self.begin_batch()
+        try:
+            yield
+        finally:
+            self.end_batch()
 
     def resolve_context(self):
         """
@@ -142,3 +236,18 @@ def get_tracker(name=DEFAULT_TRACKER_NAME):
 def emit(name=None, data=None):
     """Calls `Tracker.emit` on the default global tracker"""
     return get_tracker().emit(name=name, data=data)
+
+
+def flush(timeout=None):
+    """Calls `Tracker.flush` on the default global tracker"""
+    return get_tracker().flush(timeout=timeout)
+
+
+def close(timeout=None):
+    """Calls `Tracker.close` on the default global tracker"""
+    return get_tracker().close(timeout=timeout)
+
+
+def warm_up(timeout=None):
+    """Calls `Tracker.warm_up` on the default global tracker"""
+    return get_tracker().warm_up(timeout=timeout)
@@ -0,0 +1,89 @@
+"""
+Initialize and health-check backends and processors in parallel.
+
+Constructing some backends is slow, they connect to databases or build API
+clients. Warming them up concurrently means the cost of starting a process is
+the time taken by the slowest backend instead of the sum of all of them.
+"""
+
+from __future__ import absolute_import
+
+import logging
+import threading
+import time
+
+from eventtracking.lazy import LazyObject
+
+LOG = logging.getLogger(__name__)
+
+STATUS_OK = 'ok'
+STATUS_ERROR = 'error'
+STATUS_TIMEOUT = 'timeout'
+
+
+def warm_up_component(component):
+    """
+    Initialize a single backend or processor.
+
+    Lazy proxies (see `eventtracking.lazy`) construct the object they wrap. Afterwards the `warm_up()` method of the
+    object is called if it has one, it is expected to raise an exception if the object isn't healthy.
+    """
+    if isinstance(component, LazyObject):
+        component = component.wrapped
+
+    warm_up = getattr(component, 'warm_up', None)
+    if callable(warm_up):
+        warm_up()
+
+
+def warm_up(components, timeout=None):
+    """
+    Initialize all of the `components`, a dictionary mapping names to backends or processors, concurrently.
+
+    Each component is initialized by `warm_up_component()` on its own daemon thread. Waits at most `timeout` seconds
+    for all of them to finish, components still initializing afterwards carry on in the background.
+
+    Returns a dictionary mapping the name of each component to a dictionary containing its `status` ("ok", "error" or
+    "timeout"), the number of `seconds` spent initializing it and the `error` message if it failed.
+    """
+    results = {}
+    threads = {}
+    started_at = time.time()
+
+    for name, component in components.iteritems():
+        results[name] = {'status': STATUS_TIMEOUT, 'seconds': None, 'error': None}
+        thread = threading.Thread(
+            target=_warm_up_thread, args=(component, results[name]), name='WarmUp-{0}'.format(name)
+        )
+        thread.daemon = True
+        thread.start()
+        threads[name] = thread
+
+    deadline = None if timeout is None else started_at + timeout
+    for name, thread in threads.iteritems():
+        thread.join(None if deadline is None else max(deadline - time.time(), 0))
+
+    for name in sorted(results):
+        result = results[name]
+        if result['status'] == STATUS_OK:
+            LOG.info('Warmed up %s in %.3f seconds', name, result['seconds'])
+        elif result['status'] == STATUS_ERROR:
+            LOG.error('Unable to warm up %s after %.3f seconds: %s', name, result['seconds'], result['error'])
+        else:
+            LOG.warning('Timed out warming up %s after %.3f seconds', name, time.time() - started_at)
+
+    return results
+
+
+def _warm_up_thread(component, result):
+    """Initialize `component` and record the outcome in the `result` dictionary"""
+    started_at = time.time()
+    try:
+        warm_up_component(component)
+    except Exception as error:  # pylint: disable=broad-except
+        result['seconds'] = time.time() - started_at
+        result['error'] = '{0}: {1}'.format(error.__class__.__name__, error)
+        result['status'] = STATUS_ERROR
+    else:
+        result['seconds'] = time.time() - started_at
+        result['status'] = STATUS_OK